@@ -2,25 +2,22 @@ import argparse
 import json
 import os
 import random
+import sys
 import time
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
-import numpy as np
-import requests
-from bs4 import BeautifulSoup
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
+# numpy, bs4, joblib/sklearn and requests are imported inside the functions
+# that use them, so `predict` never loads the training stack and --help is instant
+from src.utils.prediction_memo import PredictionMemo, model_version
+from src.utils.feature_cache import FeatureCache, content_hash
+from src.utils.scrape_planner import plan_scrapes
+from src.utils.text_corpus import TextCorpus
 
-UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36"
-
-def load_sites_from_stores(stores_path: str, max_sites: int) -> List[dict]:
+def load_sites_from_stores(stores_path: str, max_sites: int, seed: int = None) -> List[dict]:
     """
     Read stores.json (OSM export), extract entries that have both website and cuisine.
     Returns a list of dicts: {"url": ..., "cuisine": ...}
+    A fixed seed makes the sample repeatable (corpus builds resume on the same sites).
     """
     with open(stores_path, "r", encoding="utf-8") as f:
         data = json.load(f)
@@ -42,7 +39,7 @@ def load_sites_from_stores(stores_path: str, max_sites: int) -> List[dict]:
 
         sites.append({"url": website, "cuisine": first_cuisine})
 
-    random.shuffle(sites)
+    (random.Random(seed) if seed is not None else random).shuffle(sites)
     if max_sites and len(sites) > max_sites:
         sites = sites[:max_sites]
 
@@ -50,19 +47,15 @@ def load_sites_from_stores(stores_path: str, max_sites: int) -> List[dict]:
 
 
 def fetch_html(url: str, timeout: int = 15) -> str:
-    try:
-        resp = requests.get(url, headers={"User-Agent": UA}, timeout=timeout)
-        if resp.status_code == 200 and resp.text:
-            return resp.text
-        return ""
-    except Exception:
-        return ""
+    from punchfast_common.http_client import default_client
+    return default_client().fetch_html(url, timeout=timeout)
 
 
 def html_to_text(html: str) -> str:
     """
     Convert raw HTML to plain text, drop scripts/styles, normalize whitespace.
     """
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
 
     
@@ -74,9 +67,26 @@ def html_to_text(html: str) -> str:
     return text.lower()
 
 
+# Bump when html_to_text() output changes so cached page texts are re-extracted
+HTML_TEXT_VERSION = "bow_text-1"
+
+
+def html_to_text_cached(html: str, cache: FeatureCache = None) -> str:
+    if cache is None:
+        return html_to_text(html)
+    key = content_hash(html)
+    rec = cache.get(key, HTML_TEXT_VERSION)
+    if rec is None:
+        rec = {"text": html_to_text(html)}
+        cache.put(key, HTML_TEXT_VERSION, rec)
+    return rec["text"]
+
+
 def build_text_dataset(stores_path: str,
                        max_sites: int = 300,
-                       timeout: int = 15) -> Tuple[List[str], List[str]]:
+                       timeout: int = 15,
+                       feature_cache: FeatureCache = None,
+                       near_dup_distance: int = 3) -> Tuple[List[str], List[str]]:
     """
     1) Load sites from stores.json
     2) Scrape each website
@@ -91,44 +101,167 @@ def build_text_dataset(stores_path: str,
 
     print(f"Found {len(sites)} candidate sites with website + cuisine")
 
-    for i, s in enumerate(sites, start=1):
-        url = s["url"]
-        cuisine = s["cuisine"]
-
-        print(f"[{i}/{len(sites)}] Fetching {url} (label={cuisine})")
+    # Fetch each distinct page once, then hand its text to every site pointing at it
+    plan = plan_scrapes((i, s["url"]) for i, s in enumerate(sites))
+    print(plan.report())
+    keys = plan.fetch_keys()
+    page_text = {}
+    for n, key in enumerate(keys, start=1):
+        url = plan.pages[key]["url"]
+        print(f"[{n}/{len(keys)}] Fetching {url}")
         html = fetch_html(url, timeout=timeout)
         if not html:
             print("  -> no HTML, skipping")
             continue
 
-        text = html_to_text(html)
+        text = html_to_text_cached(html, feature_cache)
         if len(text) < 200:
             print("  -> page too short, skipping")
             continue
-
-        texts.append(text)
-        labels.append(cuisine)
+        page_text[key] = text
 
        
         time.sleep(random.uniform(0.5, 1.5))
 
+    for i, s in enumerate(sites):
+        text = page_text.get(plan.ref_page.get(i))
+        if text:
+            texts.append(text)
+            labels.append(s["cuisine"])
+
+    # Template/chain pages within near_dup_distance SimHash bits count once per label
+    if near_dup_distance is not None and near_dup_distance >= 0:
+        from src.utils.simhash import dedupe
+        keep = dedupe(texts, labels, max_distance=near_dup_distance)
+        if len(keep) < len(texts):
+            print(f"Dropped {len(texts) - len(keep)} near-duplicate pages (<= {near_dup_distance} bits)")
+        texts = [texts[i] for i in keep]
+        labels = [labels[i] for i in keep]
+
     print(f"\nKept {len(texts)} pages for training")
     return texts, labels
 
 
+def build_corpus(stores_path: str,
+                 corpus_dir: str,
+                 max_sites: int = 300,
+                 timeout: int = 15,
+                 feature_cache: FeatureCache = None,
+                 shard_size: int = 200) -> TextCorpus:
+    """
+    Scrape sites into the on-disk corpus, skipping pages it already has.
+    Safe to interrupt: rerunning continues with the pages not yet indexed.
+    """
+    sites = load_sites_from_stores(stores_path, max_sites=max_sites, seed=42)
+    plan = plan_scrapes((i, s["url"]) for i, s in enumerate(sites))
+    print(plan.report())
+    corpus = TextCorpus(corpus_dir, shard_size=shard_size)
+    keys = [k for k in plan.fetch_keys() if k not in corpus]
+    print(f"{len(plan.pages) - len(keys)} pages already in corpus, {len(keys)} to fetch")
+    try:
+        for n, key in enumerate(keys, start=1):
+            url = plan.pages[key]["url"]
+            labels = [sites[i]["cuisine"] for i in plan.refs_for(key)]
+            print(f"[{n}/{len(keys)}] Fetching {url}")
+            html = fetch_html(url, timeout=timeout)
+            if not html:
+                print("  -> no HTML, skipping")
+                corpus.add(key, url, labels, status="no_html")
+                continue
+
+            text = html_to_text_cached(html, feature_cache)
+            if len(text) < 200:
+                print("  -> page too short, skipping")
+                corpus.add(key, url, labels, status="too_short")
+                continue
+            corpus.add(key, url, labels, text)
+
+            time.sleep(random.uniform(0.5, 1.5))
+    finally:
+        corpus.close()
+        print(corpus.summary())
+    return corpus
+
+
+def corpus_dataset(corpus: TextCorpus, near_dup_distance: int = 3,
+                   split: str = "train") -> Tuple[Iterator[str], List[str]]:
+    """
+    Training samples from the corpus: one (text, label) per site label of each page.
+    Labels come from the index; texts are streamed shard by shard, in the same order.
+    split="train" leaves out the fixed held-out pages (src/utils/holdout.py) that
+    bench_models.py scores on, "holdout" returns only those and None every page.
+    """
+    entries = corpus.ok_entries()
+    if split is not None:
+        from src.utils.holdout import in_holdout
+        entries = [e for e in entries if in_holdout(e["key"]) == (split == "holdout")]
+    samples = [(e, label) for e in entries for label in e["labels"]]
+    if near_dup_distance is not None and near_dup_distance >= 0:
+        from src.utils.simhash import dedupe_fingerprints
+        fps = [int(e["simhash"], 16) if e.get("simhash") else None for e, _ in samples]
+        keep = dedupe_fingerprints(fps, [label for _, label in samples], max_distance=near_dup_distance)
+        if len(keep) < len(samples):
+            print(f"Dropped {len(samples) - len(keep)} near-duplicate pages (<= {near_dup_distance} bits)")
+        samples = [samples[i] for i in keep]
+
+    per_key = {}
+    for e, _ in samples:
+        per_key[e["key"]] = per_key.get(e["key"], 0) + 1
+
+    def texts():
+        for key, text in corpus.iter_texts(set(per_key)):
+            for _ in range(per_key[key]):
+                yield text
+
+    print(f"\nUsing {len(samples)} corpus pages ({split or 'all'} split)")
+    return texts(), [label for _, label in samples]
+
+
 
 def train_model(stores_path: str,
                 out_dir: str = "ai/models",
                 max_sites: int = 300,
-                timeout: int = 15) -> None:
+                timeout: int = 15,
+                feature_cache_path: str = None,
+                near_dup_distance: int = 3,
+                corpus_dir: str = None,
+                offline: bool = False,
+                shard_size: int = 200) -> None:
+    """
+    Without corpus_dir, scrape into memory and train (the original flow).
+    With corpus_dir, grow the on-disk corpus first (unless offline) and train
+    from it, so interrupted or repeated runs don't scrape the same pages again.
+    """
     os.makedirs(out_dir, exist_ok=True)
 
-    texts, labels = build_text_dataset(stores_path, max_sites=max_sites, timeout=timeout)
-
-    if len(texts) < 5:
+    feature_cache = FeatureCache(feature_cache_path) if feature_cache_path else None
+    try:
+        if corpus_dir is None:
+            texts, labels = build_text_dataset(stores_path, max_sites=max_sites, timeout=timeout,
+                                               feature_cache=feature_cache, near_dup_distance=near_dup_distance)
+        elif offline:
+            texts, labels = corpus_dataset(TextCorpus(corpus_dir), near_dup_distance=near_dup_distance)
+        else:
+            corpus = build_corpus(stores_path, corpus_dir, max_sites=max_sites, timeout=timeout,
+                                  feature_cache=feature_cache, shard_size=shard_size)
+            texts, labels = corpus_dataset(corpus, near_dup_distance=near_dup_distance)
+    finally:
+        if feature_cache is not None:
+            print(feature_cache.summary())
+            feature_cache.close()
+
+    if len(labels) < 5:
         print("Not enough pages scraped to train a model.")
         return
 
+    import joblib
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.metrics import accuracy_score, classification_report
+
     le = LabelEncoder()
     y = le.fit_transform(labels)
 
@@ -186,6 +319,7 @@ def train_model(stores_path: str,
 
 
 def load_artifacts(model_dir: str = "ai/models"):
+    import joblib
     vectorizer_path = os.path.join(model_dir, "vectorizer.joblib")
     model_path = os.path.join(model_dir, "cuisine_bow_model.joblib")
     labels_path = os.path.join(model_dir, "label_encoder.joblib")
@@ -196,22 +330,19 @@ def load_artifacts(model_dir: str = "ai/models"):
     return vectorizer, clf, le
 
 
-def predict_url(url: str, timeout: int = 15, model_dir: str = "ai/models") -> dict:
-    """
-    Fetch URL, convert to text, vectorize and predict cuisine.
-    """
-    html = fetch_html(url, timeout=timeout)
-    if not html:
-        return {"cuisine": None, "proba": 0.0, "error": "no_html"}
+def bow_memo(model_dir: str = "ai/models", db_path: str = None, capacity: int = 10000) -> PredictionMemo:
+    """Prediction memo tied to the vectorizer/model/label files in model_dir."""
+    version = model_version(*(os.path.join(model_dir, name) for name in
+                              ("vectorizer.joblib", "cuisine_bow_model.joblib", "label_encoder.joblib")))
+    return PredictionMemo("bow_cuisine", version, capacity=capacity, db_path=db_path)
 
-    text = html_to_text(html)
-    if len(text) < 100:
-        return {"cuisine": None, "proba": 0.0, "error": "too_short"}
 
+def predict_text(text: str, model_dir: str = "ai/models") -> dict:
     vectorizer, clf, le = load_artifacts(model_dir)
     X = vectorizer.transform([text])
 
     if hasattr(clf, "predict_proba"):
+        import numpy as np
         proba = clf.predict_proba(X)[0]
         idx = int(np.argmax(proba))
         prob = float(proba[idx])
@@ -220,7 +351,26 @@ def predict_url(url: str, timeout: int = 15, model_dir: str = "ai/models") -> di
         prob = 1.0
 
     label = le.inverse_transform([idx])[0]
-    return {"cuisine": label, "proba": round(prob, 4)}
+    return {"cuisine": str(label), "proba": round(prob, 4)}
+
+
+def predict_url(url: str, timeout: int = 15, model_dir: str = "ai/models",
+                memo: PredictionMemo = None) -> dict:
+    """
+    Fetch URL, convert to text, vectorize and predict cuisine.
+    With a memo, pages whose text was already scored are not scored again.
+    """
+    html = fetch_html(url, timeout=timeout)
+    if not html:
+        return {"cuisine": None, "proba": 0.0, "error": "no_html"}
+
+    text = html_to_text(html)
+    if len(text) < 100:
+        return {"cuisine": None, "proba": 0.0, "error": "too_short"}
+
+    if memo is None:
+        return predict_text(text, model_dir=model_dir)
+    return memo.get_or_compute(text, lambda: predict_text(text, model_dir=model_dir))
 
 
 def main():
@@ -229,29 +379,67 @@ def main():
 
     # train
     ap_train = sub.add_parser("train", help="scrape websites and train cuisine model")
-    ap_train.add_argument("--stores", required=True, help="path to stores.json")
+    ap_train.add_argument("--stores", help="path to stores.json (not needed with --offline)")
     ap_train.add_argument("--out", default="ai/models", help="output dir for model artifacts")
     ap_train.add_argument("--max-sites", type=int, default=300, help="max sites to use")
     ap_train.add_argument("--timeout", type=int, default=15, help="per-request timeout (seconds)")
+    ap_train.add_argument("--feature_cache", default=None, help="SQLite cache of extracted page text")
+    ap_train.add_argument("--near_dup_distance", type=int, default=3,
+                          help="drop pages within this many SimHash bits of a kept page with the same label (-1 keeps all)")
+    ap_train.add_argument("--corpus", default=None, help="directory of the resumable on-disk page corpus")
+    ap_train.add_argument("--offline", action="store_true", help="train from --corpus only, without scraping")
+    ap_train.add_argument("--shard_size", type=int, default=200, help="pages per corpus shard")
+
+    # corpus
+    ap_corpus = sub.add_parser("corpus", help="scrape websites into the on-disk corpus without training")
+    ap_corpus.add_argument("--stores", required=True, help="path to stores.json")
+    ap_corpus.add_argument("--corpus", required=True, help="corpus directory (created or resumed)")
+    ap_corpus.add_argument("--max-sites", type=int, default=300, help="max sites to use (0 = all)")
+    ap_corpus.add_argument("--timeout", type=int, default=15, help="per-request timeout (seconds)")
+    ap_corpus.add_argument("--feature_cache", default=None, help="SQLite cache of extracted page text")
+    ap_corpus.add_argument("--shard_size", type=int, default=200, help="pages per corpus shard")
 
     # predict
     ap_pred = sub.add_parser("predict", help="predict cuisine for a single URL")
     ap_pred.add_argument("--url", required=True, help="website URL to classify")
     ap_pred.add_argument("--timeout", type=int, default=15, help="per-request timeout (seconds)")
     ap_pred.add_argument("--model_dir", default="ai/models", help="directory with trained model")
+    ap_pred.add_argument("--memo_db", default=None, help="SQLite file that remembers predictions across runs")
 
     args = ap.parse_args()
 
     if args.cmd == "train":
+        if args.offline and not args.corpus:
+            ap.error("--offline needs --corpus")
+        if not args.offline and not args.stores:
+            ap.error("--stores is required unless training --offline from a corpus")
         train_model(
             stores_path=args.stores,
             out_dir=args.out,
             max_sites=args.max_sites,
             timeout=args.timeout,
+            feature_cache_path=args.feature_cache,
+            near_dup_distance=args.near_dup_distance,
+            corpus_dir=args.corpus,
+            offline=args.offline,
+            shard_size=args.shard_size,
         )
+    elif args.cmd == "corpus":
+        feature_cache = FeatureCache(args.feature_cache) if args.feature_cache else None
+        try:
+            build_corpus(args.stores, args.corpus, max_sites=args.max_sites, timeout=args.timeout,
+                         feature_cache=feature_cache, shard_size=args.shard_size)
+        finally:
+            if feature_cache is not None:
+                print(feature_cache.summary())
+                feature_cache.close()
     elif args.cmd == "predict":
-        res = predict_url(args.url, timeout=args.timeout, model_dir=args.model_dir)
+        memo = bow_memo(args.model_dir, db_path=args.memo_db) if args.memo_db else None
+        res = predict_url(args.url, timeout=args.timeout, model_dir=args.model_dir, memo=memo)
         print(json.dumps(res))
+        if memo is not None:
+            print(memo.summary(), file=sys.stderr)
+            memo.close()
     else:
         ap.print_help()
 
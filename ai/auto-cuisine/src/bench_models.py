@@ -0,0 +1,263 @@
+"""
+Accuracy-versus-cost benchmark for the classification model artifacts.
+
+Every known artifact set found in each --models directory is scored on the
+fixed held-out records of src/utils/holdout.py (the ones the trainers leave out):
+
+  type     store-type heads (type_model, shared_model) on held-out train_type.csv rows
+  cuisine  cuisine heads (cuisine_model, shared_model) on held-out train_cuisine.csv rows,
+           keeping labels that pass enrich.py's score threshold
+  page     bow_cuisine page-text models on the held-out pages of a --corpus
+
+Each artifact is measured in a fresh process: load time, resident memory added
+by loading it, single-record latency (p50/p95 of one predict call per record,
+the way enrich.py calls the models) and batched throughput (records/s for
+--batch records in one call), next to macro-F1 and per-label recall. An
+artifact is on the Pareto front ("*") when no other artifact for the same task
+is at least as good on macro-F1, latency and memory and better on one of them.
+Joblib files that no artifact set claims are listed as not evaluated.
+
+The artifacts committed under models/ were trained on the old random split, so
+part of this held-out set was in their training data and their scores are
+optimistic; only artifacts retrained with the current trainers are comparable.
+
+    python src/bench_models.py --models models --models /tmp/compressed --corpus data/corpus
+    python src/bench_models.py --json bench/models_report.json
+"""
+import argparse, ast, json, math, os, statistics, sys, time, warnings
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AI_DIR)
+
+# Same cut-off as enrich.predict_cuisine
+CUISINE_THRESHOLD = 0.6
+
+# (name, task, loader, files); the files are looked up in every --models directory
+ARTIFACTS = [
+    ("type_model", "type", "type_pipeline", ["type_model.joblib"]),
+    ("shared_model/type", "type", "shared_type", ["shared_model.joblib"]),
+    ("cuisine_model", "cuisine", "cuisine_pipeline", ["cuisine_model.joblib", "cuisine_mlb.joblib"]),
+    ("shared_model/cuisine", "cuisine", "shared_cuisine", ["shared_model.joblib"]),
+    ("bow_cuisine", "page", "bow", ["vectorizer.joblib", "cuisine_bow_model.joblib", "label_encoder.joblib"]),
+    ("bow_cuisine (vec/model/labels)", "page", "bow", ["vec.joblib", "model.joblib", "labels.joblib"]),
+]
+
+# === Held-out data ===
+def _labels(s):
+    return ast.literal_eval(s) if isinstance(s, str) else (s or [])
+
+def holdout_sets(data_dir: str, corpus_dir: str = None):
+    """task -> (texts, truth) for the fixed held-out records."""
+    import pandas as pd
+    from src.utils.holdout import split_frame
+    sets = {}
+    _, test = split_frame(pd.read_csv(os.path.join(data_dir, "train_type.csv")))
+    sets["type"] = (test["text_seed"].fillna("").tolist(), test["store_type_label"].astype(str).tolist())
+    _, test = split_frame(pd.read_csv(os.path.join(data_dir, "train_cuisine.csv")))
+    sets["cuisine"] = (test["text_seed"].fillna("").tolist(), test["cuisine_labels"].apply(_labels).tolist())
+    if corpus_dir:
+        from bow_cuisine import corpus_dataset
+        from src.utils.text_corpus import TextCorpus
+        texts, labels = corpus_dataset(TextCorpus(corpus_dir), near_dup_distance=None, split="holdout")
+        sets["page"] = (list(texts), labels)
+    return sets
+
+# === Worker (runs in a fresh process per artifact) ===
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _load(loader: str, paths):
+    """A predict(texts) -> predictions callable for the artifact."""
+    import joblib
+    import numpy as np
+    objs = [joblib.load(p) for p in paths]
+
+    def cuisine_labels(scores, classes):
+        probs = 1 / (1 + np.exp(-np.atleast_2d(scores)))
+        return [[str(c) for c, p in zip(classes, row) if p >= CUISINE_THRESHOLD] for row in probs]
+
+    if loader == "type_pipeline":
+        model = objs[0]
+        def predict(texts):
+            # enrich.predict_type asks for the label and its probability
+            model.predict_proba(texts)
+            return [str(y) for y in model.predict(texts)]
+    elif loader == "shared_type":
+        vec, clf = objs[0]["vectorizer"], objs[0]["type_clf"]
+        if clf is None:
+            raise ValueError("shared model has no type head")
+        def predict(texts):
+            X = vec.transform(texts)
+            clf.predict_proba(X)
+            return [str(y) for y in clf.predict(X)]
+    elif loader == "cuisine_pipeline":
+        model, mlb = objs
+        def predict(texts):
+            return cuisine_labels(model.decision_function(texts), mlb.classes_)
+    elif loader == "shared_cuisine":
+        vec, clf, mlb = objs[0]["vectorizer"], objs[0]["cuisine_clf"], objs[0]["cuisine_mlb"]
+        if clf is None:
+            raise ValueError("shared model has no cuisine head")
+        def predict(texts):
+            return cuisine_labels(clf.decision_function(vec.transform(texts)), mlb.classes_)
+    elif loader == "bow":
+        vec, clf, le = objs
+        def predict(texts):
+            idx = np.argmax(clf.predict_proba(vec.transform(texts)), axis=1)
+            return [str(y) for y in le.inverse_transform(clf.classes_[idx])]
+    else:
+        raise ValueError(f"unknown loader {loader}")
+    return predict
+
+def measure(loader: str, paths, texts, latency_records: int, batch: int, min_seconds: float):
+    # Import the sklearn stack first so load time and memory are the artifact's own
+    import joblib, numpy, sklearn.feature_extraction.text, sklearn.linear_model, sklearn.multiclass  # noqa: F401
+    import sklearn.pipeline, sklearn.preprocessing  # noqa: F401
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    predict = _load(loader, paths)
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    predictions = predict(texts)
+    latencies = []
+    for text in texts[:latency_records]:
+        start = time.perf_counter()
+        predict([text])
+        latencies.append(time.perf_counter() - start)
+
+    batch_texts = (texts * (batch // max(len(texts), 1) + 1))[:batch]
+    runs, elapsed = 0, 0.0
+    while runs < 3 or elapsed < min_seconds:
+        start = time.perf_counter()
+        predict(batch_texts)
+        elapsed += time.perf_counter() - start
+        runs += 1
+    latencies.sort()
+    return {
+        "predictions": predictions,
+        "load_ms": load_s * 1000,
+        "rss_mb": rss_loaded - rss_before,
+        "peak_rss_mb": _rss_mb(),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(math.ceil(0.95 * len(latencies))) - 1)] * 1000,
+        "records_per_s": runs * len(batch_texts) / elapsed,
+    }
+
+# === Quality ===
+def quality(task: str, truth, predictions):
+    from sklearn.metrics import accuracy_score, f1_score, recall_score
+    if task == "cuisine":
+        from sklearn.preprocessing import MultiLabelBinarizer
+        labels = sorted({l for ls in truth for l in ls})
+        mlb = MultiLabelBinarizer(classes=labels)
+        with warnings.catch_warnings():
+            # Per-label scores cover the held-out labels; extra predicted labels only cost exact matches
+            warnings.simplefilter("ignore")
+            Yt, Yp = mlb.fit_transform(truth), mlb.transform(predictions)
+        exact = sum(set(t) == set(p) for t, p in zip(truth, predictions)) / max(len(truth), 1)
+        macro = f1_score(Yt, Yp, average="macro", zero_division=0)
+        recall = recall_score(Yt, Yp, average=None, zero_division=0)
+    else:
+        labels = sorted(set(truth))
+        exact = accuracy_score(truth, predictions)
+        macro = f1_score(truth, predictions, labels=labels, average="macro", zero_division=0)
+        recall = recall_score(truth, predictions, labels=labels, average=None, zero_division=0)
+    return {"macro_f1": float(macro), "accuracy": float(exact),
+            "recall": {l: float(r) for l, r in zip(labels, recall)}}
+
+def pareto(rows):
+    """Flag rows no other row of the same task beats on macro-F1, p50 latency and memory."""
+    def key(r):
+        return (-r["macro_f1"], r["p50_ms"], max(r["rss_mb"], 0.0))
+    for r in rows:
+        rivals = [o for o in rows if o is not r and o["task"] == r["task"]]
+        r["pareto"] = not any(all(a <= b for a, b in zip(key(o), key(r))) and key(o) != key(r) for o in rivals)
+
+# === Report ===
+def print_table(rows, skipped):
+    w = max([len("artifact")] + [len(r["label"]) for r in rows])
+    header = (f"{'task':<8} {'artifact':<{w}} {'n':>4} {'macroF1':>7} {'acc':>6} {'load ms':>8} "
+              f"{'RSS MB':>7} {'p50 ms':>7} {'p95 ms':>7} {'rec/s':>8}  front")
+    print(header)
+    print("-" * len(header))
+    for r in sorted(rows, key=lambda r: (r["task"], -r["macro_f1"], r["p50_ms"])):
+        print(f"{r['task']:<8} {r['label']:<{w}} {r['n']:>4} {r['macro_f1']:>7.3f} {r['accuracy']:>6.3f} "
+              f"{r['load_ms']:>8.1f} {r['rss_mb']:>7.1f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} "
+              f"{r['records_per_s']:>8.0f}  {'*' if r['pareto'] else ''}")
+    for task in sorted({r["task"] for r in rows}):
+        task_rows = [r for r in rows if r["task"] == task]
+        labels = sorted({l for r in task_rows for l in r["recall"]})
+        print(f"\nPer-label recall ({task}):")
+        print(f"  {'label':<16}" + "".join(f" {r['label'][:20]:>20}" for r in task_rows))
+        for label in labels:
+            print(f"  {label:<16}" + "".join(f" {r['recall'].get(label, 0.0):>20.2f}" for r in task_rows))
+    for name, reason in skipped:
+        print(f"not evaluated: {name} ({reason})")
+
+def main():
+    ap = argparse.ArgumentParser(description="Score every model artifact on the fixed held-out set, with its cost")
+    ap.add_argument("--models", action="append", help="model directory; repeatable (default: models)")
+    ap.add_argument("--data", default=os.path.join(AI_DIR, "data", "processed"),
+                    help="build_training.py output with train_type.csv / train_cuisine.csv")
+    ap.add_argument("--corpus", default=None, help="bow_cuisine corpus; its held-out pages score the page models")
+    ap.add_argument("--latency_records", type=int, default=200, help="records timed one at a time")
+    ap.add_argument("--batch", type=int, default=1000, help="records per batched predict call")
+    ap.add_argument("--min_seconds", type=float, default=0.5, help="minimum time spent on batched calls")
+    ap.add_argument("--json", default=None, help="also write the results to this file")
+    args = ap.parse_args()
+    model_dirs = args.models or [os.path.join(AI_DIR, "models")]
+
+    sets = holdout_sets(args.data, args.corpus)
+    rows, skipped = [], []
+    ctx = multiprocessing.get_context("spawn")
+    for model_dir in model_dirs:
+        claimed = set()
+        for name, task, loader, files in ARTIFACTS:
+            paths = [os.path.join(model_dir, f) for f in files]
+            if not all(os.path.exists(p) for p in paths):
+                continue
+            claimed.update(files)
+            label = name if len(model_dirs) == 1 else f"{os.path.basename(os.path.normpath(model_dir))}/{name}"
+            if task not in sets:
+                skipped.append((label, "no --corpus for page-text models"))
+                continue
+            texts, truth = sets[task]
+            if not texts:
+                skipped.append((label, f"no held-out {task} records"))
+                continue
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    res = pool.submit(measure, loader, paths, texts, args.latency_records,
+                                      args.batch, args.min_seconds).result()
+            except Exception as e:
+                skipped.append((label, f"{type(e).__name__}: {e}"))
+                continue
+            res.update(quality(task, truth, res.pop("predictions")))
+            res.update({"task": task, "label": label, "artifact": name, "models": model_dir,
+                        "files": files, "n": len(texts)})
+            rows.append(res)
+        for f in sorted(os.listdir(model_dir)):
+            if f.endswith(".joblib") and f not in claimed:
+                skipped.append((os.path.join(model_dir, f), "no artifact set uses this file"))
+    pareto(rows)
+    print_table(rows, skipped)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": rows, "not_evaluated": [{"name": n, "reason": r} for n, r in skipped]},
+                      f, indent=2)
+        print("Wrote:", args.json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Startup-time benchmark for the auto-cuisine CLIs.
+
+Each case runs a command in a fresh interpreter --repeat times and takes the
+median wall time; one extra run under ``-X importtime`` records which modules
+it imported. A case fails when it imports a module on its ``forbid`` list (a
+deterministic check, e.g. ``--help`` must not load sklearn), when it imports
+more than --extra-modules modules beyond the baseline, or when its median
+exceeds the baseline by more than --tolerance (relative) plus --slack
+(seconds, absorbs noise on short runs). Exit status 1 on any failure.
+
+The baseline holds no absolute times: each case is stored as its module count
+and its median divided by that of a bare ``python -c pass`` measured in the
+same run, so it carries over between machines of different speed. Module
+counts do depend on the Python and library versions; after upgrading either,
+regenerate the baseline with --update.
+
+    python src/bench_startup.py                # compare with bench/startup_baseline.json
+    python src/bench_startup.py --update       # record a new baseline
+
+The single-record cases use the first store in --stores whose type and cuisine
+come from OSM tags (no model should be loaded) and the first store without a
+cuisine tag (the cuisine model is loaded once).
+"""
+import argparse, json, os, platform, shutil, statistics, subprocess, sys, tempfile, time
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(AI_DIR, "bench", "startup_baseline.json")
+REFERENCE = [sys.executable, "-c", "pass"]
+HEAVY = ["pandas", "sklearn", "scipy", "bs4", "requests", "joblib", "tldextract"]
+
+def single_record_inputs(stores_path: str, work: str):
+    """Write the rule-only and model-needing one-store exports; return their paths."""
+    with open(stores_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    elements = data.get("elements", data) if isinstance(data, dict) else data
+    def tags(el):
+        return el.get("tags") or {}
+    rule_only = next(el for el in elements if tags(el).get("cuisine") and (tags(el).get("amenity") or tags(el).get("shop")))
+    needs_model = next(el for el in elements if not tags(el).get("cuisine"))
+    paths = []
+    for name, el in (("rule_only.json", rule_only), ("needs_model.json", needs_model)):
+        path = os.path.join(work, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"elements": [el]}, f)
+        paths.append(path)
+    return paths
+
+def build_cases(args, work: str):
+    # enrich.py imports itself as ai.src.*; give it that layout in a scratch dir
+    pkg_root = os.path.join(work, "pkg")
+    os.makedirs(pkg_root)
+    os.symlink(AI_DIR, os.path.join(pkg_root, "ai"))
+    rule_only, needs_model = single_record_inputs(args.stores, work)
+    enrich = [sys.executable, "-m", "ai.src.enrich"]
+    enrich_args = ["--models", os.path.abspath(args.models), "--type_map",
+                   os.path.join(AI_DIR, "src", "taxonomy", "type_map.yaml")]
+    py = sys.executable
+    return [
+        {"name": "enrich --help", "cmd": enrich + ["--help"], "cwd": pkg_root, "forbid": HEAVY + ["numpy"]},
+        {"name": "enrich one store (rules only)", "cwd": pkg_root, "forbid": HEAVY,
+         "cmd": enrich + ["--stores", rule_only, "--out", os.path.join(work, "out_rules.json")] + enrich_args},
+        # sklearn pulls in pandas and tldextract pulls in requests; only the scraping stack is avoidable here
+        {"name": "enrich one store (model)", "cwd": pkg_root, "forbid": ["bs4"],
+         "cmd": enrich + ["--stores", needs_model, "--out", os.path.join(work, "out_model.json")] + enrich_args},
+        {"name": "bow_cuisine --help", "cmd": [py, "bow_cuisine.py", "--help"], "cwd": AI_DIR, "forbid": HEAVY + ["numpy"]},
+        {"name": "bow_cuisine predict --help", "cmd": [py, "bow_cuisine.py", "predict", "--help"], "cwd": AI_DIR,
+         "forbid": HEAVY + ["numpy"]},
+        {"name": "train_type --help", "cmd": [py, "src/train_type.py", "--help"], "cwd": AI_DIR, "forbid": HEAVY},
+        {"name": "train_shared --help", "cmd": [py, "src/train_shared.py", "--help"], "cwd": AI_DIR, "forbid": HEAVY},
+    ]
+
+def imported_modules(case) -> set:
+    """Full dotted names of every module the case imports."""
+    proc = subprocess.run([case["cmd"][0], "-X", "importtime"] + case["cmd"][1:], cwd=case["cwd"],
+                          capture_output=True, text=True)
+    mods = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            mods.add(line.rsplit("|", 1)[1].strip())
+    return mods
+
+def time_case(case, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(case["cmd"], cwd=case["cwd"], capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{case['name']} exited {proc.returncode}:\n{proc.stderr[-2000:]}")
+    return statistics.median(times)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stores", default=os.path.join(AI_DIR, "data", "stores.json"))
+    ap.add_argument("--models", default=os.path.join(AI_DIR, "models"))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown over the baseline")
+    ap.add_argument("--slack", type=float, default=0.1, help="allowed absolute slowdown in seconds")
+    ap.add_argument("--extra-modules", type=int, default=25, help="allowed growth in imported modules")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--update", action="store_true", help="write the measured cases as the new baseline")
+    args = ap.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            recorded = json.load(f)
+        baseline = recorded.get("cases", {})
+        python = ".".join(platform.python_version_tuple()[:2])
+        if recorded.get("python") != python:
+            print(f"Note: baseline recorded on Python {recorded.get('python')}, running {python}; "
+                  "module counts may differ")
+
+    unit = time_case({"name": "python -c pass", "cmd": REFERENCE, "cwd": AI_DIR}, args.repeat)
+    print(f"{'python -c pass':<34} {unit:7.3f}s  (time unit)")
+    work = tempfile.mkdtemp(prefix="bench_startup_")
+    failures, measured = [], {}
+    try:
+        for case in build_cases(args, work):
+            seconds = time_case(case, args.repeat)
+            modules = imported_modules(case)
+            measured[case["name"]] = {"ratio": round(seconds / unit, 2), "modules": len(modules)}
+            problems = []
+            loaded = sorted({m.split(".")[0] for m in modules} & set(case["forbid"]))
+            if loaded:
+                problems.append("imports " + ", ".join(loaded))
+            ref = baseline.get(case["name"])
+            if ref is not None:
+                if len(modules) > ref["modules"] + args.extra_modules:
+                    problems.append(f"{len(modules)} modules, baseline {ref['modules']}")
+                if seconds > ref["ratio"] * unit * (1 + args.tolerance) + args.slack:
+                    problems.append(f"slower than baseline {ref['ratio'] * unit:.3f}s")
+            if problems:
+                failures.append(case["name"])
+            status = "FAIL " + "; ".join(problems) if problems else "ok"
+            ref_txt = f"{ref['ratio'] * unit:7.3f}s" if ref is not None else "      -"
+            print(f"{case['name']:<34} {seconds:7.3f}s {len(modules):5d} modules  baseline {ref_txt}  {status}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.update:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": ".".join(platform.python_version_tuple()[:2]), "repeat": args.repeat,
+                       "time_unit": "python -c pass", "cases": measured}, f, indent=2)
+        print("Baseline written:", args.baseline)
+    if failures:
+        print(f"{len(failures)} startup regression(s): " + "; ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
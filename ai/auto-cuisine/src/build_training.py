@@ -1,59 +1,16 @@
-import json, os, argparse, re, pandas as pd, yaml, io
+import os, sys, argparse, re, pandas as pd, yaml
 import tldextract
 
-def _coerce_records(obj):
-    if isinstance(obj, list):
-        return obj
-    if isinstance(obj, dict):
-        for key in ("elements", "features", "data", "stores"):
-            if key in obj and isinstance(obj[key], list):
-                return obj[key]
-    if isinstance(obj, str):
-        records = []
-        for line in io.StringIO(obj):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-                if isinstance(rec, dict):
-                    records.append(rec)
-            except Exception:
-                pass
-        if records:
-            return records
-    return []
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.store_table import StoreTable
 
 def load_stores(path: str) -> pd.DataFrame:
-    raw = open(path, "r", encoding="utf-8").read()
-    try:
-        parsed = json.loads(raw)
-    except Exception:
-        parsed = raw
-    records = _coerce_records(parsed)
-    if not records:
+    # Streamed into the columnar table, so the raw export is never held as dicts
+    table = StoreTable.from_file(path)
+    if not len(table):
         raise ValueError(f"Could not parse any store records from {path}")
-
-    rows = []
-    for el in records:
-        if not isinstance(el, dict):
-            continue
-        tags = el.get("tags", {})
-        if not isinstance(tags, dict):
-            tags = {}
-        rows.append({
-            "id": el.get("id"),
-            "lat": el.get("lat"),
-            "lon": el.get("lon"),
-            "name": tags.get("name", el.get("name", "")),
-            "brand": tags.get("brand", el.get("brand", "")),
-            "website": tags.get("website", el.get("website", "")),
-            "amenity": tags.get("amenity", el.get("amenity", "")),
-            "shop": tags.get("shop", el.get("shop", "")),
-            "cuisine_raw": tags.get("cuisine", el.get("cuisine", "")),
-            "opening_hours": tags.get("opening_hours", el.get("opening_hours", "")),
-        })
-    return pd.DataFrame(rows)
+    return table.to_pandas(["id", "lat", "lon", "name", "brand", "website", "amenity", "shop", "cuisine",
+                            "opening_hours"], rename={"cuisine": "cuisine_raw"})
 
 def map_type(df: pd.DataFrame, type_map_path: str) -> pd.Series:
     with open(type_map_path, "r", encoding="utf-8") as f:
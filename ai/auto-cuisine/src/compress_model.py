@@ -0,0 +1,170 @@
+"""
+Post-training compression for the type and cuisine TF-IDF + logistic models.
+
+Features whose largest absolute weight over all classes is below --threshold
+are removed from both the vectorizer vocabulary (vocabulary_/idf_ rebuilt,
+stop_words_ dropped) and every coefficient row. Optionally the remaining
+weights are snapped to 255 levels per class (--quantize), stored as float32
+and made sparse when most of them are zero. Both models are scored on the same
+held-out split as train_type.py / train_cuisine.py, and since a weak model can
+score the same before and after however much its output moved, the report
+also gives the share of held-out predictions that are unchanged and the
+largest probability shift; past --min-agreement or --max-prob-shift the
+compressed model is not saved. Original and compressed
+models are written with the same joblib settings so the size change is the
+compression's own.
+"""
+import argparse, ast, copy, os, shutil, sys, time, joblib, numpy as np, pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.holdout import split_frame
+
+def _linear_models(clf):
+    """The fitted linear estimators inside clf (OvR wrappers are unpacked)."""
+    ests = getattr(clf, "estimators_", None)
+    if ests is None:
+        return [clf]
+    # OvR keeps a constant predictor for labels that never vary in training
+    return [e for e in ests if hasattr(e, "coef_")]
+
+def feature_importance(clf, n_features: int) -> np.ndarray:
+    peak = np.zeros(n_features)
+    for est in _linear_models(clf):
+        coef = est.coef_.toarray() if hasattr(est.coef_, "toarray") else est.coef_
+        peak = np.maximum(peak, np.abs(coef).max(axis=0))
+    return peak
+
+def _quantize(coef: np.ndarray, levels: int = 127) -> np.ndarray:
+    """Weights snapped to 2 * levels + 1 steps per class, as float32 (half the bytes, and far fewer distinct values)."""
+    scale = np.abs(coef).max(axis=1, keepdims=True) / levels
+    scale[scale == 0] = 1.0
+    return (np.round(coef / scale) * scale).astype(np.float32)
+
+def compress_pipeline(pipe, threshold: float, quantize: bool = False):
+    """Return (compressed pipeline, kept feature count, original feature count)."""
+    tfidf = pipe.named_steps["tfidf"]
+    clf = pipe.named_steps["clf"]
+    n_features = len(tfidf.vocabulary_)
+    keep = feature_importance(clf, n_features) >= threshold
+    if not keep.any():
+        keep[np.argmax(feature_importance(clf, n_features))] = True
+    new_index = np.full(n_features, -1)
+    new_index[keep] = np.arange(int(keep.sum()))
+
+    small = copy.deepcopy(pipe)
+    vec = small.named_steps["tfidf"]
+    vec.vocabulary_ = {term: int(new_index[i]) for term, i in tfidf.vocabulary_.items() if keep[i]}
+    vec.idf_ = tfidf.idf_[keep]
+    inner = getattr(vec, "_tfidf", None)
+    if inner is not None and hasattr(inner, "n_features_in_"):
+        inner.n_features_in_ = int(keep.sum())
+    # Only kept for introspection and can be as large as the vocabulary itself
+    if hasattr(vec, "stop_words_"):
+        del vec.stop_words_
+
+    small_clf = small.named_steps["clf"]
+    for est in _linear_models(small_clf):
+        coef = est.coef_.toarray() if hasattr(est.coef_, "toarray") else est.coef_
+        coef = coef[:, keep]
+        if quantize:
+            coef = _quantize(coef)
+        est.coef_ = coef
+        est.n_features_in_ = int(keep.sum())
+        if quantize and np.count_nonzero(coef) < 0.5 * coef.size:
+            est.sparsify()
+    if hasattr(small_clf, "n_features_in_"):
+        small_clf.n_features_in_ = int(keep.sum())
+    return small, int(keep.sum()), n_features
+
+def type_split(data_dir: str):
+    _, test = split_frame(pd.read_csv(os.path.join(data_dir, "train_type.csv")))
+    return test["text_seed"].fillna(""), test["store_type_label"].astype(str)
+
+def cuisine_split(data_dir: str, mlb):
+    _, test = split_frame(pd.read_csv(os.path.join(data_dir, "train_cuisine.csv")))
+    labels = test["cuisine_labels"].apply(lambda s: ast.literal_eval(s) if isinstance(s,str) else (s or []))
+    return test["text_seed"].fillna(""), mlb.transform(labels)
+
+def score(pipe, X, y, multilabel: bool):
+    yp = pipe.predict(X)
+    out = {"accuracy": accuracy_score(y, yp)}
+    out["f1_micro" if multilabel else "f1_macro"] = f1_score(
+        y, yp, average="micro" if multilabel else "macro", zero_division=0)
+    return out
+
+def agreement(pipe, small, X):
+    """(share of rows whose prediction, every label for multi-label, is unchanged, largest probability shift)."""
+    a, b = np.asarray(pipe.predict(X)), np.asarray(small.predict(X))
+    same = (a == b).all(axis=1) if a.ndim > 1 else (a == b)
+    shift = np.abs(pipe.predict_proba(X) - small.predict_proba(X)).max() if len(same) else 0.0
+    return (float(same.mean()) if len(same) else 1.0), float(shift)
+
+def _dump(obj, path):
+    joblib.dump(obj, path, compress=3)
+    return os.path.getsize(path)
+
+def _load_seconds(path):
+    start = time.perf_counter()
+    joblib.load(path)
+    return time.perf_counter() - start
+
+def report(name, before, after, agree, n_orig, n_kept, size_orig, size_new, load_orig, load_new):
+    print(f"\n=== {name} ===")
+    print(f"Features: {n_orig} -> {n_kept} ({n_kept / max(n_orig, 1):.1%} kept)")
+    print(f"File (both joblib compress=3): {size_orig / 1024:.1f} KB -> {size_new / 1024:.1f} KB, "
+          f"load {load_orig * 1000:.1f} ms -> {load_new * 1000:.1f} ms")
+    for metric in before:
+        print(f"{metric}: {before[metric]:.4f} -> {after[metric]:.4f} "
+              f"(delta {after[metric] - before[metric]:+.4f})")
+    print(f"Unchanged held-out predictions: {agree[0]:.2%} (largest probability shift {agree[1]:.4f})")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", required=True, help="processed dir with train_type.csv / train_cuisine.csv")
+    ap.add_argument("--models", required=True, help="dir with the trained models")
+    ap.add_argument("--out", required=True, help="dir for the compressed models (usable as enrich.py --models)")
+    ap.add_argument("--threshold", type=float, default=0.01,
+                    help="drop features whose max |coef| over all classes is below this")
+    ap.add_argument("--quantize", action="store_true", help="snap weights to 8-bit levels per class")
+    ap.add_argument("--min-agreement", type=float, default=0.98,
+                    help="do not save a compressed model that changes more held-out predictions than this allows")
+    ap.add_argument("--max-prob-shift", type=float, default=0.05,
+                    help="do not save a compressed model that moves any held-out probability by more than this")
+    args = ap.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+
+    jobs = []
+    type_path = os.path.join(args.models, "type_model.joblib")
+    if os.path.exists(type_path):
+        jobs.append(("type_model", type_path, lambda: type_split(args.data), False))
+    cuisine_path = os.path.join(args.models, "cuisine_model.joblib")
+    if os.path.exists(cuisine_path):
+        mlb_path = os.path.join(args.models, "cuisine_mlb.joblib")
+        mlb = joblib.load(mlb_path)
+        shutil.copy(mlb_path, os.path.join(args.out, "cuisine_mlb.joblib"))
+        jobs.append(("cuisine_model", cuisine_path, lambda: cuisine_split(args.data, mlb), True))
+    if not jobs:
+        raise FileNotFoundError(f"No type_model.joblib or cuisine_model.joblib in {args.models}")
+
+    for name, path, split, multilabel in jobs:
+        pipe = joblib.load(path)
+        small, n_kept, n_orig = compress_pipeline(pipe, args.threshold, args.quantize)
+        X, y = split()
+        out_path = os.path.join(args.out, f"{name}.joblib")
+        # Re-dump the original with the same settings, so zlib alone doesn't count as a saving
+        orig_path = out_path + ".orig"
+        size_orig = _dump(pipe, orig_path)
+        size_new = _dump(small, out_path)
+        agree = agreement(pipe, small, X)
+        report(name, score(pipe, X, y, multilabel), score(small, X, y, multilabel), agree, n_orig, n_kept,
+               size_orig, size_new, _load_seconds(orig_path), _load_seconds(out_path))
+        os.remove(orig_path)
+        if agree[0] < args.min_agreement or agree[1] > args.max_prob_shift:
+            os.remove(out_path)
+            print(f"Not saved: outside --min-agreement {args.min_agreement} / --max-prob-shift {args.max_prob_shift}")
+            continue
+        print("Saved:", out_path)
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,72 @@
-import os, json, argparse, joblib, re, pandas as pd, numpy as np, io
+# Heavy dependencies (numpy, joblib/sklearn, bs4, requests) and data files are
+# loaded on the code paths that need them, not at import time: --help and
+# short rule-only runs stay fast when invoked from the server and cron.
+import os, json, argparse, functools, re, time
+from collections import namedtuple
 from typing import Dict, Any, List
 from ai.src.utils.text_utils import normalize_whitespace, tokenize_domain, keyword_hits
-from ai.src.utils.scrape_site import scrape_site
+from ai.src.utils.prediction_sink import PostgresSink, prediction_record, write_ndjson_delta
+from ai.src.utils.prediction_memo import PredictionMemo, model_version
+from ai.src.utils.content_extract import blocks_text, budget_text
 import pathlib
 
 GAZETTEER_PATH = pathlib.Path(__file__).parent / "gazetteer" / "brand_gazetteer.json"
-with open(GAZETTEER_PATH, "r", encoding="utf-8") as f:
-  GAZ = json.load(f)
-
-def _coerce_records(obj) -> List[dict]:
-  if isinstance(obj, list):
-    return [x for x in obj if isinstance(x, dict)]
-  if isinstance(obj, dict):
-    for k in ("elements","features","data","stores"):
-      if isinstance(obj.get(k), list):
-        return [x for x in obj[k] if isinstance(x, dict)]
-    return []
-  if isinstance(obj, str):
-    recs = []
-    for line in io.StringIO(obj):
-      line = line.strip()
-      if not line:
-        continue
-      try:
-        d = json.loads(line)
-        if isinstance(d, dict):
-          recs.append(d)
-      except Exception:
-        pass
-    return recs
-  return []
+
+# Times each part of the scraped content is repeated in the model input (TF-IDF term weight)
+BLOCK_WEIGHTS = {"jsonld": 2, "heading": 2, "menu": 2, "text": 1}
+MAX_TOKENS = 1500
+
+Models = namedtuple("Models", "type_model cuisine_model cuisine_mlb vectorizer")
+
+@functools.lru_cache(maxsize=None)
+def load_gazetteer() -> Dict[str, Any]:
+  with open(GAZETTEER_PATH, "r", encoding="utf-8") as f:
+    return json.load(f)
 
 def brand_cuisine_from_name(name: str):
+  gaz = load_gazetteer()
   name = (name or "").lower()
   labs = set()
-  for b, tags in GAZ.get("brands", {}).items():
+  for b, tags in gaz.get("brands", {}).items():
     if b in name: labs.update(tags)
-  labs.update(keyword_hits(name, GAZ.get("name_keywords", {})))
+  labs.update(keyword_hits(name, gaz.get("name_keywords", {})))
   return sorted(labs)
 
 def tokens_from_url(url: str) -> str:
   toks = tokenize_domain(url)
   return " ".join(toks)
 
-def build_text(store: Dict[str, Any], scraped: Dict[str, Any]) -> str:
-  seed = " ".join([
-    store.get("name",""), store.get("brand",""), tokens_from_url(store.get("website","")),
-    scraped.get("title",""), scraped.get("meta_desc",""), scraped.get("text",""),
-    " ".join(scraped.get("jsonld_types",[])), " ".join(scraped.get("jsonld_menu_items",[]))
-  ])
-  return normalize_whitespace(seed)
+def build_text(store: Dict[str, Any], scraped: Dict[str, Any], max_tokens: int = MAX_TOKENS) -> str:
+  """Model input for one store: seed fields first, then weighted page content, cut at max_tokens."""
+  blocks = scraped.get("blocks")
+  if blocks is None:
+    blocks = [["text", scraped.get("text","")]]
+  parts = [
+    (store.get("name",""), 1), (store.get("brand",""), 1), (tokens_from_url(store.get("website","")), 1),
+    (scraped.get("title",""), 1), (scraped.get("meta_desc",""), 1),
+    (" ".join(scraped.get("jsonld_types",[])), 1),
+    (" ".join(scraped.get("jsonld_menu_items",[])), BLOCK_WEIGHTS["jsonld"]),
+  ]
+  # Headings and menu sections go ahead of running text so the budget cuts the latter first
+  for kind in ("heading", "menu", "text"):
+    parts.append((blocks_text(b for b in blocks if b[0] == kind), BLOCK_WEIGHTS[kind]))
+  return normalize_whitespace(budget_text(parts, max_tokens))
 
-def apply_type_rules(tags: Dict[str, Any], type_map_path: str) -> str:
+@functools.lru_cache(maxsize=None)
+def load_type_map(type_map_path: str) -> Dict[str, Any]:
   import yaml
   with open(type_map_path, "r", encoding="utf-8") as f:
-    mp = yaml.safe_load(f)
+    return yaml.safe_load(f)
+
+def apply_type_rules(tags: Dict[str, Any], type_map_path: str) -> str:
+  mp = load_type_map(type_map_path)
   a, s = (tags.get("amenity") or "").strip(), (tags.get("shop") or "").strip()
   if a and a in mp.get("amenity", {}): return mp["amenity"][a]
   if s and s in mp.get("shop", {}):   return mp["shop"][s]
   return ""
 
 def load_models(models_dir: str):
+  import joblib
   type_model = None
   type_path = os.path.join(models_dir, "type_model.joblib")
   if os.path.exists(type_path):
@@ -69,77 +75,172 @@ def load_models(models_dir: str):
   cuisine_mlb   = joblib.load(os.path.join(models_dir, "cuisine_mlb.joblib"))
   return type_model, cuisine_model, cuisine_mlb
 
+def load_shared(models_dir: str):
+  """Shared-vectorizer bundle from train_shared.py, or None."""
+  path = os.path.join(models_dir, "shared_model.joblib")
+  if not os.path.exists(path):
+    return None
+  import joblib
+  return joblib.load(path)
+
+def shared_heads(models_dir: str):
+  """{"type": bool, "cuisine": bool} from train_shared.py's sidecar, or None for older bundles."""
+  try:
+    with open(os.path.join(models_dir, "shared_model.heads.json"), "r", encoding="utf-8") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+def lazy_transform(get_vectorizer, text: str):
+  """Callable that vectorizes ``text`` on first use and returns the same row afterwards."""
+  cache = []
+  def row():
+    if not cache:
+      cache.append(get_vectorizer().transform([text]))
+    return cache[0]
+  return row
+
+# X is either [text] for a full Pipeline or an already vectorized row for a shared-model head
+def predict_type(type_model, X):
+  type_pred = type_model.predict(X)[0]
+  try:
+    proba = type_model.predict_proba(X)[0]
+    classes = list(type_model.classes_)
+    type_conf = float(proba[classes.index(type_pred)])
+  except Exception:
+    type_conf = 0.6
+  return [str(type_pred), type_conf]
+
+def predict_cuisine(cuisine_model, cuisine_mlb, X):
+  import numpy as np
+  scores = cuisine_model.decision_function(X)
+  probs = 1 / (1 + np.exp(-scores))
+  probs = probs[0]
+  classes = list(cuisine_mlb.classes_)
+  return [[str(c), float(p)] for c, p in zip(classes, probs) if p >= 0.6]
+
 def main():
   ap = argparse.ArgumentParser()
   ap.add_argument("--stores", required=True)
   ap.add_argument("--models", required=True)
-  ap.add_argument("--out", required=True)
+  ap.add_argument("--out", help="enriched JSON (same shape as --stores)")
   ap.add_argument("--type_map", default="ai/src/taxonomy/type_map.yaml")
   ap.add_argument("--scrape", action="store_true")
+  ap.add_argument("--confidence", type=float, default=0.75,
+                  help="with --scrape, only scrape stores whose cheap prediction is below this")
+  ap.add_argument("--scrape_budget", type=int, default=None, help="max pages to scrape")
+  ap.add_argument("--max_pages_per_domain", type=int, default=None,
+                  help="scrape at most N pages per registered domain; other stores on it reuse them")
+  ap.add_argument("--scrape_seconds", type=float, default=None, help="wall-clock limit for scraping")
+  ap.add_argument("--sink", action="append", choices=["json", "postgres", "ndjson"],
+                  help="where predictions go; repeatable (default: json)")
+  ap.add_argument("--pg_table", default="store_predictions")
+  ap.add_argument("--delta_out", default="data/predictions_delta.ndjson")
+  ap.add_argument("--delta_state", default="data/predictions_state.json")
+  ap.add_argument("--memo_size", type=int, default=10000, help="in-process prediction memo entries")
+  ap.add_argument("--memo_db", help="optional SQLite file that keeps the prediction memo across runs")
+  ap.add_argument("--feature_cache", help="SQLite cache of extracted page features (with --scrape)")
+  ap.add_argument("--near_dup_distance", type=int, default=3,
+                  help="reuse predictions for scraped texts within this many SimHash bits (-1 disables)")
+  ap.add_argument("--max_tokens", type=int, default=MAX_TOKENS,
+                  help="token budget of the model input built for each store")
   args = ap.parse_args()
+  sinks = set(args.sink or ["json"])
+  if "json" in sinks and not args.out:
+    ap.error("--out is required for the json sink")
 
-  raw = open(args.stores, "r", encoding="utf-8").read()
-  try:
-    obj = json.loads(raw)
-  except Exception:
-    obj = raw
-  records = _coerce_records(obj)
-  if not records:
+  from ai.src.utils.store_table import StoreTable, write_overpass
+
+  # Columnar, interned copy of the input; elements are rebuilt one at a time on output
+  table = StoreTable.from_file(args.stores)
+  if not len(table):
     raise ValueError("No store records parsed from --stores")
 
-  type_model, cuisine_model, cuisine_mlb = load_models(args.models)
+  # Models are unpickled on the first prediction a rule or memo hit can't answer
+  shared_path = os.path.join(args.models, "shared_model.joblib")
+  use_shared = os.path.exists(shared_path)
 
-  enriched = []
-  for el in records:
-    tags = el.get("tags", {})
-    if not isinstance(tags, dict): tags = {}
+  @functools.lru_cache(maxsize=None)
+  def models() -> Models:
+    if use_shared:
+      shared = load_shared(args.models)
+      return Models(shared["type_clf"], shared["cuisine_clf"], shared["cuisine_mlb"], shared["vectorizer"])
+    return Models(*load_models(args.models), None)
 
-    store = {
-      "id": el.get("id"), "lat": el.get("lat"), "lon": el.get("lon"),
-      "name": tags.get("name", el.get("name","")), "brand": tags.get("brand", el.get("brand","")),
-      "website": tags.get("website", el.get("website","")),
-      "amenity": tags.get("amenity", el.get("amenity","")),
-      "shop": tags.get("shop", el.get("shop","")),
-      "cuisine": tags.get("cuisine", el.get("cuisine","")) or ""
-    }
+  # Which heads exist is read from the sidecar, so rule-only runs never unpickle the bundle
+  heads = shared_heads(args.models) if use_shared else None
+
+  def has_type_model() -> bool:
+    if use_shared:
+      return heads["type"] if heads is not None else models().type_model is not None
+    return os.path.exists(os.path.join(args.models, "type_model.joblib"))
+
+  def has_cuisine_model() -> bool:
+    if use_shared:
+      return heads["cuisine"] if heads is not None else models().cuisine_model is not None
+    return True
+
+  if use_shared:
+    type_version = cuisine_version = model_version(shared_path)
+    print("Using shared vectorizer:", shared_path)
+  else:
+    type_version = model_version(os.path.join(args.models, "type_model.joblib"))
+    cuisine_version = model_version(os.path.join(args.models, "cuisine_model.joblib"),
+                                    os.path.join(args.models, "cuisine_mlb.joblib"))
+  feature_cache = None
+  if args.feature_cache:
+    from ai.src.utils.feature_cache import FeatureCache
+    feature_cache = FeatureCache(args.feature_cache)
+  # Seed texts never reach the near-duplicate word minimum; only scraped pages do
+  near_dup_distance = args.near_dup_distance if args.scrape else None
+  type_memo = PredictionMemo("type", type_version, capacity=args.memo_size, db_path=args.memo_db,
+                             near_dup_distance=near_dup_distance)
+  cuisine_memo = PredictionMemo("cuisine", cuisine_version, capacity=args.memo_size, db_path=args.memo_db,
+                                near_dup_distance=near_dup_distance)
+
+  EMPTY_SCRAPE = {"title":"", "meta_desc":"", "text":"", "jsonld_types":[], "jsonld_menu_items":[]}
+
+  def classify(store: Dict[str, Any], scraped: Dict[str, Any]) -> Dict[str, Any]:
+    """Type and cuisine for one store, given its scraped page (or EMPTY_SCRAPE)."""
+    # Shared model: one text per store, vectorized at most once for both heads
+    shared_text, shared_row = "", None
+    if use_shared:
+      shared_text = build_text(store, scraped, args.max_tokens)
+      shared_row = lazy_transform(lambda: models().vectorizer, shared_text)
 
     # TYPE
     type_rule = apply_type_rules(store, args.type_map)
     type_pred, type_conf, type_source = "", 0.0, ""
     if type_rule:
       type_pred, type_conf, type_source = type_rule, 1.0, "osm_rule"
-    elif type_model is not None:
-      scraped = {"title":"", "meta_desc":"", "text":"", "jsonld_types":[], "jsonld_menu_items":[]}
-      if args.scrape and store["website"]:
-        scraped = scrape_site(store["website"])
+    elif has_type_model() and shared_row is not None:
+      type_pred, type_conf = type_memo.get_or_compute(shared_text, lambda: predict_type(models().type_model, shared_row()))
+      type_source = "model"
+    elif has_type_model():
       text = " ".join([store.get("name",""), store.get("brand",""), store.get("website",""), scraped.get("title","")]).strip()
-      type_pred = type_model.predict([text])[0]
-      try:
-        proba = type_model.predict_proba([text])[0]
-        classes = list(type_model.classes_)
-        type_conf = float(proba[classes.index(type_pred)])
-      except Exception:
-        type_conf = 0.6
+      type_pred, type_conf = type_memo.get_or_compute(text, lambda: predict_type(models().type_model, [text]))
       type_source = "model"
 
     # CUISINE
-    cuisine_source, cuisine_pred, cuisine_conf = "", [], []
+    cuisine_source, cuisine_pred, cuisine_conf, gazetteer_hit = "", [], [], False
     if store["cuisine"]:
       cuisine_source = "osm_rule"
       cuisine_pred = [c.strip() for c in re.split(r"[;,\|]+", store["cuisine"].lower()) if c.strip()]
       cuisine_conf = [1.0]*len(cuisine_pred)
     else:
       hints = brand_cuisine_from_name((store.get("name") or "") + " " + (store.get("brand") or ""))
-      scraped = {"title":"", "meta_desc":"", "text":"", "jsonld_types":[], "jsonld_menu_items":[]}
-      if args.scrape and store["website"]:
-        scraped = scrape_site(store["website"])
+      if scraped.get("title") or scraped.get("meta_desc"):
         hints = sorted(set(hints + brand_cuisine_from_name(" ".join([scraped.get("title",""), scraped.get("meta_desc","")]))))
-      text = build_text(store, scraped)
-      scores = cuisine_model.decision_function([text])
-      probs = 1 / (1 + np.exp(-scores))
-      probs = probs[0]
-      classes = list(cuisine_mlb.classes_)
-      keep = [(c, float(p)) for c, p in zip(classes, probs) if p >= 0.6]
+      gazetteer_hit = bool(hints)
+      if not has_cuisine_model():
+        keep = []
+      elif shared_row is not None:
+        keep = [tuple(x) for x in cuisine_memo.get_or_compute(
+          shared_text, lambda: predict_cuisine(models().cuisine_model, models().cuisine_mlb, shared_row()))]
+      else:
+        text = build_text(store, scraped, args.max_tokens)
+        keep = [tuple(x) for x in cuisine_memo.get_or_compute(
+          text, lambda: predict_cuisine(models().cuisine_model, models().cuisine_mlb, [text]))]
       hints_set = set(hints)
       for c in hints_set:
         if c not in [k for k,_ in keep]:
@@ -150,30 +251,84 @@ def main():
       if cuisine_pred:
         cuisine_source = "model"
 
-    enriched_tags = dict(tags)
-    if type_pred:
-      enriched_tags["type_pred"] = type_pred
-      enriched_tags["type_conf"] = round(type_conf, 3)
-      enriched_tags["type_source"] = type_source
-    if cuisine_pred:
-      enriched_tags["cuisine_pred"] = cuisine_pred
-      enriched_tags["cuisine_conf"] = [round(x,3) for x in cuisine_conf]
-      enriched_tags["cuisine_source"] = cuisine_source
-
-    out_el = dict(el)
-    out_el["tags"] = enriched_tags
-    enriched.append(out_el)
-
-  # Write with same top-level shape when possible
-  if isinstance(obj, dict) and "elements" in obj:
-    obj["elements"] = enriched
-    with open(args.out, "w", encoding="utf-8") as f:
-      json.dump(obj, f, ensure_ascii=False, indent=2)
-  else:
-    with open(args.out, "w", encoding="utf-8") as f:
-      json.dump(enriched, f, ensure_ascii=False, indent=2)
+    # Cascade confidence: rules and gazetteer hits are trusted, model output by its score
+    if type_source == "model":
+      type_certainty = type_conf
+    else:
+      type_certainty = 1.0
+    if cuisine_source == "osm_rule" or gazetteer_hit:
+      cuisine_certainty = 1.0
+    else:
+      cuisine_certainty = max(cuisine_conf) if cuisine_conf else 0.0
+    return {"type_pred": type_pred, "type_conf": type_conf, "type_source": type_source,
+            "cuisine_pred": cuisine_pred, "cuisine_conf": cuisine_conf, "cuisine_source": cuisine_source,
+            "certainty": min(type_certainty, cuisine_certainty)}
+
+  # Tiers 1-3: OSM rules, gazetteer and name/domain-only models for every store
+  results = [classify(table.store(i), EMPTY_SCRAPE) for i in range(len(table))]
+
+  # Tier 4: one scrape + full-text models, most uncertain pages first, within budget.
+  # Stores sharing a page (same canonical URL) are served by a single fetch.
+  if args.scrape:
+    from ai.src.utils.scrape_site import scrape_site
+    from ai.src.utils.scrape_planner import plan_scrapes
+    websites = table.strings["website"]
+    candidates = [i for i, res in enumerate(results) if websites[i] and res["certainty"] < args.confidence]
+    plan = plan_scrapes(((i, websites[i]) for i in candidates),
+                        max_pages_per_domain=args.max_pages_per_domain)
+    print(plan.report())
+    keys = plan.fetch_keys(priority=lambda refs: min(results[i]["certainty"] for i in refs))
+    started, fetched, requests, out_of_budget = time.perf_counter(), 0, 0, 0
+    for n, key in enumerate(keys):
+      if (args.scrape_budget is not None and fetched >= args.scrape_budget) or \
+         (args.scrape_seconds is not None and time.perf_counter() - started >= args.scrape_seconds):
+        out_of_budget = len(keys) - n
+        break
+      scraped = scrape_site(plan.pages[key]["url"], feature_cache=feature_cache)
+      fetched += 1
+      requests += scraped.get("requests", 0)
+      for i in plan.refs_for(key):
+        results[i] = classify(table.store(i), scraped)
+    with_site = sum(1 for i in range(len(table)) if websites[i])
+    print(f"Cascade: {with_site - len(candidates)} of {with_site} stores with a website were confident "
+          f"without scraping (>= {args.confidence}); scraped {fetched} sites ({requests} requests) for {len(candidates)} stores, "
+          f"{out_of_budget} pages left unscraped by the budget")
+
+  def prediction_tags(res: Dict[str, Any]) -> Dict[str, Any]:
+    tags = {}
+    if res["type_pred"]:
+      tags["type_pred"] = res["type_pred"]
+      tags["type_conf"] = round(res["type_conf"], 3)
+      tags["type_source"] = res["type_source"]
+    if res["cuisine_pred"]:
+      tags["cuisine_pred"] = res["cuisine_pred"]
+      tags["cuisine_conf"] = [round(x,3) for x in res["cuisine_conf"]]
+      tags["cuisine_source"] = res["cuisine_source"]
+    return tags
+
+  def enriched():
+    return table.iter_overpass(prediction_tags(res) for res in results)
+
+  print(type_memo.summary())
+  print(cuisine_memo.summary())
+  type_memo.close()
+  cuisine_memo.close()
+  if feature_cache is not None:
+    print(feature_cache.summary())
+    feature_cache.close()
+
+  if "postgres" in sinks:
+    counts = PostgresSink(args.pg_table).write(prediction_record(el) for el in enriched())
+    print(f"Postgres: {args.pg_table} staged {counts['staged']}, changed {counts['changed']}")
+
+  if "ndjson" in sinks:
+    changed = write_ndjson_delta((prediction_record(el) for el in enriched()), args.delta_out, args.delta_state)
+    print("Wrote:", args.delta_out, "Changed:", changed)
 
-  print("Wrote:", args.out, "Total:", len(enriched))
+  if "json" in sinks:
+    # Same top-level shape as the input: the export header around the elements, or a bare array
+    total = write_overpass(args.out, enriched(), header=table.header, indent=2)
+    print("Wrote:", args.out, "Total:", total)
 
 if __name__ == "__main__":
   main()
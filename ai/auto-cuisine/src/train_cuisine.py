@@ -1,17 +1,22 @@
-import argparse, os, ast, joblib, pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import MultiLabelBinarizer
-from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-from sklearn.multiclass import OneVsRestClassifier
+import argparse, os, sys, ast
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--data", required=True)
     ap.add_argument("--out", required=True)
     args = ap.parse_args()
+    # Loaded after argument parsing so --help and usage errors return immediately
+    import joblib, pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import MultiLabelBinarizer
+    from sklearn.pipeline import Pipeline
+    from sklearn.linear_model import LogisticRegression
+    from src.utils.holdout import split_frame
+    from sklearn.metrics import classification_report
+    from sklearn.multiclass import OneVsRestClassifier
+
     os.makedirs(args.out, exist_ok=True)
 
     df = pd.read_csv(os.path.join(args.data, "train_cuisine.csv"))
@@ -21,7 +26,10 @@ def main():
     Y = mlb.fit_transform(labels)
     X = df["text_seed"].fillna("")
 
-    Xtr, Xte, Ytr, Yte = train_test_split(X, Y, test_size=0.25, random_state=42)
+    # Fixed held-out stores (by id hash), the same ones bench_models.py scores on
+    train, test = split_frame(df)
+    is_test = df.index.isin(test.index)
+    Xtr, Xte, Ytr, Yte = X[~is_test], X[is_test], Y[~is_test], Y[is_test]
     pipe = Pipeline([
         ("tfidf", TfidfVectorizer(max_features=60000, ngram_range=(1,2))),
         ("clf", OneVsRestClassifier(LogisticRegression(max_iter=1000)))
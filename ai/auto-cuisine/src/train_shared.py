@@ -0,0 +1,85 @@
+"""
+Train the type and cuisine classifiers over one shared TF-IDF vectorizer.
+
+Writes models/shared_model.joblib with the vectorizer and both heads. When it
+is present in --models, enrich.py builds one text per store, vectorizes it once
+and feeds the same sparse row to both heads instead of running two pipelines.
+A head without enough labels to train is saved as None; shared_model.heads.json
+records which heads exist so enrich.py can tell without unpickling the bundle.
+"""
+import argparse, ast, json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", required=True)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--max_features", type=int, default=60000)
+    args = ap.parse_args()
+    # Loaded after argument parsing so --help and usage errors return immediately
+    import joblib, pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import MultiLabelBinarizer
+    from sklearn.linear_model import LogisticRegression
+    from src.utils.holdout import split_frame
+    from sklearn.metrics import classification_report
+    from sklearn.multiclass import OneVsRestClassifier
+
+    os.makedirs(args.out, exist_ok=True)
+
+    df = pd.read_csv(os.path.join(args.data, "stores_full.csv"))
+    df["text_seed"] = df["text_seed"].fillna("")
+    df["store_type_label"] = df["store_type_label"].fillna("").astype(str)
+    df["cuisine_labels"] = df["cuisine_labels"].apply(lambda s: ast.literal_eval(s) if isinstance(s,str) else (s or []))
+    df = df[(df["store_type_label"].str.len() > 0) | (df["cuisine_labels"].apply(len) > 0)]
+
+    # One split for both heads so neither sees the other's test rows through the vocabulary;
+    # the held-out stores are fixed by id hash, the same ones bench_models.py scores on
+    train, test = split_frame(df)
+    vec = TfidfVectorizer(max_features=args.max_features, ngram_range=(1,2))
+    vec.fit(train["text_seed"])
+
+    type_train = train[train["store_type_label"].str.len() > 0]
+    type_test = test[test["store_type_label"].str.len() > 0]
+    type_clf = None
+    if type_train["store_type_label"].nunique() > 1:
+        type_clf = LogisticRegression(max_iter=1000)
+        type_clf.fit(vec.transform(type_train["text_seed"]), type_train["store_type_label"])
+        if len(type_test):
+            print("=== Type ===")
+            print(classification_report(type_test["store_type_label"],
+                                        type_clf.predict(vec.transform(type_test["text_seed"])), zero_division=0))
+    else:
+        print("Only one store type in training data; type head skipped.")
+
+    mlb = MultiLabelBinarizer()
+    cuisine_train = train[train["cuisine_labels"].apply(len) > 0]
+    cuisine_test = test[test["cuisine_labels"].apply(len) > 0]
+    cuisine_clf = None
+    if len({c for labels in cuisine_train["cuisine_labels"] for c in labels}) > 1:
+        Ytr = mlb.fit_transform(cuisine_train["cuisine_labels"])
+        cuisine_clf = OneVsRestClassifier(LogisticRegression(max_iter=1000))
+        cuisine_clf.fit(vec.transform(cuisine_train["text_seed"]), Ytr)
+        if len(cuisine_test):
+            print("=== Cuisine ===")
+            Yte = mlb.transform(cuisine_test["cuisine_labels"])
+            print(classification_report(Yte, cuisine_clf.predict(vec.transform(cuisine_test["text_seed"])),
+                                        zero_division=0))
+            print("Labels:", mlb.classes_)
+    else:
+        print("Fewer than two cuisine labels in training data; cuisine head skipped.")
+        mlb = None
+
+    # Only kept for introspection; can be as large as the vocabulary
+    if hasattr(vec, "stop_words_"):
+        del vec.stop_words_
+    out_path = os.path.join(args.out, "shared_model.joblib")
+    joblib.dump({"vectorizer": vec, "type_clf": type_clf, "cuisine_clf": cuisine_clf, "cuisine_mlb": mlb}, out_path)
+    with open(os.path.join(args.out, "shared_model.heads.json"), "w", encoding="utf-8") as f:
+        json.dump({"type": type_clf is not None, "cuisine": cuisine_clf is not None}, f)
+    print("Vocabulary:", len(vec.vocabulary_))
+    print("Saved:", out_path)
+
+if __name__ == "__main__":
+    main()
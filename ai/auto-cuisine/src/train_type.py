@@ -1,22 +1,30 @@
-import argparse, os, joblib, pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+import argparse, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--data", required=True)
     ap.add_argument("--out", required=True)
     args = ap.parse_args()
+    # Loaded after argument parsing so --help and usage errors return immediately
+    import joblib, pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
+    from sklearn.linear_model import LogisticRegression
+    from src.utils.holdout import one_sided_labels, split_frame
+    from sklearn.metrics import classification_report
+
     os.makedirs(args.out, exist_ok=True)
 
     df = pd.read_csv(os.path.join(args.data, "train_type.csv"))
-    X = df["text_seed"].fillna("")
-    y = df["store_type_label"].astype(str)
-
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    # Fixed held-out stores (by id hash), the same ones bench_models.py scores on
+    train, test = split_frame(df)
+    Xtr, Xte = train["text_seed"].fillna(""), test["text_seed"].fillna("")
+    ytr, yte = train["store_type_label"].astype(str), test["store_type_label"].astype(str)
+    # Unlike the old stratified split, the hash split can leave a rare label on one side only
+    for label, (n_train, n_test) in one_sided_labels(ytr, yte).items():
+        print(f"Warning: label {label!r} has {n_train} training and {n_test} held-out rows")
     pipe = Pipeline([
         ("tfidf", TfidfVectorizer(max_features=50000, ngram_range=(1,2))),
         ("clf", LogisticRegression(max_iter=1000, n_jobs=None))
@@ -0,0 +1,10 @@
+import os, sys
+
+# The HTTP client, the Overpass reader and the database settings live in the repo-wide
+# punchfast_common package; realpath because bench_startup and run_pipeline import this
+# tree through a symlinked package root
+_here = os.path.dirname(os.path.realpath(__file__))
+SHARED_DIR = os.path.join(_here, os.pardir, os.pardir, os.pardir, os.pardir, "shared")
+SHARED_DIR = os.path.normpath(SHARED_DIR)
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
@@ -0,0 +1,156 @@
+"""
+Boilerplate-stripped, token-budgeted page text for the type/cuisine models.
+
+``page_blocks()`` splits a parsed page into text blocks (headings, paragraphs,
+list items, table cells) after dropping page chrome: <nav>, <footer>, <aside>,
+<form> and elements whose id/class marks them as cookie banners, navigation,
+social widgets or legal text. Each block is a ``[kind, text]`` pair:
+
+  heading  h1-h6
+  menu     a block inside a menu section, or one that carries a price
+  text     everything else
+
+``site_blocks()`` merges the pages of one site: a block seen on more than one
+page is template copy (shared header/footer text) and is dropped, as are short
+blocks matching BOILERPLATE. ``budget_text()`` builds the model input from
+weighted parts in priority order and stops at a token budget, so vectorizing a
+store costs the same whether its site is one page or a 200-dish menu.
+"""
+import re
+from collections import Counter
+from typing import Iterable, List, Sequence, Tuple
+
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BLOCK_TAGS = HEADINGS | {
+    "p", "li", "td", "th", "dt", "dd", "tr", "ul", "ol", "dl", "table", "blockquote", "figcaption",
+    "caption", "pre", "address", "div", "section", "article", "main", "body",
+}
+CHROME_TAGS = ["nav", "footer", "aside", "form", "iframe", "svg", "button", "select", "template"]
+CHROME_ATTR = re.compile(
+    r"(^|[-_ ])(cookies?|consent|gdpr|newsletter|popup|modal|breadcrumbs?|footer|navbar|nav|social|share|"
+    r"skip-?link|copyright|legal)([-_ ]|$)", re.I)
+MENU_ATTR = re.compile(r"(^|[-_ ])(menu-?(section|category|list|group)|dish(es)?|food-?menu|price-?list)([-_ ]|$)", re.I)
+PRICE = re.compile(r"(?:[$€£]\s?\d{1,4}(?:[.,]\d{2})?\b|\b\d{1,4}[.,]\d{2}\s?(?:€|eur\b|kr\b|\$))", re.I)
+BOILERPLATE = re.compile(
+    r"\b(cookies?|all rights reserved|privacy|terms (of use|of service|and conditions)|copyright|powered by|"
+    r"enable javascript|sign up|subscribe|newsletter|skip to (main )?content)\b|©", re.I)
+BOILERPLATE_MAX_WORDS = 40
+# Same token rule as the TfidfVectorizer default, so the budget counts what it counts
+TOKEN = re.compile(r"(?u)\b\w\w+\b")
+
+def _attr_text(el) -> str:
+    attrs = getattr(el, "attrs", None) or {}
+    classes = attrs.get("class") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return " ".join(list(classes) + [attrs.get("id") or ""])
+
+def strip_chrome(soup):
+    """Remove navigation, footers, banners and other page chrome from ``soup`` in place."""
+    for el in soup(CHROME_TAGS):
+        el.extract()
+    # <body class="cookie-banner-open"> and friends must not take the whole page with them
+    doomed = [el for el in soup.find_all(True)
+              if el.name not in ("html", "body", "main") and CHROME_ATTR.search(_attr_text(el))]
+    for el in doomed:
+        el.extract()
+
+def _block_of(string):
+    node = string.parent
+    while node is not None and node.name not in BLOCK_TAGS:
+        node = node.parent
+    return node
+
+def _in_menu_section(node) -> bool:
+    while node is not None and node.name not in ("body", "html", "[document]"):
+        if MENU_ATTR.search(_attr_text(node)):
+            return True
+        node = node.parent
+    return False
+
+def page_blocks(soup) -> List[List[str]]:
+    """[kind, text] blocks in page order, without chrome or in-page repeats (mutates ``soup``)."""
+    for bad in soup(["script", "style", "noscript"]):
+        bad.extract()
+    strip_chrome(soup)
+    groups, order = {}, []
+    for s in soup.find_all(string=True):
+        if type(s).__name__ != "NavigableString":
+            continue  # comments, doctype, CDATA
+        block = _block_of(s)
+        if block is None:
+            continue
+        if id(block) not in groups:
+            groups[id(block)] = (block, [])
+            order.append(id(block))
+        groups[id(block)][1].append(s)
+    blocks, seen = [], set()
+    for key in order:
+        block, strings = groups[key]
+        text = re.sub(r"\s+", " ", " ".join(strings)).strip()
+        if len(text) < 2 or text.lower() in seen:
+            continue
+        seen.add(text.lower())
+        if block.name in HEADINGS:
+            kind = "heading"
+        elif PRICE.search(text) or _in_menu_section(block):
+            kind = "menu"
+            # A bare price in its own element belongs to the dish named just before it
+            if len(text.split()) <= 3 and blocks and blocks[-1][0] == "text":
+                blocks[-1][0] = "menu"
+        else:
+            kind = "text"
+        blocks.append([kind, text])
+    return blocks
+
+def is_boilerplate(text: str) -> bool:
+    return bool(BOILERPLATE.search(text)) and len(text.split()) <= BOILERPLATE_MAX_WORDS
+
+def site_blocks(pages: Sequence[Sequence[Sequence[str]]]) -> List[List[str]]:
+    """Blocks of all of a site's pages, minus template blocks repeated across pages and boilerplate."""
+    seen_on = Counter(key for blocks in pages for key in {text.lower() for _, text in blocks})
+    merged, seen = [], set()
+    for blocks in pages:
+        for kind, text in blocks:
+            key = text.lower()
+            if key in seen or (len(pages) > 1 and seen_on[key] > 1) or is_boilerplate(text):
+                continue
+            seen.add(key)
+            merged.append([kind, text])
+    return merged
+
+def blocks_text(blocks: Iterable[Sequence[str]]) -> str:
+    return " ".join(text for _, text in blocks)
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN.findall(text or ""))
+
+def _head(text: str, n_tokens: int) -> str:
+    """``text`` up to the end of its n-th token."""
+    end = 0
+    for i, m in enumerate(TOKEN.finditer(text)):
+        if i == n_tokens:
+            break
+        end = m.end()
+    return text[:end]
+
+def budget_text(parts: Iterable[Tuple[str, int]], max_tokens: int = None) -> str:
+    """Join (text, weight) parts, each repeated ``weight`` times, until ``max_tokens`` tokens are used.
+
+    Parts come in priority order: whatever doesn't fit is cut from the end.
+    """
+    out, used = [], 0
+    for text, weight in parts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        n = count_tokens(text)
+        for _ in range(max(weight, 1)):
+            if max_tokens is not None and used + n > max_tokens:
+                head = _head(text, max_tokens - used)
+                if head:
+                    out.append(head)
+                return " ".join(out)
+            out.append(text)
+            used += n
+    return " ".join(out)
@@ -0,0 +1,58 @@
+"""
+SQLite cache of the compact records extracted from scraped pages.
+
+Entries are keyed by the SHA-256 of the page HTML and the extractor version,
+so a page is only parsed again when its content or the extraction code
+changes (bump ``EXTRACTOR_VERSION`` in scrape_site.py for the latter).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Optional
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256((html or "").encode("utf-8", "replace")).hexdigest()
+
+class FeatureCache:
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS page_features (
+                content_hash TEXT NOT NULL,
+                extractor_version TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (content_hash, extractor_version)
+            )
+        """)
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+    def get(self, key: str, version: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute(
+            "SELECT record FROM page_features WHERE content_hash = ? AND extractor_version = ?",
+            (key, version)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, version: str, record: Dict[str, Any]):
+        self.db.execute("INSERT OR REPLACE INTO page_features VALUES (?, ?, ?)",
+                        (key, version, json.dumps(record, ensure_ascii=False)))
+        self._pending += 1
+        if self._pending >= 100:
+            self.db.commit()
+            self._pending = 0
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"feature cache: {self.hits} hits, {self.misses} parsed ({rate:.1%} hit rate)"
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
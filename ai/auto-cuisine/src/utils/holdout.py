@@ -0,0 +1,30 @@
+"""
+Fixed train / held-out assignment shared by the trainers and the model benchmark.
+
+A record is held out when the hash of its key (the OSM id for store rows, the
+canonical page key for corpus pages) falls in the first ``fraction`` of the
+hash space. The assignment depends on nothing but the key, so a store stays on
+the same side when the export grows or is reordered, and every model family
+is scored on the same stores.
+"""
+import hashlib
+from collections import Counter
+
+HOLDOUT_FRACTION = 0.25
+SALT = "auto-cuisine-holdout-1"
+
+def in_holdout(key, fraction: float = HOLDOUT_FRACTION) -> bool:
+    digest = hashlib.blake2b(f"{SALT}:{key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") < fraction * 2 ** 64
+
+def split_frame(df, key: str = "id", fraction: float = HOLDOUT_FRACTION):
+    """(train, holdout) rows of a DataFrame, by the hash of its ``key`` column."""
+    mask = df[key].astype(str).map(lambda k: in_holdout(k, fraction)).to_numpy(dtype=bool)
+    return df[~mask], df[mask]
+
+def one_sided_labels(train_labels, holdout_labels):
+    """Labels missing from one side of a split, as {label: (train rows, held-out rows)}."""
+    train_counts, holdout_counts = Counter(train_labels), Counter(holdout_labels)
+    return {label: (train_counts[label], holdout_counts[label])
+            for label in sorted(set(train_counts) | set(holdout_counts))
+            if not train_counts[label] or not holdout_counts[label]}
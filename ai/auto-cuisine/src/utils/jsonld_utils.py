@@ -2,9 +2,14 @@ import json
 from bs4 import BeautifulSoup
 
 def extract_jsonld(html: str):
+    try:
+        return extract_jsonld_from_soup(BeautifulSoup(html, "lxml"))
+    except Exception:
+        return []
+
+def extract_jsonld_from_soup(soup):
     out = []
     try:
-        soup = BeautifulSoup(html, "lxml")
         for tag in soup.find_all("script", {"type": "application/ld+json"}):
             try:
                 data = json.loads(tag.text.strip())
@@ -21,6 +26,7 @@ def extract_jsonld(html: str):
 def harvest_schema_cues(jsonlds):
     types = set()
     menu_items = []
+    menu_urls = []
     try:
         for obj in jsonlds:
             t = obj.get("@type")
@@ -30,6 +36,13 @@ def harvest_schema_cues(jsonlds):
                         types.add(x.lower())
             elif isinstance(t, str):
                 types.add(t.lower())
+            # Restaurant pages point at their menu page with hasMenu/menu as a URL
+            for key in ("hasMenu", "menu"):
+                val = obj.get(key)
+                if isinstance(val, dict):
+                    val = val.get("url") or val.get("@id")
+                if isinstance(val, str) and (val.startswith(("http://", "https://", "/"))):
+                    menu_urls.append(val)
             # menu-ish
             if obj.get("@type") in ("Menu","MenuSection","MenuItem") or "Menu" in str(obj.get("@type")):
                 name = obj.get("name")
@@ -45,4 +58,4 @@ def harvest_schema_cues(jsonlds):
                                     menu_items.append(nm.lower())
     except Exception:
         pass
-    return {"types": list(types), "menu_items": list(set(menu_items))}
+    return {"types": list(types), "menu_items": list(set(menu_items)), "menu_urls": sorted(set(menu_urls))}
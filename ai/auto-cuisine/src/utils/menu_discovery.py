@@ -0,0 +1,115 @@
+"""
+Ranked discovery of menu subpages for scrape_site().
+
+Candidate links from the homepage (and the JSON-LD ``hasMenu``/``menu`` URL,
+and ``sitemap.xml`` when the homepage offers nothing strong) are canonicalized
+with the scrape planner's URL rules, deduplicated, and scored:
+
+  * pattern strength of the path: an explicit menu page beats food/drinks
+    sections, which beat generic ordering pages; a "menu" anchor text adds to it,
+  * origin: links on the store's own registered domain get a bonus, while
+    third-party pages (ordering platforms) are scaled down below the weakest
+    same-site candidate and are never strong, so they are only fetched when
+    the site itself offers nothing better,
+  * files (PDF, images) and the homepage itself are never candidates.
+
+``enough_signal()`` is the stopping rule: once the collected pages carry
+enough JSON-LD menu items or text, no further subpage is fetched.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from .scrape_planner import canonical_key, normalize_url, registered_domain
+
+# (pattern on the URL path, score); the highest matching pattern counts
+MENU_PATTERNS = [
+    (re.compile(r"/(our-?|food-?|dinner-?|lunch-?|full-?)?menus?(/|\.html?|$|[-_?])", re.I), 3.0),
+    (re.compile(r"/locations?/.+/menu", re.I), 3.0),
+    (re.compile(r"/(food|dishes|drinks|specials|catering)(/|\.html?|$|[-_?])", re.I), 2.0),
+    (re.compile(r"/order(-?online)?(/|\.html?|$|[-_?])", re.I), 1.0),
+]
+JSONLD_MENU_SCORE = 4.0
+ANCHOR_BONUS = 0.5
+SAME_SITE_BONUS = 1.0
+# Best third-party score (JSON-LD menu, 4.0) * 0.25 = 1.0 stays under the weakest
+# same-site one (sitemap /order page: 1.0 - SITEMAP_PENALTY + SAME_SITE_BONUS = 1.5)
+THIRD_PARTY_SCALE = 0.25
+SITEMAP_PENALTY = 0.5
+STRONG_SCORE = 3.0
+SKIP_EXTENSIONS = re.compile(r"\.(pdf|jpe?g|png|gif|webp|svg|zip|docx?|mp4)$", re.I)
+LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.I)
+XML_TYPES = ("application/xml", "text/xml", "application/x-xml", "text/plain")
+
+def path_score(url: str) -> float:
+    path = urlsplit(url).path or "/"
+    return max((score for pattern, score in MENU_PATTERNS if pattern.search(path)), default=0.0)
+
+def rank_candidates(base_url: str, links: Iterable[Tuple[str, str]], menu_urls: Iterable[str] = (),
+                    sitemap_urls: Iterable[str] = ()) -> List[Tuple[float, str]]:
+    """(score, url) for every distinct candidate, best first.
+
+    ``links`` are (href, anchor text) pairs from the page, ``menu_urls`` come
+    from JSON-LD and ``sitemap_urls`` from sitemap.xml.
+    """
+    base = normalize_url(base_url)
+    if not base:
+        return []
+    home_key = canonical_key(base)
+    site = registered_domain(base)
+    best: Dict[str, Tuple[float, str]] = {}
+
+    def consider(href: str, score: float):
+        href = (href or "").strip()
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            return
+        url = normalize_url(urljoin(base, href))
+        if not url or SKIP_EXTENSIONS.search(urlsplit(url).path):
+            return
+        key = canonical_key(url)
+        if key == home_key:
+            return
+        if registered_domain(url) == site:
+            score += SAME_SITE_BONUS
+        else:
+            score *= THIRD_PARTY_SCALE
+        if key not in best or score > best[key][0]:
+            best[key] = (score, url)
+
+    for url in menu_urls:
+        consider(url, JSONLD_MENU_SCORE)
+    for href, anchor in links:
+        score = path_score(urljoin(base, href or ""))
+        if re.search(r"\bmenus?\b", anchor or "", flags=re.I):
+            score = max(score, 1.0) + ANCHOR_BONUS
+        if score > 0:
+            consider(href, score)
+    for url in sitemap_urls:
+        score = path_score(url)
+        if score > 0:
+            consider(url, score - SITEMAP_PENALTY)
+    return sorted(best.values(), key=lambda x: (-x[0], x[1]))
+
+def sitemap_urls(base_url: str, fetch_xml, limit: int = 500) -> List[str]:
+    """Page URLs listed in /sitemap.xml (one level of sitemap index followed)."""
+    parts = urlsplit(normalize_url(base_url))
+    if not parts.netloc:
+        return []
+    body = fetch_xml(f"{parts.scheme}://{parts.netloc}/sitemap.xml")
+    if not body:
+        return []
+    locs = LOC.findall(body)
+    if re.search(r"<sitemapindex", body, flags=re.I):
+        # Page sitemaps are where menu pages live; post/product/image ones rarely help
+        children = sorted(locs, key=lambda u: (not re.search(r"page|menu", u, flags=re.I), u))[:2]
+        locs = []
+        for child in children:
+            locs.extend(LOC.findall(fetch_xml(child) or ""))
+    return locs[:limit]
+
+def enough_signal(scraped: Dict[str, Any], min_menu_items: int = 5, text_budget: int = 20000) -> bool:
+    return (len(set(scraped.get("jsonld_menu_items", []))) >= min_menu_items
+            or len(scraped.get("text", "")) >= text_budget)
+
+def has_strong_candidate(ranked: List[Tuple[float, str]]) -> bool:
+    return bool(ranked) and ranked[0][0] >= STRONG_SCORE
@@ -0,0 +1,129 @@
+"""
+Memo for model predictions, keyed by a hash of the normalized model input.
+
+Chain locations produce the same name/brand/domain text (and often the same
+scraped page), so most rows score identically. Inputs are lowercased and
+whitespace-collapsed before hashing, which is exactly what the TF-IDF
+vectorizers ignore anyway, so a memo hit always returns what the model would.
+The key also carries the model version, so retraining invalidates old entries.
+
+Lookups go through an in-process LRU first and then an optional SQLite file
+that survives between runs. With ``near_dup_distance`` set, long inputs (scraped
+pages) that miss both are matched by SimHash against inputs already scored in
+this process, so template-built pages within a few bits reuse one prediction.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# One connection per file, so several memos (type, cuisine) can share it
+_connections: Dict[str, sqlite3.Connection] = {}
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    path = os.path.abspath(db_path)
+    if path not in _connections:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        _connections[path] = conn
+    return _connections[path]
+
+def normalize_input(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+def model_version(*paths: str) -> str:
+    """Short content hash of the model artifacts that produce a prediction."""
+    h = hashlib.sha256()
+    for path in paths:
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()[:16]
+
+class PredictionMemo:
+    def __init__(self, namespace: str, version: str, capacity: int = 10000, db_path: Optional[str] = None,
+                 near_dup_distance: Optional[int] = None, near_dup_min_words: int = 50):
+        self.namespace = namespace
+        self.version = version
+        self.capacity = capacity
+        self._lru: "OrderedDict[str, Any]" = OrderedDict()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "near_dup_hits": 0, "misses": 0}
+        self._near = None
+        if near_dup_distance is not None and near_dup_distance >= 0:
+            # numpy-backed; only loaded when near-duplicate reuse is on
+            from . import simhash
+            self._simhash = simhash
+            self._near = simhash.SimHashIndex(near_dup_distance)
+        self.near_dup_min_words = near_dup_min_words
+        self._db = None
+        self._pending = 0
+        if db_path:
+            self._db = _connect(db_path)
+
+    def key(self, text: str) -> str:
+        payload = f"{self.namespace}\x1f{self.version}\x1f{normalize_input(text)}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: Any):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get_or_compute(self, text: str, compute: Callable[[], Any]) -> Any:
+        """Return the memoized prediction for ``text``, calling ``compute()`` on a miss.
+
+        Values must be JSON-serializable when the disk tier is enabled.
+        """
+        key = self.key(text)
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return self._lru[key]
+        if self._db is not None:
+            row = self._db.execute("SELECT value FROM memo WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+                self.stats["disk_hits"] += 1
+                return value
+        fp = None
+        if self._near is not None and self._simhash.word_count(text) >= self.near_dup_min_words:
+            fp = self._simhash.simhash(normalize_input(text))
+            found = self._near.query(fp)
+            if found is not None:
+                self.stats["near_dup_hits"] += 1
+                self._remember(key, found[1])
+                return found[1]
+        value = compute()
+        self.stats["misses"] += 1
+        self._remember(key, value)
+        if fp is not None:
+            self._near.add(fp, value)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO memo (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+            self._pending += 1
+            if self._pending >= 500:
+                self._db.commit()
+                self._pending = 0
+        return value
+
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        return (total - self.stats["misses"]) / total if total else 0.0
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{self.namespace} memo: {s['memory_hits']} memory hits, {s['disk_hits']} disk hits, "
+                f"{s['near_dup_hits']} near-duplicate hits, {s['misses']} misses ({self.hit_rate():.1%} hit rate)")
+
+    def close(self):
+        """Flush pending disk writes (the shared connection stays open)."""
+        if self._db is not None:
+            self._db.commit()
+            self._pending = 0
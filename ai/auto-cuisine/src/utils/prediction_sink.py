@@ -0,0 +1,166 @@
+"""
+Output sinks for enrichment predictions.
+
+``PostgresSink`` streams prediction rows into a temporary staging table with
+``COPY`` and merges them into ``store_predictions`` (keyed by OSM type/id, so
+it joins to ``food_places.osm_type/osm_id``) in one set-based statement; rows
+whose prediction did not change are left untouched.
+
+``write_ndjson_delta`` writes only the predictions that differ from the last
+run, using a small state file of per-store prediction hashes.
+
+psycopg2 is imported only when the Postgres sink is used. Connection settings
+come from ``punchfast_common.db_settings``, the same code
+``data-pipeline/scripts/db.py`` uses.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+from typing import Any, Dict, Iterable, Tuple
+
+PREDICTION_FIELDS = ["type_pred", "type_conf", "type_source", "cuisine_pred", "cuisine_conf", "cuisine_source"]
+
+
+def prediction_record(el: Dict[str, Any]) -> Dict[str, Any]:
+    """OSM key plus the prediction tags of one enriched element."""
+    tags = el.get("tags") or {}
+    rec = {"osm_type": el.get("type") or "node", "osm_id": el.get("id")}
+    for field in PREDICTION_FIELDS:
+        rec[field] = tags.get(field)
+    return rec
+
+
+def prediction_hash(rec: Dict[str, Any]) -> str:
+    payload = json.dumps([rec.get(f) for f in PREDICTION_FIELDS], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+# === NDJSON delta ===
+def write_ndjson_delta(records: Iterable[Dict[str, Any]], out_path: str, state_path: str) -> int:
+    """Write predictions that changed since the last run as NDJSON; return how many."""
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        state = {}
+
+    changed = 0
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as out:
+        for rec in records:
+            if rec.get("osm_id") is None:
+                continue
+            key = f"{rec['osm_type']}/{rec['osm_id']}"
+            h = prediction_hash(rec)
+            if state.get(key) == h:
+                continue
+            state[key] = h
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            changed += 1
+
+    tmp = state_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp, state_path)
+    return changed
+
+
+# === Postgres ===
+def _connect():
+    import psycopg2
+    from punchfast_common.db_settings import connection_kwargs
+
+    return psycopg2.connect(**connection_kwargs())
+
+
+def _pg_array(values) -> str:
+    """Postgres array literal for COPY, e.g. ``{"pizza","italian"}``."""
+    if not values:
+        return "{}"
+    items = []
+    for v in values:
+        s = str(v).replace("\\", "\\\\").replace('"', '\\"')
+        items.append(f'"{s}"')
+    return "{" + ",".join(items) + "}"
+
+
+def _copy_rows(records: Iterable[Dict[str, Any]]) -> Tuple[io.StringIO, int]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    n = 0
+    for rec in records:
+        if rec.get("osm_id") is None:
+            continue
+        writer.writerow([
+            rec["osm_type"], int(rec["osm_id"]),
+            rec.get("type_pred") or "", "" if rec.get("type_conf") is None else rec["type_conf"],
+            rec.get("type_source") or "",
+            _pg_array(rec.get("cuisine_pred")), _pg_array(rec.get("cuisine_conf")),
+            rec.get("cuisine_source") or "",
+        ])
+        n += 1
+    buf.seek(0)
+    return buf, n
+
+
+class PostgresSink:
+    def __init__(self, table: str = "store_predictions"):
+        self.table = table
+
+    def write(self, records: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """COPY into staging, then one merge; returns staged and changed row counts."""
+        buf, staged = _copy_rows(records)
+        conn = _connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    osm_type TEXT NOT NULL,
+                    osm_id BIGINT NOT NULL,
+                    type_pred TEXT,
+                    type_conf REAL,
+                    type_source TEXT,
+                    cuisine_pred TEXT[],
+                    cuisine_conf REAL[],
+                    cuisine_source TEXT,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (osm_type, osm_id)
+                );
+                CREATE TEMP TABLE staging_predictions (
+                    LIKE {self.table} EXCLUDING CONSTRAINTS
+                ) ON COMMIT DROP;
+                """)
+                cur.copy_expert(
+                    "COPY staging_predictions (osm_type, osm_id, type_pred, type_conf, type_source, "
+                    "cuisine_pred, cuisine_conf, cuisine_source) FROM STDIN WITH (FORMAT csv, NULL '')",
+                    buf,
+                )
+                cur.execute(f"""
+                INSERT INTO {self.table} AS p
+                    (osm_type, osm_id, type_pred, type_conf, type_source,
+                     cuisine_pred, cuisine_conf, cuisine_source)
+                SELECT DISTINCT ON (osm_type, osm_id)
+                    osm_type, osm_id, type_pred, type_conf, type_source,
+                    cuisine_pred, cuisine_conf, cuisine_source
+                FROM staging_predictions
+                ORDER BY osm_type, osm_id
+                ON CONFLICT (osm_type, osm_id) DO UPDATE SET
+                    type_pred = EXCLUDED.type_pred,
+                    type_conf = EXCLUDED.type_conf,
+                    type_source = EXCLUDED.type_source,
+                    cuisine_pred = EXCLUDED.cuisine_pred,
+                    cuisine_conf = EXCLUDED.cuisine_conf,
+                    cuisine_source = EXCLUDED.cuisine_source,
+                    updated_at = now()
+                WHERE (p.type_pred, p.type_conf, p.type_source, p.cuisine_pred, p.cuisine_conf, p.cuisine_source)
+                      IS DISTINCT FROM
+                      (EXCLUDED.type_pred, EXCLUDED.type_conf, EXCLUDED.type_source,
+                       EXCLUDED.cuisine_pred, EXCLUDED.cuisine_conf, EXCLUDED.cuisine_source);
+                """)
+                changed = cur.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return {"staged": staged, "changed": changed}
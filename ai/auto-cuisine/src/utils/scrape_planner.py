@@ -0,0 +1,121 @@
+"""
+Plan scrapes before any network I/O so each distinct page is fetched once.
+
+Store URLs are normalized (scheme added, host lowercased, ``www.``, default
+ports, fragments, tracking parameters and trailing slashes dropped, query
+sorted) and grouped by that canonical form; every group is fetched once and the
+result is fanned back out to all stores that reference it. Pages are also
+grouped by registered domain (franchise locations, plazas), which the report
+shows and which ``max_pages_per_domain`` can use to share one fetch across a
+chain's location pages.
+"""
+import functools
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid|msclkid|mc_cid|mc_eid|ref|yext.*)$", re.I)
+
+def normalize_url(url: str) -> str:
+    """Fetchable normalized URL, or "" when ``url`` is not usable."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    if not re.match(r"^[a-z][a-z0-9+.-]*://", url, flags=re.I):
+        url = "https://" + url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return ""
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return ""
+    host = parts.hostname.lower().rstrip(".")
+    if port == {"http": 80, "https": 443}[scheme]:
+        port = None
+    netloc = f"{host}:{port}" if port else host
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def canonical_key(normalized: str) -> str:
+    """Grouping key: the normalized URL without scheme and ``www.``."""
+    parts = urlsplit(normalized)
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    return host + parts.path + (("?" + parts.query) if parts.query else "")
+
+@functools.lru_cache(maxsize=None)
+def _extractor():
+    import tldextract
+    # Offline: only the public-suffix snapshot bundled with tldextract
+    return tldextract.TLDExtract(suffix_list_urls=())
+
+def registered_domain(url: str) -> str:
+    ext = _extractor()(url or "")
+    return ".".join(p for p in (ext.domain, ext.suffix) if p) or urlsplit(url).netloc
+
+class ScrapePlan:
+    def __init__(self):
+        self.pages: Dict[str, Dict[str, Any]] = {}    # canonical key -> {"url", "domain", "refs"}
+        self.ref_page: Dict[Any, str] = {}            # caller's reference -> canonical key
+        self.unusable: List[Any] = []
+        self.shared_with: Dict[str, str] = {}         # page collapsed into another page of its domain
+        self._collapsed: Dict[str, List[str]] = {}    # kept page -> pages that reuse its result
+
+    def add(self, ref: Any, url: str):
+        normalized = normalize_url(url)
+        if not normalized:
+            self.unusable.append(ref)
+            return
+        key = canonical_key(normalized)
+        page = self.pages.get(key)
+        if page is None:
+            page = self.pages[key] = {"url": normalized, "domain": registered_domain(normalized), "refs": []}
+        page["refs"].append(ref)
+        self.ref_page[ref] = key
+
+    def collapse_domains(self, max_pages_per_domain: int):
+        """Fetch at most N pages per registered domain; other pages reuse the first one's result."""
+        seen: Dict[str, List[str]] = {}
+        for key, page in self.pages.items():
+            kept = seen.setdefault(page["domain"], [])
+            if len(kept) < max_pages_per_domain:
+                kept.append(key)
+            else:
+                self.shared_with[key] = kept[0]
+                self._collapsed.setdefault(kept[0], []).append(key)
+
+    def fetch_keys(self, priority: Optional[Callable[[List[Any]], float]] = None) -> List[str]:
+        """Pages to fetch, ordered by ``priority(refs)`` (lowest first) if given."""
+        keys = [k for k in self.pages if k not in self.shared_with]
+        if priority is not None:
+            keys.sort(key=lambda k: priority(self.refs_for(k)))
+        return keys
+
+    def refs_for(self, key: str) -> List[Any]:
+        """Every reference served by fetching page ``key`` (its own and collapsed pages')."""
+        refs = list(self.pages[key]["refs"])
+        for other in self._collapsed.get(key, ()):
+            refs.extend(self.pages[other]["refs"])
+        return refs
+
+    def report(self) -> str:
+        refs = len(self.ref_page)
+        fetches = len(self.pages) - len(self.shared_with)
+        domains = len({p["domain"] for p in self.pages.values()})
+        ratio = 1 - fetches / refs if refs else 0.0
+        return (f"Scrape plan: {refs} store URLs -> {len(self.pages)} unique pages on {domains} domains, "
+                f"{fetches} fetches ({ratio:.1%} saved by dedup), {len(self.unusable)} unusable URLs")
+
+def plan_scrapes(refs_and_urls: Iterable, max_pages_per_domain: Optional[int] = None) -> ScrapePlan:
+    """Build a plan from ``(ref, url)`` pairs, e.g. ``enumerate(urls)``."""
+    plan = ScrapePlan()
+    for ref, url in refs_and_urls:
+        plan.add(ref, url)
+    if max_pages_per_domain:
+        plan.collapse_domains(max_pages_per_domain)
+    return plan
@@ -1,34 +1,51 @@
-import time, random, re, requests
+import time, random, re
 from typing import Dict, Any
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
-from .jsonld_utils import extract_jsonld, harvest_schema_cues
+from .jsonld_utils import extract_jsonld, extract_jsonld_from_soup, harvest_schema_cues
+from .content_extract import blocks_text, page_blocks, site_blocks
+from .feature_cache import content_hash
+from punchfast_common.http_client import default_client
+from .menu_discovery import (STRONG_SCORE, XML_TYPES, enough_signal, has_strong_candidate, path_score,
+                             rank_candidates, sitemap_urls)
 
-UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36"
+# Bump whenever extract_page() output changes, so cached records are re-extracted
+EXTRACTOR_VERSION = "3"
+MAX_LINK_CANDIDATES = 30
 
 def fetch(url: str, timeout=10) -> str:
-    if not url or not isinstance(url, str):
-        return ""
+    return default_client().fetch_html(url, timeout=timeout)
+
+def fetch_xml(url: str, timeout=8) -> str:
     try:
-        resp = requests.get(url, headers={"User-Agent": UA}, timeout=timeout)
-        if resp.status_code == 200 and resp.text:
-            return resp.text
+        res = default_client().fetch(url, timeout=timeout, allowed_types=XML_TYPES)
     except Exception:
-        pass
-    return ""
+        return ""
+    return res.text if res.ok else ""
 
-LIKELY_MENU_PATTERNS = [r"/menu", r"/our-?menu", r"/food", r"/order", r"/order-?online", r"/locations/.+/menu"]
+def menu_link_candidates(soup):
+    """[href, anchor text] for links whose path or text looks menu-related (ranked later)."""
+    found = {}
+    for a in soup.find_all("a", href=True):
+        href = a["href"].strip()
+        if href in found:
+            continue
+        text = re.sub(r"\s+", " ", a.get_text(" ")).strip()[:80]
+        if path_score(urljoin("https://x/", href)) > 0 or re.search(r"\bmenus?\b", text, flags=re.I):
+            found[href] = text
+            if len(found) >= MAX_LINK_CANDIDATES:
+                break
+    return [[href, text] for href, text in found.items()]
 
-def find_menu_links(html: str):
-    links = set()
+def find_menu_links(html: str, base_url: str = "https://localhost/", limit: int = 3):
+    """Best-ranked menu page URLs linked from ``html``."""
     try:
         soup = BeautifulSoup(html, "lxml")
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if any(re.search(p, href, flags=re.I) for p in LIKELY_MENU_PATTERNS):
-                links.add(href)
+        cues = harvest_schema_cues(extract_jsonld_from_soup(soup))
+        ranked = rank_candidates(base_url, menu_link_candidates(soup), cues.get("menu_urls", []))
     except Exception:
-        pass
-    return list(links)[:3]
+        return []
+    return [url for _, url in ranked[:limit]]
 
 def visible_text(html: str) -> str:
     try:
@@ -40,37 +57,100 @@ def visible_text(html: str) -> str:
     except Exception:
         return ""
 
-def scrape_site(url: str) -> Dict[str, Any]:
-    out = {"url": url, "title": "", "meta_desc": "", "text": "", "jsonld_types": [], "jsonld_menu_items": []}
-    html = fetch(url)
-    if not html:
-        return out
+def extract_page(html: str) -> Dict[str, Any]:
+    """Everything scrape_site() needs from one page, from a single parse."""
+    rec = {"title": "", "meta_desc": "", "blocks": [], "jsonld_types": [], "jsonld_menu_items": [],
+           "menu_links": [], "menu_urls": []}
     try:
         soup = BeautifulSoup(html, "lxml")
+    except Exception:
+        return rec
+    try:
         if soup.title and soup.title.text:
-            out["title"] = soup.title.text.strip()
+            rec["title"] = soup.title.text.strip()
         md = soup.find("meta", attrs={"name": "description"})
         if md and md.get("content"):
-            out["meta_desc"] = md["content"].strip()
+            rec["meta_desc"] = md["content"].strip()
     except Exception:
         pass
+    # JSON-LD lives in <script> tags, so read it before scripts are stripped
+    cues = harvest_schema_cues(extract_jsonld_from_soup(soup))
+    rec["jsonld_types"] = cues.get("types", [])
+    rec["jsonld_menu_items"] = cues.get("menu_items", [])
+    rec["menu_urls"] = cues.get("menu_urls", [])
+    try:
+        rec["menu_links"] = menu_link_candidates(soup)
+    except Exception:
+        pass
+    try:
+        rec["blocks"] = page_blocks(soup)
+    except Exception:
+        pass
+    return rec
+
+def extract_page_cached(html: str, cache=None) -> Dict[str, Any]:
+    """extract_page() through an optional FeatureCache keyed by content hash + EXTRACTOR_VERSION."""
+    if cache is None:
+        return extract_page(html)
+    key = content_hash(html)
+    rec = cache.get(key, EXTRACTOR_VERSION)
+    if rec is None:
+        rec = extract_page(html)
+        cache.put(key, EXTRACTOR_VERSION, rec)
+    return rec
+
+def scrape_site(url: str, feature_cache=None, max_subpages: int = 3, min_menu_items: int = 5,
+                text_budget: int = 20000, use_sitemap: bool = True) -> Dict[str, Any]:
+    """Homepage plus the best-ranked menu subpages, stopping once there is enough menu signal.
+
+    ``blocks`` holds the site's content blocks with chrome, boilerplate and
+    cross-page template text removed; ``text`` is the same content joined.
+    """
+    out = {"url": url, "title": "", "meta_desc": "", "text": "", "blocks": [], "jsonld_types": [],
+           "jsonld_menu_items": [], "requests": 1}
+    html = fetch(url)
+    if not html:
+        return out
+    page = extract_page_cached(html, feature_cache)
+    out["title"] = page["title"]
+    out["meta_desc"] = page["meta_desc"]
+    pages = [page["blocks"]]
+    out["text"] = blocks_text(page["blocks"])
+    out["jsonld_types"] = list(page["jsonld_types"])
+    out["jsonld_menu_items"] = list(page["jsonld_menu_items"])
 
-    out["text"] = visible_text(html)
-    cues = harvest_schema_cues(extract_jsonld(html))
-    out["jsonld_types"] = cues.get("types", [])
-    out["jsonld_menu_items"] = cues.get("menu_items", [])
+    def counted_fetch_xml(u):
+        out["requests"] += 1
+        return fetch_xml(u)
 
-    from urllib.parse import urljoin
-    for href in find_menu_links(html):
-        link = urljoin(url, href) if href.startswith("/") else href
+    ranked = []
+    if not enough_signal(out, min_menu_items, text_budget):
+        ranked = rank_candidates(url, page["menu_links"], page.get("menu_urls", []))
+        # The sitemap costs a request, so it's only read when the homepage links are weak
+        if use_sitemap and not has_strong_candidate(ranked):
+            ranked = rank_candidates(url, page["menu_links"], page.get("menu_urls", []),
+                                     sitemap_urls(url, counted_fetch_xml))
+    # With a strong candidate only strong ones are tried, and one fetched menu page ends the walk
+    strong = has_strong_candidate(ranked)
+    if strong:
+        ranked = [c for c in ranked if c[0] >= STRONG_SCORE]
+    for _, link in ranked[:max_subpages]:
+        if enough_signal(out, min_menu_items, text_budget):
+            break
+        out["requests"] += 1
         sub_html = fetch(link, timeout=8)
         if not sub_html:
             continue
-        out["text"] += " " + visible_text(sub_html)
-        cues2 = harvest_schema_cues(extract_jsonld(sub_html))
-        out["jsonld_types"].extend(cues2.get("types", []))
-        out["jsonld_menu_items"].extend(cues2.get("menu_items", []))
+        sub = extract_page_cached(sub_html, feature_cache)
+        pages.append(sub["blocks"])
+        out["text"] += " " + blocks_text(sub["blocks"])
+        out["jsonld_types"].extend(sub["jsonld_types"])
+        out["jsonld_menu_items"].extend(sub["jsonld_menu_items"])
+        if strong:
+            break
 
+    out["blocks"] = site_blocks(pages)
+    out["text"] = blocks_text(out["blocks"])
     out["jsonld_types"] = sorted(set([t.lower() for t in out["jsonld_types"]]))
     out["jsonld_menu_items"] = sorted(set([t.lower() for t in out["jsonld_menu_items"]]))
     time.sleep(random.uniform(0.5, 1.5))
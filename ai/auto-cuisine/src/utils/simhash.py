@@ -0,0 +1,103 @@
+"""
+64-bit SimHash fingerprints for near-duplicate page text.
+
+Texts are shingled into overlapping word pairs; each shingle's 64-bit hash
+votes +count/-count on every bit and the sign of the tally is the fingerprint,
+so pages that share most of their text land within a few bits of each other.
+``SimHashIndex`` answers "any fingerprint within k bits?" by splitting the 64
+bits into k+1 bands: two fingerprints within k bits must agree exactly on at
+least one band (pigeonhole), so only same-band entries are compared.
+"""
+import hashlib
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+def shingles(text: str, width: int = 2) -> List[str]:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < width:
+        return words
+    return [" ".join(words[i:i + width]) for i in range(len(words) - width + 1)]
+
+def simhash(text: str, width: int = 2) -> int:
+    feats = shingles(text, width)
+    if not feats:
+        return 0
+    uniq, counts = np.unique(np.array(feats, dtype=object), return_counts=True)
+    hashes = np.array([int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little")
+                       for f in uniq], dtype=np.uint64)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = (counts[:, None] * (bits.astype(np.int64) * 2 - 1)).sum(axis=0)
+    fp = np.packbits(votes > 0, bitorder="little")
+    return int.from_bytes(fp.tobytes(), "little")
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def word_count(text: str) -> int:
+    return len(_WORD.findall(text or ""))
+
+class SimHashIndex:
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = np.linspace(0, 64, bands + 1).astype(int)
+        self._bands = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(edges[:-1], edges[1:])]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self.fingerprints: List[int] = []
+        self.values: List[Any] = []
+
+    def add(self, fp: int, value: Any = None) -> int:
+        idx = len(self.fingerprints)
+        self.fingerprints.append(fp)
+        self.values.append(value)
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((fp >> shift) & mask, []).append(idx)
+        return idx
+
+    def query(self, fp: int) -> Optional[Tuple[int, Any]]:
+        """Closest stored (index, value) within max_distance bits, or None."""
+        best, best_d = None, self.max_distance + 1
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            for idx in table.get((fp >> shift) & mask, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                d = hamming(fp, self.fingerprints[idx])
+                if d < best_d:
+                    best, best_d = idx, d
+                    if d == 0:
+                        return best, self.values[best]
+        return None if best is None else (best, self.values[best])
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+def dedupe_fingerprints(fingerprints: Iterable[Optional[int]], labels: Iterable[Any],
+                        max_distance: int = 3) -> List[int]:
+    """Indexes to keep: the first of each near-duplicate group per label.
+
+    A ``None`` fingerprint (text too short to fingerprint) is always kept.
+    """
+    index = SimHashIndex(max_distance)
+    keep = []
+    for i, (fp, label) in enumerate(zip(fingerprints, labels)):
+        if fp is None:
+            keep.append(i)
+            continue
+        found = index.query(fp)
+        # A near-duplicate with a different label is kept: the pair is label noise, not redundancy
+        if found is not None and found[1] == label:
+            continue
+        index.add(fp, label)
+        keep.append(i)
+    return keep
+
+def dedupe(texts: Iterable[str], labels: Iterable[Any], max_distance: int = 3, min_words: int = 50) -> List[int]:
+    """``dedupe_fingerprints`` over texts; texts shorter than ``min_words`` are always kept."""
+    fps = [simhash(t) if word_count(t) >= min_words else None for t in texts]
+    return dedupe_fingerprints(fps, labels, max_distance)
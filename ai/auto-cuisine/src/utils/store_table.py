@@ -0,0 +1,327 @@
+"""
+Columnar in-memory table of OSM stores.
+
+Instead of one dict per element (plus one per tag set, with every tag key
+repeated as its own string), a ``StoreTable`` keeps:
+
+  * ``types``/``ids``/``lat``/``lon`` in flat arrays (uint8/int64/float64),
+  * ``amenity``, ``shop`` and ``cuisine`` as int32 codes into interned value
+    lists (code 0 is the empty string, i.e. the tag is missing),
+  * ``name``, ``brand`` and ``website`` as offsets into one UTF-8 buffer,
+  * every tag, in its original order, as CSR rows: an int32 code into the
+    interned tag-key list and an int64 offset into a shared value buffer (or
+    ``FROM_COLUMN`` for the keys above, whose values live in their column),
+  * anything else on the element (``center``, ``nodes``, ``members``, or the
+    fields of a flat non-Overpass record) as a compact JSON string.
+
+Elements are read with ``overpass_stream.iter_elements``, so the parsed export
+is never held in memory as a whole. ``to_pandas()`` materializes selected
+columns and ``iter_overpass()``/``write_overpass()`` rebuild Overpass JSON one
+element at a time on output.
+"""
+import array
+import io
+import json
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from punchfast_common.overpass_stream import iter_elements, read_header, write_overpass
+
+TYPE_NAMES = ["node", "way", "relation"]
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+NO_TYPE = 255
+CATEGORY_KEYS = ("amenity", "shop", "cuisine")
+STRING_KEYS = ("name", "brand", "website")
+FROM_COLUMN = -1
+HAS_TAGS = 1
+HAS_ID = 2
+# Position of "tags" among the extra fields, so output keeps the input key order
+TAGS_MARKER = "\0tags"
+
+class Interner:
+    """Stable string -> int code mapping; code 0 is always the empty string."""
+    def __init__(self):
+        self.values: List[str] = [""]
+        self.codes: Dict[str, int] = {"": 0}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+class StringColumn:
+    """Append-only strings stored as one UTF-8 buffer plus int64 end offsets."""
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array.array("q", [0])
+
+    def append(self, value: str) -> int:
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+        return len(self.offsets) - 2
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def to_list(self) -> List[str]:
+        data, off = bytes(self.data), self.offsets
+        return [data[off[i]:off[i + 1]].decode("utf-8") for i in range(len(self))]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Store records from an Overpass export, a JSON array, a {"features"/"data"/"stores": [...]} object or NDJSON."""
+    found = False
+    for el in iter_elements(path):
+        found = True
+        yield el
+    if found:
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    try:
+        obj = json.loads(raw)
+    except ValueError:
+        obj = None
+    if isinstance(obj, dict):
+        for key in ("elements", "features", "data", "stores"):
+            if isinstance(obj.get(key), list):
+                yield from (x for x in obj[key] if isinstance(x, dict))
+                return
+        return
+    if obj is not None:
+        return
+    for line in io.StringIO(raw):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(rec, dict):
+            yield rec
+
+class StoreTable:
+    def __init__(self):
+        self.header: Optional[Dict[str, Any]] = None
+        self.types = array.array("B")
+        self.ids = array.array("q")
+        self.lat = array.array("d")
+        self.lon = array.array("d")
+        self.flags = array.array("B")
+        self.categories = {key: Interner() for key in CATEGORY_KEYS}
+        self.category_codes = {key: array.array("i") for key in CATEGORY_KEYS}
+        self.strings = {key: StringColumn() for key in STRING_KEYS}
+        self.tag_keys = Interner()
+        self.tag_ptr = array.array("q", [0])
+        self.tag_key = array.array("i")
+        self.tag_val = array.array("q")
+        self.tag_values = StringColumn()
+        self.extras = StringColumn()
+
+    # === Building ===
+    @classmethod
+    def from_file(cls, path: str) -> "StoreTable":
+        table = cls.from_elements(iter_records(path))
+        table.header = read_header(path)
+        return table
+
+    @classmethod
+    def from_elements(cls, elements: Iterable[dict]) -> "StoreTable":
+        table = cls()
+        for el in elements:
+            table.append(el)
+        return table
+
+    def append(self, el: dict):
+        tags = el.get("tags")
+        has_tags = isinstance(tags, dict)
+        tags = tags if has_tags else {}
+        extras = {}
+
+        type_code = TYPE_CODES.get(el.get("type"), NO_TYPE)
+        if type_code == NO_TYPE and "type" in el:
+            extras["type"] = el["type"]
+        self.types.append(type_code)
+        el_id = el.get("id")
+        flags = HAS_TAGS if has_tags else 0
+        if isinstance(el_id, int) and not isinstance(el_id, bool) and -2**63 <= el_id < 2**63:
+            self.ids.append(el_id)
+            flags |= HAS_ID
+        else:
+            self.ids.append(0)
+            if "id" in el:
+                extras["id"] = el_id
+        for key, col in (("lat", self.lat), ("lon", self.lon)):
+            value = el.get(key)
+            if isinstance(value, float):
+                col.append(value)
+            else:
+                col.append(math.nan)
+                if key in el:
+                    extras[key] = value
+        for key, value in el.items():
+            if key == "tags" and has_tags:
+                extras[TAGS_MARKER] = 0
+            elif key not in ("type", "id", "lat", "lon"):
+                extras[key] = value
+        if extras and TAGS_MARKER in extras and len(extras) == 1:
+            extras = {}
+        self.extras.append(json.dumps(extras, ensure_ascii=False, separators=(",", ":")) if extras else "")
+        self.flags.append(flags)
+
+        # Flat records (no tags dict) carry these fields at the top level
+        for key in CATEGORY_KEYS:
+            value = tags.get(key, el.get(key, "") if not has_tags else "")
+            self.category_codes[key].append(self.categories[key].code(value if isinstance(value, str) else ""))
+        for key in STRING_KEYS:
+            value = tags.get(key, el.get(key, "") if not has_tags else "")
+            self.strings[key].append(value if isinstance(value, str) else "")
+
+        for key, value in tags.items():
+            self.tag_key.append(self.tag_keys.code(key))
+            if (key in CATEGORY_KEYS or key in STRING_KEYS) and isinstance(value, str):
+                self.tag_val.append(FROM_COLUMN)
+            else:
+                # OSM tag values are strings; anything else is stored in its string form
+                self.tag_val.append(self.tag_values.append(value if isinstance(value, str) else str(value)))
+        self.tag_ptr.append(len(self.tag_key))
+
+    # === Row access ===
+    def __len__(self):
+        return len(self.ids)
+
+    def category(self, key: str, i: int) -> str:
+        return self.categories[key].values[self.category_codes[key][i]]
+
+    def string(self, key: str, i: int) -> str:
+        return self.strings[key][i]
+
+    def tags(self, i: int) -> Dict[str, Any]:
+        out = {}
+        keys = self.tag_keys.values
+        for j in range(self.tag_ptr[i], self.tag_ptr[i + 1]):
+            key = keys[self.tag_key[j]]
+            v = self.tag_val[j]
+            if v != FROM_COLUMN:
+                out[key] = self.tag_values[v]
+            elif key in CATEGORY_KEYS:
+                out[key] = self.category(key, i)
+            else:
+                out[key] = self.string(key, i)
+        return out
+
+    def _extras(self, i: int) -> Dict[str, Any]:
+        if self.extras.offsets[i + 1] == self.extras.offsets[i]:
+            return {}
+        return json.loads(self.extras[i])
+
+    def store(self, i: int) -> Dict[str, Any]:
+        """The flat per-store fields the classifiers use."""
+        lat, lon = self.lat[i], self.lon[i]
+        rec = {"id": self.ids[i] if self.flags[i] & HAS_ID else self._extras(i).get("id"),
+               "lat": None if math.isnan(lat) else lat, "lon": None if math.isnan(lon) else lon}
+        for key in STRING_KEYS:
+            rec[key] = self.string(key, i)
+        for key in CATEGORY_KEYS:
+            rec[key] = self.category(key, i)
+        return rec
+
+    def to_overpass(self, i: int, extra_tags: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Element ``i`` as an Overpass JSON dict, with ``extra_tags`` added to its tags."""
+        el: Dict[str, Any] = {}
+        extras = self._extras(i)
+        if self.types[i] != NO_TYPE:
+            el["type"] = TYPE_NAMES[self.types[i]]
+        if self.flags[i] & HAS_ID:
+            el["id"] = self.ids[i]
+        for key, col in (("lat", self.lat), ("lon", self.lon)):
+            if not math.isnan(col[i]):
+                el[key] = col[i]
+        tags = None
+        if self.flags[i] & HAS_TAGS or extra_tags is not None:
+            tags = self.tags(i)
+            if extra_tags:
+                tags.update(extra_tags)
+        for key, value in extras.items():
+            if key == TAGS_MARKER:
+                el["tags"] = tags
+            else:
+                el[key] = value
+        if tags is not None and "tags" not in el:
+            el["tags"] = tags
+        return el
+
+    def iter_overpass(self, extra_tags: Optional[Iterable[Optional[Dict[str, Any]]]] = None) -> Iterator[Dict[str, Any]]:
+        """Every element as Overpass JSON; ``extra_tags`` is one dict (or None) per row."""
+        extra = iter(extra_tags) if extra_tags is not None else None
+        for i in range(len(self)):
+            yield self.to_overpass(i, next(extra) if extra is not None else None)
+
+    # === Column access ===
+    def tag_column(self, key: str) -> List[str]:
+        """Value of tag ``key`` for every row ("" where missing)."""
+        if key in CATEGORY_KEYS:
+            values = np.array(self.categories[key].values, dtype=object)
+            return values[np.frombuffer(self.category_codes[key], dtype=np.int32)].tolist()
+        if key in STRING_KEYS:
+            return self.strings[key].to_list()
+        out = [""] * len(self)
+        code = self.tag_keys.codes.get(key)
+        if code is not None:
+            pos = np.flatnonzero(np.frombuffer(self.tag_key, dtype=np.int32) == code)
+            rows = np.searchsorted(np.frombuffer(self.tag_ptr, dtype=np.int64), pos, side="right") - 1
+            for r, p in zip(rows.tolist(), pos.tolist()):
+                out[r] = self.tag_values[self.tag_val[p]]
+        # Flat records keep their fields at the top level
+        flags = np.frombuffer(self.flags, dtype=np.uint8)
+        for r in np.flatnonzero((flags & HAS_TAGS) == 0).tolist():
+            value = self._extras(r).get(key)
+            if isinstance(value, str):
+                out[r] = value
+        return out
+
+    def to_pandas(self, columns: Optional[List[str]] = None, rename: Optional[Dict[str, str]] = None):
+        """DataFrame of the given columns: id, type, lat, lon, the interned/string keys or any tag key.
+
+        Interned keys come out as ``pd.Categorical`` sharing the table's value lists.
+        """
+        import pandas as pd
+        columns = columns or ["id", "lat", "lon", *STRING_KEYS, *CATEGORY_KEYS]
+        data = {}
+        for col in columns:
+            if col == "id":
+                data[col] = np.frombuffer(self.ids, dtype=np.int64).copy()
+            elif col == "type":
+                names = np.array(TYPE_NAMES + [""] * (NO_TYPE + 1 - len(TYPE_NAMES)), dtype=object)
+                data[col] = names[np.frombuffer(self.types, dtype=np.uint8)]
+            elif col in ("lat", "lon"):
+                data[col] = np.frombuffer(getattr(self, col), dtype=np.float64).copy()
+            elif col in CATEGORY_KEYS:
+                data[col] = pd.Categorical.from_codes(np.frombuffer(self.category_codes[col], dtype=np.int32),
+                                                      categories=self.categories[col].values)
+            else:
+                data[col] = self.tag_column(col)
+        df = pd.DataFrame(data)
+        return df.rename(columns=rename) if rename else df
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns (interned value lists excluded)."""
+        arrays = [self.types, self.ids, self.lat, self.lon, self.flags, self.tag_ptr, self.tag_key, self.tag_val,
+                  *self.category_codes.values()]
+        total = sum(a.itemsize * len(a) for a in arrays)
+        total += sum(c.nbytes for c in self.strings.values()) + self.tag_values.nbytes + self.extras.nbytes
+        return total
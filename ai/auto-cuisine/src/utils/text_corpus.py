@@ -0,0 +1,137 @@
+"""
+On-disk corpus of scraped page text for training, built incrementally.
+
+Layout of a corpus directory:
+
+    index.jsonl            one line per page: key, url, labels, status,
+                           content_hash, simhash, words, fetched_at, shard
+    shard-00000.jsonl.gz   {"key", "text"} lines for the pages with status "ok"
+
+Pages are buffered and written a shard at a time (to a temp file, then
+renamed); their index lines are appended only after the shard is in place, so
+an interrupted build loses at most the unflushed shard and never leaves the
+index pointing at missing text. A rerun skips every key already in the index,
+failed fetches included, and continues with the next shard number.
+"""
+import glob
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .feature_cache import content_hash
+
+INDEX_NAME = "index.jsonl"
+
+class TextCorpus:
+    def __init__(self, root: str, shard_size: int = 200, min_simhash_words: int = 50):
+        self.root = root
+        self.shard_size = shard_size
+        self.min_simhash_words = min_simhash_words
+        os.makedirs(root, exist_ok=True)
+        self.entries: List[Dict[str, Any]] = self._read_index()
+        self._keys: Set[str] = {e["key"] for e in self.entries}
+        shards = [e["shard"] for e in self.entries if e.get("shard") is not None]
+        self._next_shard = max(shards) + 1 if shards else 0
+        self._pending: List[Tuple[Dict[str, Any], Optional[str]]] = []
+        self.added = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, INDEX_NAME)
+
+    def _shard_path(self, n: int) -> str:
+        return os.path.join(self.root, f"shard-{n:05d}.jsonl.gz")
+
+    def _read_index(self) -> List[Dict[str, Any]]:
+        entries = []
+        if not os.path.exists(self.index_path):
+            return entries
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Torn last line from a killed process; its page is fetched again
+                    break
+        # Shards written after the last good index line are orphans; drop them
+        known = {e.get("shard") for e in entries}
+        for path in glob.glob(os.path.join(self.root, "shard-*.jsonl.gz*")):
+            name = os.path.basename(path)
+            n = name[len("shard-"):].split(".")[0]
+            if name.endswith(".tmp") or (n.isdigit() and int(n) not in known):
+                os.remove(path)
+        return entries
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, key: str, url: str, labels: List[str], text: Optional[str] = None, status: str = "ok"):
+        """Record a page; failures (no text) are recorded too so resumes don't refetch them."""
+        if key in self._keys:
+            return
+        entry = {
+            "key": key,
+            "url": url,
+            "labels": list(labels),
+            "status": status,
+            "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        if status == "ok":
+            from .simhash import simhash, word_count
+            entry["content_hash"] = content_hash(text)
+            entry["words"] = word_count(text)
+            entry["simhash"] = f"{simhash(text):016x}" if entry["words"] >= self.min_simhash_words else None
+        self._keys.add(key)
+        self._pending.append((entry, text if status == "ok" else None))
+        if sum(1 for _, t in self._pending if t is not None) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        texts = [(e, t) for e, t in self._pending if t is not None]
+        if texts:
+            n = self._next_shard
+            tmp = self._shard_path(n) + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                for entry, text in texts:
+                    f.write(json.dumps({"key": entry["key"], "text": text}, ensure_ascii=False) + "\n")
+                    entry["shard"] = n
+            os.replace(tmp, self._shard_path(n))
+            self._next_shard += 1
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            for entry, _ in self._pending:
+                entry.setdefault("shard", None)
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.extend(e for e, _ in self._pending)
+        self.added += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+
+    def ok_entries(self) -> List[Dict[str, Any]]:
+        return [e for e in self.entries if e["status"] == "ok"]
+
+    def iter_texts(self, keys: Optional[Set[str]] = None) -> Iterator[Tuple[str, str]]:
+        """(key, text) in index order, one shard in memory at a time."""
+        shards = sorted({e["shard"] for e in self.entries
+                         if e.get("shard") is not None and (keys is None or e["key"] in keys)})
+        for n in shards:
+            with gzip.open(self._shard_path(n), "rt", encoding="utf-8") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    if keys is None or rec["key"] in keys:
+                        yield rec["key"], rec["text"]
+
+    def summary(self) -> str:
+        ok = len(self.ok_entries())
+        return (f"corpus {self.root}: {len(self.entries)} pages indexed ({ok} with text, "
+                f"{len(self.entries) - ok} failed), {self._next_shard} shards, {self.added} added this run")
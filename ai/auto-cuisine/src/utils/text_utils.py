@@ -1,11 +1,12 @@
 import re
-import tldextract
 
 def normalize_whitespace(text: str) -> str:
     return re.sub(r"\s+", " ", text or "").strip()
 
 def tokenize_domain(url: str):
     try:
+        # Imported on first use: loading tldextract dominates the startup of short runs
+        import tldextract
         ext = tldextract.extract(url or "")
         host = ".".join([p for p in [ext.subdomain, ext.domain, ext.suffix] if p])
         tokens = re.split(r"[^a-z0-9]+", host.lower())
@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 
+from ingest_osm import classify_frame
+
 # === Setup paths ===
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -16,25 +18,8 @@ except FileNotFoundError:
     print(f"❌ Error: Could not find {input_csv}")
     exit()
 
-# === Classification rules ===
-def classify(row):
-    # Reject if missing name
-    if not row["Name"] or pd.isna(row["Name"]):
-        return "rejected"
-
-    # Reject if missing coordinates
-    if not row["Latitude"] or not row["Longitude"]:
-        return "rejected"
-
-    # Needs fixing if missing street
-    if not row["Street"] or pd.isna(row["Street"]):
-        return "needs_fix"
-
-    # Otherwise valid
-    return "valid"
-
-# === Apply classification ===
-df["Status"] = df.apply(classify, axis=1)
+# === Apply classification (vectorized rules shared with ingest_osm.py) ===
+df["Status"] = classify_frame(df)
 
 # === Save updated CSV ===
 df.to_csv(output_csv, index=False, encoding="utf-8")
@@ -1,20 +1,29 @@
-import json
-import pandas as pd
 import os
 
+import pandas as pd
+
+import shared_path  # noqa: F401
+from punchfast_common.overpass_stream import iter_elements
+
 # === Set up base directories ===
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+CHUNK_SIZE = 10000
 
-# === Load raw OSM JSON ===
+# === Load raw OSM JSON (streamed, one element at a time) ===
 json_path = os.path.join(DATA_DIR, "export.json")
+output_csv = os.path.join(DATA_DIR, "Portage_Food_Places.csv")
 
-with open(json_path, "r", encoding="utf-8") as f:
-    data = json.load(f)
 
-# === Extract relevant features ===
+def write_chunk(places, first):
+    pd.DataFrame(places).to_csv(output_csv, index=False, encoding="utf-8",
+                                mode="w" if first else "a", header=first)
+
+
+# === Extract relevant features, writing the CSV one chunk at a time ===
 places = []
-for el in data.get("elements", []):
+total = 0
+for el in iter_elements(json_path):
     tags = el.get("tags", {})
     if "name" in tags:
         places.append({
@@ -28,12 +37,13 @@ for el in data.get("elements", []):
             "Latitude": el.get("lat", ""),
             "Longitude": el.get("lon", "")
         })
-
-# === Convert to DataFrame and export ===
-df = pd.DataFrame(places)
-
-output_csv = os.path.join(DATA_DIR, "Portage_Food_Places.csv")
-df.to_csv(output_csv, index=False, encoding="utf-8")
+    if len(places) == CHUNK_SIZE:
+        write_chunk(places, total == 0)
+        total += len(places)
+        places = []
+if places or total == 0:
+    write_chunk(places, total == 0)
+    total += len(places)
 
 print(f"✅ CSV exported successfully: {output_csv}")
-print(f"Total places extracted: {len(df)}")
+print(f"Total places extracted: {total}")
@@ -0,0 +1,140 @@
+"""
+Shared PostgreSQL access for the pipeline scripts.
+
+Connection settings come from the environment, optionally seeded from
+``data-pipeline/.env`` and the repository ``.env`` (the same variables the
+server uses), and are resolved by ``punchfast_common.db_settings``, which the
+auto-cuisine prediction sink uses as well:
+
+    DATABASE_URL                      full DSN, wins over the fields below
+    DB_HOST / DB_PORT                 default 127.0.0.1 / 5432
+    POSTGRES_DB / POSTGRES_USER       default punchfast / postgres
+    POSTGRES_PASSWORD
+    DB_POOL_SIZE                      max pooled connections (default 4)
+    DB_FETCH_SIZE                     rows per server-side fetch (default 2000)
+
+Reads go through named (server-side) cursors so a script only ever holds one
+batch of rows in memory, and every streaming reader checks out its own pooled
+connection so writers and several worker threads can share one pool.
+"""
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+import shared_path  # noqa: F401
+from punchfast_common.db_settings import connection_kwargs, load_dotenv
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# === Settings ===
+def fetch_size():
+    load_dotenv()
+    return int(os.environ.get("DB_FETCH_SIZE", "2000"))
+
+
+# === Pool ===
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            size = int(os.environ.get("DB_POOL_SIZE", "4"))
+            _pool = ThreadedConnectionPool(1, max(2, size), **connection_kwargs())
+        return _pool
+
+
+def connect():
+    """Check out a pooled connection; hand it back with ``release()``."""
+    return get_pool().getconn()
+
+
+def release(conn):
+    if conn.closed:
+        get_pool().putconn(conn, close=True)
+        return
+    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    get_pool().putconn(conn)
+
+
+@contextmanager
+def connection():
+    conn = connect()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release(conn)
+
+
+def close_all():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+# === Streaming reads ===
+def iter_batches(query, params=None, batch_size=None):
+    """Yield lists of up to ``batch_size`` rows from a server-side cursor."""
+    batch_size = batch_size or fetch_size()
+    with connection() as conn:
+        with conn.cursor(name=f"pf_{uuid.uuid4().hex[:12]}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+def iter_rows(query, params=None, batch_size=None):
+    """Yield rows one by one while only ``batch_size`` are buffered client-side."""
+    for rows in iter_batches(query, params, batch_size):
+        yield from rows
+
+
+def iter_frames(query, params=None, batch_size=None):
+    """Yield pandas DataFrames of up to ``batch_size`` rows each."""
+    import pandas as pd
+
+    batch_size = batch_size or fetch_size()
+    with connection() as conn:
+        with conn.cursor(name=f"pf_{uuid.uuid4().hex[:12]}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                columns = [d[0] for d in cur.description]
+                yield pd.DataFrame(rows, columns=columns)
+
+
+def scalar(query, params=None):
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            row = cur.fetchone()
+    return row[0] if row else None
+
+
+# === Shared SQL ===
+def status_sql(name="name", street="street", lat="latitude", lon="longitude"):
+    """SQL twin of ingest_osm.classify_frame: 'rejected' / 'needs_fix' / 'valid' for the given columns."""
+    return f"""CASE
+        WHEN COALESCE(btrim({name}), '') = '' OR {lat} IS NULL OR {lon} IS NULL OR {lat} = 0 OR {lon} = 0
+            THEN 'rejected'
+        WHEN COALESCE(btrim({street}), '') = '' THEN 'needs_fix'
+        ELSE 'valid'
+    END"""
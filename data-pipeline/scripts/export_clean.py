@@ -0,0 +1,31 @@
+import db
+import os
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+output_csv = os.path.join(DATA_DIR, "final_clean_food_places.csv")
+
+# === Stream the deduplicated table into the final CSV ===
+query = """
+    SELECT id, name, type, cuisine, city, street, postcode, website,
+           latitude, longitude, status, master_id
+    FROM food_places
+    WHERE status <> 'duplicate'
+    ORDER BY id;
+"""
+
+try:
+    total = 0
+    for frame in db.iter_frames(query):
+        frame["master_id"] = frame["master_id"].astype("Int64")
+        frame.to_csv(output_csv, mode="a" if total else "w", header=not total, index=False, encoding="utf-8")
+        total += len(frame)
+except Exception as e:
+    print("❌ Export failed:")
+    print(e)
+    exit(1)
+finally:
+    db.close_all()
+
+print(f"✅ Exported {total} rows to: {output_csv}")
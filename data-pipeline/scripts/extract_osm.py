@@ -0,0 +1,319 @@
+"""
+Tiled, parallel Overpass extraction of the food places in a bounding box.
+
+The box is cut into ``--tile-deg`` tiles that are fetched by a small worker
+pool (the public Overpass instances allow about two concurrent requests per
+client). Every response is streamed straight into its own tile file, written
+under a temporary name and renamed once complete, so a rerun only fetches the
+tiles that are missing or older than ``--max-age-days`` (``--refresh``
+refetches everything). Rate limits and overload (429, 5xx, connection errors)
+are retried with exponential backoff, honouring Retry-After, by the shared
+``HttpClient`` (which also retries a response that breaks off midway); a tile whose
+query hits the Overpass timeout or memory limit is split into quadrants.
+
+The tiles are then merged into one export in the usual
+``{"version", "generator", "osm3s", "elements": [...]}`` shape for
+``ingest_osm.py``, ``clean_osm.py`` and ``enrich.py``. Elements that fall in
+several tiles (ways and relations crossing a tile edge) are written once,
+keyed by OSM type and id.
+
+``--endpoint`` points the fetcher at any Overpass-compatible URL, e.g. the
+canned local stand-in in ``overpass_standin.py``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+from osm_diff import element_key
+import shared_path  # noqa: F401
+from punchfast_common.http_client import HttpClient, IncompleteResponse
+from punchfast_common.overpass_stream import iter_elements, read_header, write_overpass
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+ENDPOINT = "https://overpass-api.de/api/interpreter"
+# Portage County, OH and surroundings: the extent of the current export
+DEFAULT_BBOX = "40.90,-81.60,41.30,-81.00"
+# Same tag filters as the original Overpass Turbo export; "out center" gives ways a center point
+DEFAULT_QUERY = """[out:json][timeout:{timeout}];
+(
+  nwr["amenity"~"^(restaurant|fast_food|cafe|bar|pub|ice_cream|food_court|public_bookcase)$"]({bbox});
+  nwr["shop"~"^(bakery|confectionery|pastry)$"]({bbox});
+);
+out center;
+"""
+# Overpass reports a query that ran out of time or memory as a remark after the elements
+REMARK = re.compile(r'"remark"\s*:\s*("(?:[^"\\]|\\.)*")')
+FAILED_REMARK = re.compile(r"runtime error|timed out|out of memory|Query run out", re.I)
+UA = "punchfast-data-pipeline/extract_osm"
+
+
+# === Tiles ===
+def parse_bbox(text):
+    south, west, north, east = (float(v) for v in text.split(","))
+    if south >= north or west >= east:
+        raise ValueError(f"bbox must be south,west,north,east: {text}")
+    return south, west, north, east
+
+
+def make_tiles(bbox, tile_deg):
+    """Row-major grid of (south, west, north, east) tiles covering ``bbox``."""
+    south, west, north, east = bbox
+    tiles = []
+    lat = south
+    while lat < north - 1e-9:
+        lon = west
+        top = min(round(lat + tile_deg, 7), north)
+        while lon < east - 1e-9:
+            right = min(round(lon + tile_deg, 7), east)
+            tiles.append((round(lat, 7), round(lon, 7), top, right))
+            lon = right
+        lat = top
+    return tiles
+
+
+def split_tile(tile):
+    south, west, north, east = tile
+    mid_lat = round((south + north) / 2, 7)
+    mid_lon = round((west + east) / 2, 7)
+    return [(south, west, mid_lat, mid_lon), (south, mid_lon, mid_lat, east),
+            (mid_lat, west, north, mid_lon), (mid_lat, mid_lon, north, east)]
+
+
+def tile_bbox(tile):
+    return ",".join(f"{v:g}" for v in tile)
+
+
+class TileStore:
+    """Tile files for one query: ``<query hash>_<bbox>.json`` plus ``.split`` markers.
+
+    Files written more than ``max_age`` seconds before this run started count
+    as missing, so a later extract fetches current data instead of reproducing
+    an old export; ``max_age=0`` refetches everything.
+    """
+
+    def __init__(self, directory, query, max_age=None):
+        self.directory = directory
+        self.query_id = hashlib.sha256(query.encode("utf-8")).hexdigest()[:10]
+        self.not_before = None if max_age is None else time.time() - max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, tile):
+        return os.path.join(self.directory, f"{self.query_id}_{tile_bbox(tile).replace(',', '_')}.json")
+
+    def _fresh(self, path):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        return self.not_before is None or mtime >= self.not_before
+
+    def done(self, tile):
+        return self._fresh(self.path(tile))
+
+    def was_split(self, tile):
+        return self._fresh(self.path(tile) + ".split")
+
+    def mark_split(self, tile):
+        with open(self.path(tile) + ".split", "w", encoding="utf-8") as f:
+            f.write("\n".join(tile_bbox(t) for t in split_tile(tile)) + "\n")
+
+    def clear_split(self, tile):
+        """A tile fetched whole no longer needs the quadrants of an older split."""
+        if os.path.exists(self.path(tile) + ".split"):
+            os.remove(self.path(tile) + ".split")
+
+
+# === Fetching ===
+class TileFailed(Exception):
+    pass
+
+
+class QueryTooLarge(Exception):
+    pass
+
+
+def _check_tail(path):
+    """Raise if a streamed tile is cut short or carries an Overpass error remark."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.seek(max(0, size - 4096))
+        tail = f.read().decode("utf-8", errors="replace")
+    remark = REMARK.search(tail)
+    if remark and FAILED_REMARK.search(remark.group(1)):
+        raise QueryTooLarge(json.loads(remark.group(1)))
+    if not tail.rstrip().endswith("}"):
+        raise IncompleteResponse("incomplete response")
+
+
+def fetch_tile(client, endpoint, query, path, timeout=180):
+    """POST ``query`` and stream the response into ``path``; returns bytes written."""
+    try:
+        return client.post_to_file(endpoint, path, data={"data": query}, timeout=timeout + 30,
+                                   check=_check_tail)
+    except requests.RequestException as e:
+        # HTTP status and truncation read well as is; connection errors are long urllib3 chains
+        raise TileFailed(str(e) if isinstance(e, (requests.HTTPError, IncompleteResponse)) else type(e).__name__)
+
+
+def fetch_tiles(tiles, store, endpoint, query, workers=2, retries=4, backoff=2.0, timeout=180, max_splits=3):
+    """Fetch every tile not already on disk; return the leaf tiles that make up the area, in order."""
+    client = HttpClient(user_agent=UA, timeout=timeout + 30, retries=retries, backoff=backoff,
+                        pool_size=max(1, workers), allowed_types=(), retry_methods=("POST",))
+    stats = {"fetched": 0, "cached": 0, "split": 0, "failed": 0, "bytes": 0}
+    failed = []
+
+    # Expand tiles split on an earlier run, so a resume goes straight to the quadrants
+    def leaves(tile, depth=0):
+        if store.was_split(tile) and depth < max_splits:
+            return [leaf for sub in split_tile(tile) for leaf in leaves(sub, depth + 1)]
+        return [(tile, depth)]
+
+    pending = []
+    for tile in tiles:
+        for leaf, depth in leaves(tile):
+            if store.done(leaf):
+                stats["cached"] += 1
+            else:
+                pending.append((leaf, depth))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+
+        def submit(tile, depth):
+            q = query.format(bbox=tile_bbox(tile), timeout=timeout)
+            running[pool.submit(fetch_tile, client, endpoint, q, store.path(tile), timeout)] = (tile, depth)
+
+        for tile, depth in pending:
+            submit(tile, depth)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                tile, depth = running.pop(future)
+                try:
+                    stats["bytes"] += future.result()
+                    stats["fetched"] += 1
+                    store.clear_split(tile)
+                    print(f"  ✅ {tile_bbox(tile)}")
+                except QueryTooLarge as e:
+                    if depth >= max_splits:
+                        print(f"  ❌ {tile_bbox(tile)}: {e} (smallest tile size reached)")
+                        failed.append(tile)
+                        continue
+                    print(f"  ✂️ {tile_bbox(tile)}: {e}, splitting into quadrants")
+                    store.mark_split(tile)
+                    stats["split"] += 1
+                    for sub in split_tile(tile):
+                        submit(sub, depth + 1)
+                except TileFailed as e:
+                    print(f"  ❌ {tile_bbox(tile)}: {e}")
+                    failed.append(tile)
+    client.close()
+    stats["failed"] = len(failed)
+
+    ordered = []
+    for tile in tiles:
+        ordered.extend(leaf for leaf, _ in leaves(tile))
+    return ordered, failed, stats
+
+
+# === Merge ===
+def _merged_header(paths):
+    """Header of the first tile, with the oldest data timestamp of all tiles."""
+    header, oldest = None, None
+    for path in paths:
+        h = read_header(path) or {}
+        if header is None:
+            header = {k: v for k, v in h.items() if k != "elements"}
+        stamp = (h.get("osm3s") or {}).get("timestamp_osm_base")
+        if stamp and (oldest is None or stamp < oldest):
+            oldest = stamp
+    header = header or {}
+    if oldest and isinstance(header.get("osm3s"), dict):
+        header["osm3s"] = dict(header["osm3s"], timestamp_osm_base=oldest)
+    return header
+
+
+def merge_tiles(paths, output):
+    """Stream all tile files into ``output``, keeping the first copy of each (type, id)."""
+    seen = set()
+    duplicates = 0
+
+    def unique_elements():
+        nonlocal duplicates
+        for path in paths:
+            for el in iter_elements(path):
+                key = element_key(el)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                yield el
+
+    tmp = output + ".tmp"
+    count = write_overpass(tmp, unique_elements(), header=_merged_header(paths))
+    os.replace(tmp, output)
+    return count, duplicates
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fetch OSM food places tile by tile from Overpass and merge them.")
+    ap.add_argument("--bbox", default=DEFAULT_BBOX, help="south,west,north,east")
+    ap.add_argument("--tile-deg", type=float, default=0.1, help="tile edge in degrees")
+    ap.add_argument("--workers", type=int, default=2, help="concurrent Overpass requests")
+    ap.add_argument("--retries", type=int, default=4, help="retries per tile on 429/5xx/connection errors")
+    ap.add_argument("--backoff", type=float, default=2.0, help="base delay in seconds, doubled per retry")
+    ap.add_argument("--timeout", type=int, default=180, help="Overpass query timeout in seconds")
+    ap.add_argument("--max-splits", type=int, default=3,
+                    help="how many times a tile that hits the Overpass limits may be quartered")
+    ap.add_argument("--endpoint", default=ENDPOINT, help="Overpass interpreter URL")
+    ap.add_argument("--query", default="",
+                    help="Overpass QL template file with {bbox} and {timeout} placeholders "
+                         "(literal braces doubled); default: food places with 'out center'")
+    ap.add_argument("--tiles-dir", default=os.path.join(DATA_DIR, "overpass_tiles"),
+                    help="tile responses, reused by the next run")
+    ap.add_argument("--max-age-days", type=float, default=1.0,
+                    help="reuse tile files up to this old (resuming an interrupted run); older ones are refetched")
+    ap.add_argument("--refresh", action="store_true", help="refetch every tile, however recent")
+    ap.add_argument("--output", default=os.path.join(DATA_DIR, "export.json"))
+    args = ap.parse_args()
+
+    query = DEFAULT_QUERY
+    if args.query:
+        with open(args.query, "r", encoding="utf-8") as f:
+            query = f.read()
+    try:
+        bbox = parse_bbox(args.bbox)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+
+    tiles = make_tiles(bbox, args.tile_deg)
+    store = TileStore(args.tiles_dir, query, max_age=0 if args.refresh else args.max_age_days * 86400)
+    print(f"🌍 Extracting {args.bbox} as {len(tiles)} tiles of {args.tile_deg:g}° "
+          f"from {args.endpoint} ({args.workers} workers)")
+    start = time.time()
+    leaves, failed, stats = fetch_tiles(tiles, store, args.endpoint, query, workers=args.workers,
+                                        retries=args.retries, backoff=args.backoff,
+                                        timeout=args.timeout, max_splits=args.max_splits)
+    print(f"📥 Tiles: {stats['fetched']} fetched ({stats['bytes'] / 1e6:.1f} MB), {stats['cached']} reused, "
+          f"{stats['split']} split, {stats['failed']} failed in {time.time() - start:.1f}s")
+    if failed:
+        print(f"❌ {len(failed)} tiles could not be fetched; rerun to retry them. {args.output} was not written.")
+        sys.exit(1)
+
+    count, duplicates = merge_tiles([store.path(t) for t in leaves], args.output)
+    print(f"✅ Export: {args.output} ({count} elements, {duplicates} cross-tile duplicates dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
-import psycopg2
-import pandas as pd
+import db
 import os
 
 # === Setup paths ===
@@ -8,19 +7,27 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 
 # === Connect to PostgreSQL ===
 try:
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        port="5432",
-        database="punchfast",
-        user="postgres",
-        password="Rameez@123"
-    )
+    db.scalar("SELECT 1;")
     print("✅ Connected to PostgreSQL successfully.")
 except Exception as e:
     print("❌ Database connection failed:")
     print(e)
     exit()
 
+
+# === Stream a query into a CSV, one server-side batch at a time ===
+def export_query(query, path):
+    total = 0
+    first = None
+    for frame in db.iter_frames(query):
+        frame.to_csv(path, mode="a" if total else "w", header=not total, index=False)
+        if first is None:
+            first = frame.head()
+        total += len(frame)
+    if first is None:
+        open(path, "w", encoding="utf-8").close()
+    return total, first
+
 # === 1️⃣ Find stores with same coordinates (exact match) ===
 query_exact_coords = """
 SELECT
@@ -33,9 +40,10 @@ GROUP BY 1, 2
 HAVING COUNT(*) > 1;
 """
 
-df_coords = pd.read_sql(query_exact_coords, conn)
+coord_path = os.path.join(DATA_DIR, "duplicate_coordinates.csv")
+coord_count, coord_head = export_query(query_exact_coords, coord_path)
 print("\n🔍 Possible duplicate coordinates:")
-print(df_coords.head())
+print(coord_head if coord_head is not None else "(none)")
 
 # === 2️⃣ Find stores with very similar names (case-insensitive partial matches) ===
 query_similar_names = """
@@ -46,21 +54,16 @@ WHERE a.id < b.id
 LIMIT 100;
 """
 
-df_names = pd.read_sql(query_similar_names, conn)
-print("\n🧾 Possible duplicate names:")
-print(df_names.head())
-
-# === 3️⃣ Export results ===
-coord_path = os.path.join(DATA_DIR, "duplicate_coordinates.csv")
 name_path = os.path.join(DATA_DIR, "duplicate_names.csv")
+name_count, name_head = export_query(query_similar_names, name_path)
+print("\n🧾 Possible duplicate names:")
+print(name_head if name_head is not None else "(none)")
 
-df_coords.to_csv(coord_path, index=False)
-df_names.to_csv(name_path, index=False)
-
+# === 3️⃣ Report exports ===
 print(f"\n✅ Duplicate reports saved:")
-print(f" - Coordinates: {coord_path}")
-print(f" - Names: {name_path}")
+print(f" - Coordinates: {coord_path} ({coord_count} rows)")
+print(f" - Names: {name_path} ({name_count} rows)")
 
-# === Close connection ===
-conn.close()
+# === Close connection pool ===
+db.close_all()
 print("\n🎯 Duplicate search complete.")
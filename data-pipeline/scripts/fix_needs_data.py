@@ -1,17 +1,13 @@
-import psycopg2
+import db
 import requests
 import time
-import os
+
+import shared_path  # noqa: F401
+from punchfast_common.http_client import HttpClient
 
 # === Database connection ===
 try:
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        port="5432",
-        database="punchfast",
-        user="postgres",
-        password="Rameez@123"
-    )
+    conn = db.connect()
     cur = conn.cursor()
     print("✅ Connected to PostgreSQL successfully.")
 except Exception as e:
@@ -19,17 +15,19 @@ except Exception as e:
     print(e)
     exit()
 
-# === Get rows needing fixes ===
-cur.execute("""
+# === Stream rows needing fixes (server-side cursor on its own pooled connection) ===
+pending = db.scalar("SELECT COUNT(*) FROM food_places WHERE status = 'needs_fix';")
+print(f"🔎 Found {pending} records that need fixing.")
+rows = db.iter_rows("""
     SELECT id, latitude, longitude, street, city, postcode
     FROM food_places
-    WHERE status = 'needs_fix';
+    WHERE status = 'needs_fix'
+    ORDER BY id;
 """)
-rows = cur.fetchall()
-print(f"🔎 Found {len(rows)} records that need fixing.")
 
 # === Nominatim reverse geocoding ===
 base_url = "https://nominatim.openstreetmap.org/reverse"
+http = HttpClient(user_agent="PunchfastDataFix/1.0", timeout=10)
 
 for r in rows:
     row_id, lat, lon, street, city, postcode = r
@@ -45,9 +43,7 @@ for r in rows:
     }
 
     try:
-        res = requests.get(base_url, params=params, headers={"User-Agent": "PunchfastDataFix/1.0"})
-        res.raise_for_status()
-        data = res.json()
+        data = http.get_json(base_url, params=params)
 
         address = data.get("address", {})
         new_street = address.get("road", street)
@@ -76,5 +72,6 @@ for r in rows:
         continue
 
 cur.close()
-conn.close()
+db.release(conn)
+db.close_all()
 print("\n🎯 All updates complete and saved.")
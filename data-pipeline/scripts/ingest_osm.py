@@ -0,0 +1,109 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import shared_path  # noqa: F401
+from punchfast_common.overpass_stream import iter_elements, element_coords
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+COLUMNS = ["OSM_Type", "OSM_ID", "Name", "Type", "Cuisine", "City", "Street",
+           "Postcode", "Website", "Latitude", "Longitude"]
+
+
+# === Field extraction (same fields as clean_osm.py, plus the OSM key) ===
+def extract_place(el):
+    tags = el.get("tags") or {}
+    if "name" not in tags:
+        return None
+    lat, lon = element_coords(el)
+    return (
+        el.get("type", ""),
+        el.get("id"),
+        tags.get("name", ""),
+        tags.get("amenity", tags.get("shop", "")),
+        tags.get("cuisine", ""),
+        tags.get("addr:city", ""),
+        tags.get("addr:street", ""),
+        tags.get("addr:postcode", ""),
+        tags.get("website", ""),
+        lat,
+        lon,
+    )
+
+
+# === Classification rules, as column operations ===
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == "")
+
+
+def classify_frame(df):
+    """valid / needs_fix / rejected for every row of a place DataFrame."""
+    lat = pd.to_numeric(df["Latitude"], errors="coerce")
+    lon = pd.to_numeric(df["Longitude"], errors="coerce")
+    rejected = _blank(df["Name"]) | lat.isna() | lon.isna() | (lat == 0) | (lon == 0)
+    needs_fix = _blank(df["Street"])
+    return pd.Series(
+        np.select([rejected, needs_fix], ["rejected", "needs_fix"], default="valid"),
+        index=df.index,
+    )
+
+
+def iter_place_chunks(json_path, chunk_rows=5000):
+    """Stream Overpass elements into classified DataFrame chunks of ``chunk_rows`` places."""
+    rows = []
+    for el in iter_elements(json_path):
+        place = extract_place(el)
+        if place is None:
+            continue
+        rows.append(place)
+        if len(rows) >= chunk_rows:
+            yield _to_frame(rows)
+            rows = []
+    if rows:
+        yield _to_frame(rows)
+
+
+def _to_frame(rows):
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    df["OSM_ID"] = df["OSM_ID"].astype("Int64")
+    df["Status"] = classify_frame(df)
+    return df
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream an Overpass export into a classified, bulk-loadable CSV.")
+    ap.add_argument("--input", default=os.path.join(DATA_DIR, "export.json"))
+    ap.add_argument("--output", default=os.path.join(DATA_DIR, "Portage_Food_Places_Classified.csv"))
+    ap.add_argument("--chunk-rows", type=int, default=5000, help="places per processed/written chunk")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ Error: Could not find {args.input}")
+        return
+
+    print(f"📂 Streaming elements from: {args.input}")
+    total = 0
+    summary = pd.Series(dtype="int64")
+    for df in iter_place_chunks(args.input, chunk_rows=args.chunk_rows):
+        df.to_csv(args.output, mode="a" if total else "w", header=not total,
+                  index=False, encoding="utf-8")
+        summary = summary.add(df["Status"].value_counts(), fill_value=0)
+        total += len(df)
+        print(f"  … {total} places written")
+
+    if not total:
+        pd.DataFrame(columns=COLUMNS + ["Status"]).to_csv(args.output, index=False, encoding="utf-8")
+
+    print(f"✅ Classified data saved to: {args.output}")
+    print(f"Total places extracted: {total}")
+    print("\n📊 Classification summary:")
+    print(summary.astype("int64").sort_index())
+
+
+if __name__ == "__main__":
+    main()
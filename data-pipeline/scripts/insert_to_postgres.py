@@ -1,35 +1,42 @@
 import pandas as pd
-import psycopg2
+import db
+import argparse
 import os
 
+from psycopg2.extras import execute_values
+
 # === Setup paths ===
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
-input_csv = os.path.join(DATA_DIR, "Portage_Food_Places_Classified.csv")
+# === Command-line options ===
+parser = argparse.ArgumentParser(description="Bulk-load classified places into food_places.")
+parser.add_argument("--input", default=os.path.join(DATA_DIR, "Portage_Food_Places_Classified.csv"))
+parser.add_argument("--chunk-rows", type=int, default=5000, help="CSV rows read and inserted per batch")
+parser.add_argument("--upsert", action="store_true",
+                    help="update rows with the same OSM type/id instead of inserting a second copy "
+                         "(use with the changes from osm_diff.py)")
+parser.add_argument("--deleted", help="deleted.csv from osm_diff.py; matching rows are removed")
+args = parser.parse_args()
+
+input_csv = args.input
 
-# === Load the classified CSV ===
+# === Open the classified CSV as a chunked reader ===
 try:
-    df = pd.read_csv(input_csv)
-    print(f"📂 Loaded data from: {input_csv}")
+    chunks = pd.read_csv(input_csv, chunksize=args.chunk_rows)
+    print(f"📂 Streaming data from: {input_csv}")
 except FileNotFoundError:
     print(f"❌ Error: File not found at {input_csv}")
-    exit()
+    exit(1)
 
 # === Connect to PostgreSQL ===
 try:
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        database="punchfast",
-        user="postgres",         # change if using a different username
-        password="Rameez@123",   # replace with your actual password
-        port="5432"
-    )
+    conn = db.connect()
     print("✅ Connected to PostgreSQL successfully.")
 except Exception as e:
     print("❌ Connection failed:")
     print(e)
-    exit()
+    exit(1)
 
 cur = conn.cursor()
 
@@ -48,30 +55,211 @@ CREATE TABLE IF NOT EXISTS food_places (
     longitude DOUBLE PRECISION,
     status TEXT
 );
+ALTER TABLE food_places
+    ADD COLUMN IF NOT EXISTS osm_type TEXT,
+    ADD COLUMN IF NOT EXISTS osm_id BIGINT,
+    ADD COLUMN IF NOT EXISTS master_id INTEGER;
 """)
+conn.commit()
 print("🧱 Table verified or created.")
 
-# === Insert data safely ===
+# === One row per OSM place: the OSM key index is unique ===
+# (tables from before this check have a plain index of the same name)
+cur.execute("SELECT indisunique FROM pg_index WHERE indexrelid = to_regclass('food_places_osm_key_idx');")
+key_index = cur.fetchone()
+if not (key_index and key_index[0]):
+    cur.execute("""
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM food_places
+        WHERE osm_id IS NOT NULL
+        GROUP BY osm_type, osm_id
+        HAVING COUNT(*) > 1
+    ) d;
+    """)
+    repeated = cur.fetchone()[0]
+    if repeated:
+        print(f"❌ {repeated} OSM places occur more than once in food_places; "
+              "delete the extra copies before loading.")
+        exit(1)
+    cur.execute("""
+    DROP INDEX IF EXISTS food_places_osm_key_idx;
+    CREATE UNIQUE INDEX food_places_osm_key_idx ON food_places (osm_type, osm_id);
+    """)
+    conn.commit()
+    print("🔑 Unique OSM key index created.")
+
+# === Bulk insert, one multi-row INSERT per chunk ===
 insert_query = """
     INSERT INTO food_places
-    (name, type, cuisine, city, street, postcode, website, latitude, longitude, status)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    (osm_type, osm_id, name, type, cuisine, city, street, postcode, website, latitude, longitude, status)
+    VALUES %s
+    ON CONFLICT (osm_type, osm_id) DO NOTHING
 """
+csv_columns = ["OSM_Type", "OSM_ID", "Name", "Type", "Cuisine", "City", "Street",
+               "Postcode", "Website", "Latitude", "Longitude", "Status"]
 
-count = 0
-for _, row in df.iterrows():
+# === Upsert: stage each chunk, then one UPDATE and one INSERT per chunk ===
+data_columns = ["name", "type", "cuisine", "city", "street", "postcode", "website",
+                "latitude", "longitude", "status"]
+# Address fields may have been filled in by fix_needs_data.py: a blank OSM value keeps the fix
+address_columns = ["city", "street", "postcode"]
+new_values = {c: f"s.{c}" for c in data_columns}
+for c in address_columns:
+    new_values[c] = f"COALESCE(NULLIF(btrim(s.{c}), ''), f.{c})"
+# Status belongs to the pipeline (fix, dedup): only re-derived for rows that are not
+# yet valid/duplicate, or that the new OSM data makes unusable
+derived_status = db.status_sql("s.name", new_values["street"], "s.latitude", "s.longitude")
+new_values["status"] = f"""CASE
+        WHEN f.status IN ('valid', 'duplicate') AND ({derived_status}) <> 'rejected' THEN f.status
+        ELSE {derived_status}
+    END"""
+# Rows loaded before the OSM key columns existed have NULL keys. Each one takes the key of
+# the staged place it was loaded from and is then updated like any other row instead of
+# getting a second copy: first by name and coordinates, then (clean_osm.py left ways
+# without coordinates) by name, type and website. Within a group of equal places the
+# n-th staged place pairs with the n-th unkeyed row. Rows nothing matches (e.g. added by
+# the app) keep their NULL key and are left alone.
+claim_passes = [
+    (["name", "latitude", "longitude"], "latitude IS NOT NULL"),
+    (["name", "type", "website"], "latitude IS NULL"),
+]
+claim_sql = [f"""
+WITH s AS (
+    SELECT s.*, row_number() OVER (PARTITION BY {", ".join(match)} ORDER BY osm_type, osm_id) AS n
+    FROM (SELECT DISTINCT ON (osm_type, osm_id) * FROM staging_places ORDER BY osm_type, osm_id) s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM food_places k
+        WHERE k.osm_type = s.osm_type AND k.osm_id = s.osm_id
+    )
+), f AS (
+    SELECT id, {", ".join(match)}, row_number() OVER (PARTITION BY {", ".join(match)} ORDER BY id) AS n
+    FROM food_places
+    WHERE osm_id IS NULL AND {legacy}
+)
+UPDATE food_places t
+SET osm_type = s.osm_type, osm_id = s.osm_id
+FROM f JOIN s ON {" AND ".join(f"f.{c} IS NOT DISTINCT FROM s.{c}" for c in match)} AND f.n = s.n
+WHERE t.id = f.id;
+""" for match, legacy in claim_passes]
+unkeyed = 0
+if args.upsert:
+    cur.execute("SELECT COUNT(*) FROM food_places WHERE osm_id IS NULL;")
+    unkeyed = cur.fetchone()[0]
+    if unkeyed:
+        print(f"🔗 {unkeyed} rows have no OSM key yet; matching them to the CSV.")
+    cur.execute("""
+    CREATE TEMP TABLE staging_places (LIKE food_places INCLUDING DEFAULTS);
+    ALTER TABLE staging_places DROP COLUMN id;
+    """)
+    upsert_sql = f"""
+    UPDATE food_places f
+    SET {", ".join(f"{c} = {new_values[c]}" for c in data_columns)}
+    FROM staging_places s
+    WHERE f.osm_type = s.osm_type
+      AND f.osm_id = s.osm_id
+      AND ({" OR ".join(f"f.{c} IS DISTINCT FROM {new_values[c]}" for c in data_columns)});
+
+    INSERT INTO food_places (osm_type, osm_id, {", ".join(data_columns)})
+    SELECT DISTINCT ON (s.osm_type, s.osm_id) s.osm_type, s.osm_id, {", ".join(f"s.{c}" for c in data_columns)}
+    FROM staging_places s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM food_places f
+        WHERE f.osm_type = s.osm_type AND f.osm_id = s.osm_id
+    );
+    """
+    insert_query = """
+        INSERT INTO staging_places
+        (osm_type, osm_id, name, type, cuisine, city, street, postcode, website, latitude, longitude, status)
+        VALUES %s
+    """
+
+count = claimed = skipped = 0
+for chunk in chunks:
+    # Older CSVs (clean_osm.py + classify_stores.py) have no OSM key columns
+    chunk = chunk.reindex(columns=csv_columns)
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    if chunk["OSM_ID"].notna().any():
+        chunk["OSM_ID"] = pd.Series([int(v) if v is not None else None for v in chunk["OSM_ID"]],
+                                    index=chunk.index, dtype=object)
+    rows = list(chunk.itertuples(index=False, name=None))
+    if args.upsert:
+        keyed = [row for row in rows if row[1] is not None]
+        skipped += len(rows) - len(keyed)
+        rows = keyed
+        if not rows:
+            continue
+        cur.execute("TRUNCATE staging_places;")
+        execute_values(cur, insert_query, rows, page_size=len(rows))
+        if claimed < unkeyed:
+            for sql in claim_sql:
+                cur.execute(sql)
+                claimed += cur.rowcount
+        cur.execute(upsert_sql)
+        conn.commit()
+        count += len(rows)
+        print(f"  … {count} rows upserted")
+        continue
     try:
-        cur.execute(insert_query, (
-            row["Name"], row["Type"], row["Cuisine"], row["City"],
-            row["Street"], row["Postcode"], row["Website"],
-            row["Latitude"], row["Longitude"], row["Status"]
-        ))
-        count += 1
+        execute_values(cur, insert_query, rows, page_size=len(rows))
+        conn.commit()
+        count += cur.rowcount
+        skipped += len(rows) - cur.rowcount
     except Exception as e:
-        print(f"⚠️ Skipped a row due to error: {e}")
+        # Fall back to row-by-row for this chunk so one bad row does not drop the rest
+        conn.rollback()
+        print(f"⚠️ Bulk insert failed for a chunk ({e}); retrying row by row.")
+        for row in rows:
+            try:
+                execute_values(cur, insert_query, [row])
+                conn.commit()
+                count += cur.rowcount
+                skipped += 1 - cur.rowcount
+            except Exception as row_error:
+                conn.rollback()
+                print(f"⚠️ Skipped a row due to error: {row_error}")
+    print(f"  … {count} rows inserted")
+
+# === Remove places that disappeared from OSM ===
+deleted = 0
+if args.deleted:
+    keys = pd.read_csv(args.deleted, dtype={"OSM_Type": str, "OSM_ID": "int64"})
+    keys = list(keys[["OSM_Type", "OSM_ID"]].itertuples(index=False, name=None))
+    if keys:
+        cur.execute("CREATE TEMP TABLE gone_places (osm_type TEXT, osm_id BIGINT);")
+        execute_values(cur, "INSERT INTO gone_places VALUES %s", keys, page_size=5000)
+        # Duplicates of a removed master go back to being regular places (valid,
+        # or needs_fix without a street), so merge_duplicates.py --incremental
+        # re-groups their cell.
+        cur.execute(f"""
+        WITH gone AS (
+            SELECT f.id FROM food_places f
+            JOIN gone_places g ON f.osm_type = g.osm_type AND f.osm_id = g.osm_id
+        )
+        UPDATE food_places
+        SET master_id = NULL,
+            status = CASE
+                WHEN status = 'duplicate' THEN {db.status_sql()}
+                ELSE status
+            END
+        WHERE master_id IN (SELECT id FROM gone)
+          AND id NOT IN (SELECT id FROM gone);
+
+        DELETE FROM food_places f
+        USING gone_places g
+        WHERE f.osm_type = g.osm_type AND f.osm_id = g.osm_id;
+        """)
+        deleted = cur.rowcount
+        conn.commit()
+    print(f"🗑️ Removed {deleted} rows deleted from OSM.")
 
-conn.commit()
 cur.close()
-conn.close()
+db.release(conn)
+db.close_all()
 
-print(f"✅ Inserted {count} rows into 'food_places' in database 'punchfast'.")
+print(f"✅ {'Upserted' if args.upsert else 'Inserted'} {count} rows into 'food_places' in database 'punchfast'.")
+if claimed:
+    print(f"🔗 {claimed} of {unkeyed} rows without an OSM key were matched and updated in place.")
+if skipped and args.upsert:
+    print(f"⚠️ Skipped {skipped} CSV rows without an OSM ID (upserts match on OSM type/id).")
+elif skipped:
+    print(f"⚠️ Skipped {skipped} rows already in the table (same OSM type/id); use --upsert to update them.")
@@ -0,0 +1,309 @@
+"""
+Tiled map build for the verification map.
+
+Instead of inlining every marker into one HTML file, stores are clustered per
+zoom level ahead of time and written as small static GeoJSON tiles
+(``tiles/<layer>/<z>/<x>/<y>.json``) that the page fetches for the current
+viewport only. Clustering is grid based in Web Mercator space, in the spirit of
+supercluster: each zoom level merges the clusters of the level above that fall
+into the same cell of ``radius`` pixels, using count-weighted centroids. The
+heatmap reads a precomputed density grid (``heat.json``) rather than raw points.
+
+Everything here is NumPy over whole columns, so build time and the size of any
+single file grow with the number of occupied cells, not with the raw row count.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Folium icon colors that are not valid CSS colors
+CSS_COLORS = {"darkpurple": "#5b396b"}
+
+
+# === Projection helpers ===
+def lonlat_to_world(lat, lon):
+    lat = np.clip(np.asarray(lat, dtype="float64"), -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype="float64") + 180.0) / 360.0
+    s = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)
+    return x, y
+
+
+def world_to_lonlat(x, y):
+    lon = x * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+# === Clustering ===
+def _group(keys_x, keys_y):
+    """Group ids for integer cell coordinates, plus each group's first member."""
+    keys = np.stack([keys_x, keys_y], axis=1)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return inverse.reshape(-1), first
+
+
+def build_clusters(x, y, min_zoom=0, max_zoom=16, radius=60, extent=256):
+    """
+    Return ``{zoom: (x, y, count, point_id)}`` for ``min_zoom..max_zoom``.
+
+    ``point_id`` is the source row index for single-point clusters and -1 for
+    real clusters. Levels are built bottom-up, each from the one above it.
+    """
+    cx, cy = np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")
+    count = np.ones(len(cx), dtype="int64")
+    pid = np.arange(len(cx), dtype="int64")
+    levels = {}
+    for z in range(max_zoom, min_zoom - 1, -1):
+        if len(cx) == 0:
+            levels[z] = (cx, cy, count, pid)
+            continue
+        cell = radius / (extent * 2.0 ** z)
+        gid, first = _group(np.floor(cx / cell).astype("int64"), np.floor(cy / cell).astype("int64"))
+        n = len(first)
+        total = np.bincount(gid, weights=count, minlength=n)
+        cx = np.bincount(gid, weights=cx * count, minlength=n) / total
+        cy = np.bincount(gid, weights=cy * count, minlength=n) / total
+        pid = np.where(total == 1, pid[first], -1)
+        count = total.astype("int64")
+        levels[z] = (cx, cy, count, pid)
+    return levels
+
+
+def density_grid(x, y, zoom=12, cells_per_tile=16):
+    """Counts per occupied grid cell as ``[[lat, lon, weight], ...]`` with weights scaled to 0..1."""
+    if len(x) == 0:
+        return []
+    n = 2.0 ** zoom * cells_per_tile
+    gid, first = _group(np.floor(x * n).astype("int64"), np.floor(y * n).astype("int64"))
+    weight = np.bincount(gid).astype("float64")
+    gx = (np.floor(x[first] * n) + 0.5) / n
+    gy = (np.floor(y[first] * n) + 0.5) / n
+    lat, lon = world_to_lonlat(gx, gy)
+    weight = weight / weight.max()
+    return [[round(a, 5), round(b, 5), round(w, 3)] for a, b, w in zip(lat, lon, weight)]
+
+
+# === Tile writing ===
+def _text(series):
+    return series.fillna("").astype(str).str.strip().tolist()
+
+
+def _colors(cuisine, color_map):
+    text = cuisine.fillna("").astype(str).str.lower()
+    colors = pd.Series("green", index=cuisine.index, dtype=object)
+    # First matching key wins, as in get_marker_color()
+    for key, color in reversed(list(color_map.items())):
+        colors[text.str.contains(key, regex=False)] = CSS_COLORS.get(color, color)
+    return colors.tolist()
+
+
+def _write_tiles(out_dir, layer, levels, props):
+    written = 0
+    for z, (cx, cy, count, pid) in levels.items():
+        if len(cx) == 0:
+            continue
+        scale = 2 ** z
+        tx = np.minimum(np.floor(cx * scale).astype("int64"), scale - 1)
+        ty = np.minimum(np.floor(cy * scale).astype("int64"), scale - 1)
+        lat, lon = world_to_lonlat(cx, cy)
+        order = np.lexsort((ty, tx))
+        keys = np.stack([tx[order], ty[order]], axis=1)
+        breaks = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for members in np.split(order, breaks):
+            features = []
+            for i in members:
+                if pid[i] >= 0:
+                    p = dict(props[pid[i]])
+                else:
+                    p = {"count": int(count[i])}
+                features.append({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [round(float(lon[i]), 6), round(float(lat[i]), 6)]},
+                    "properties": p,
+                })
+            tile_dir = os.path.join(out_dir, "tiles", layer, str(z), str(int(tx[members[0]])))
+            os.makedirs(tile_dir, exist_ok=True)
+            with open(os.path.join(tile_dir, f"{int(ty[members[0]])}.json"), "w", encoding="utf-8") as f:
+                json.dump({"type": "FeatureCollection", "features": features}, f,
+                          ensure_ascii=False, separators=(",", ":"))
+            written += 1
+    return written
+
+
+def build_tiled_map(df, out_dir, color_map, legend_html="", min_zoom=3, max_zoom=16,
+                    radius=60, heat_zoom=12):
+    """Write ``index.html``, ``meta.json``, ``heat.json``, ``names.json`` and the tile tree into ``out_dir``."""
+    df = df.dropna(subset=["latitude", "longitude"])
+    valid = df["status"] == "valid"
+    point_zoom = max_zoom + 1
+
+    if os.path.isdir(os.path.join(out_dir, "tiles")):
+        shutil.rmtree(os.path.join(out_dir, "tiles"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    summary = {}
+    for layer, part in (("valid", df[valid]), ("other", df[~valid])):
+        x, y = lonlat_to_world(part["latitude"].to_numpy(), part["longitude"].to_numpy())
+        names, streets, cities = _text(part["name"]), _text(part["street"]), _text(part["city"])
+        cuisines, sites = _text(part["cuisine"]), _text(part["website"])
+        colors = _colors(part["cuisine"], color_map) if layer == "valid" else ["gray"] * len(part)
+        props = [
+            {"name": n, "cuisine": c, "street": s, "city": ct, "website": w, "color": col}
+            for n, c, s, ct, w, col in zip(names, cuisines, streets, cities, sites, colors)
+        ]
+        levels = build_clusters(x, y, min_zoom=min_zoom, max_zoom=max_zoom, radius=radius)
+        # Unclustered points live one level past max_zoom
+        levels[point_zoom] = (x, y, np.ones(len(x), dtype="int64"), np.arange(len(x)))
+        summary[layer] = _write_tiles(out_dir, layer, levels, props)
+
+        if layer == "valid":
+            with open(os.path.join(out_dir, "heat.json"), "w", encoding="utf-8") as f:
+                json.dump(density_grid(x, y, zoom=heat_zoom), f, separators=(",", ":"))
+            with open(os.path.join(out_dir, "names.json"), "w", encoding="utf-8") as f:
+                json.dump([[n, round(float(a), 6), round(float(b), 6)]
+                           for n, a, b in zip(names, part["latitude"], part["longitude"])],
+                          f, ensure_ascii=False, separators=(",", ":"))
+
+    center = [float(df["latitude"].mean()), float(df["longitude"].mean())] if len(df) else [41.15, -81.25]
+    meta = {"center": [round(center[0], 5), round(center[1], 5)], "zoom": 10,
+            "minZoom": min_zoom, "pointZoom": point_zoom, "layers": ["valid", "other"]}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(PAGE_TEMPLATE.replace("__META__", json.dumps(meta)).replace("__LEGEND__", legend_html))
+    return summary
+
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>PunchFast verified stores</title>
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<script src="https://unpkg.com/leaflet.heat@0.2.0/dist/leaflet-heat.js"></script>
+<style>
+html, body, #map { height: 100%; margin: 0; }
+.pf-cluster { background: rgba(40, 120, 200, 0.8); color: #fff; border-radius: 50%;
+  text-align: center; font: bold 12px Arial; border: 2px solid #fff; }
+#pf-search { position: fixed; top: 10px; left: 60px; z-index: 9999; width: 240px; padding: 6px; }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<input id="pf-search" list="pf-names" placeholder="Search for a restaurant...">
+<datalist id="pf-names"></datalist>
+__LEGEND__
+<script>
+const META = __META__;
+const map = L.map('map').setView(META.center, META.zoom);
+L.tileLayer('https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png', {
+  attribution: '&copy; OpenStreetMap contributors &copy; CARTO'
+}).addTo(map);
+
+const groups = {};
+META.layers.forEach(name => { groups[name] = L.layerGroup().addTo(map); });
+const tileCache = new Map();
+let shownZoom = null;
+let shown = new Set();
+
+function esc(s) { return String(s).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c])); }
+
+function popup(p) {
+  const addr = [p.street, p.city].filter(Boolean).join(', ');
+  const site = p.website ? '<br><a href="' + esc(p.website) + '" target="_blank">🌐 Website</a>' : '';
+  return '<div style="font-family:Arial; font-size:13px;"><b>' + esc(p.name) + '</b><br><i>' +
+    esc(p.cuisine || 'Unknown cuisine') + '</i><br>' + esc(addr) + site + '</div>';
+}
+
+function toLayer(f) {
+  const [lon, lat] = f.geometry.coordinates;
+  const p = f.properties;
+  if (p.count) {
+    const size = 24 + Math.min(24, Math.round(Math.log2(p.count) * 4));
+    return L.marker([lat, lon], {icon: L.divIcon({
+      className: 'pf-cluster', html: '<div style="line-height:' + size + 'px">' + p.count + '</div>',
+      iconSize: [size, size]})})
+      .on('click', () => map.setView([lat, lon], Math.min(map.getZoom() + 2, META.pointZoom)));
+  }
+  return L.circleMarker([lat, lon], {radius: 6, color: p.color, fillColor: p.color,
+    fillOpacity: p.color === 'gray' ? 0.4 : 0.8, weight: 1})
+    .bindTooltip(esc(p.name)).bindPopup(popup(p));
+}
+
+function fetchTile(key) {
+  if (!tileCache.has(key)) {
+    tileCache.set(key, fetch('tiles/' + key + '.json')
+      .then(r => r.ok ? r.json() : {features: []})
+      .catch(() => ({features: []})));
+  }
+  return tileCache.get(key);
+}
+
+function refresh() {
+  const z = Math.max(META.minZoom, Math.min(META.pointZoom, map.getZoom()));
+  if (z !== shownZoom) {
+    Object.values(groups).forEach(g => g.clearLayers());
+    shown = new Set();
+    shownZoom = z;
+  }
+  const n = 2 ** z;
+  const b = map.getBounds();
+  const tx = lon => Math.floor((lon + 180) / 360 * n);
+  const ty = lat => {
+    const r = lat * Math.PI / 180;
+    return Math.floor((1 - Math.log(Math.tan(r) + 1 / Math.cos(r)) / Math.PI) / 2 * n);
+  };
+  const clamp = v => Math.max(0, Math.min(n - 1, v));
+  const x0 = clamp(tx(b.getWest())), x1 = clamp(tx(b.getEast()));
+  const y0 = clamp(ty(b.getNorth())), y1 = clamp(ty(b.getSouth()));
+  META.layers.forEach(layer => {
+    for (let x = x0; x <= x1; x++) {
+      for (let y = y0; y <= y1; y++) {
+        const key = layer + '/' + z + '/' + x + '/' + y;
+        if (shown.has(key)) continue;
+        shown.add(key);
+        fetchTile(key).then(fc => {
+          if (shownZoom !== z) return;
+          fc.features.forEach(f => groups[layer].addLayer(toLayer(f)));
+        });
+      }
+    }
+  });
+}
+
+map.on('moveend', refresh);
+refresh();
+
+fetch('heat.json').then(r => r.json()).then(cells => {
+  const heat = L.heatLayer(cells, {radius: 15, blur: 12, minOpacity: 0.4});
+  L.control.layers(null, {'Density': heat, 'Verified stores': groups.valid, 'Needs fix / Rejected': groups.other}).addTo(map);
+});
+
+// Name index only loads when someone starts searching
+const search = document.getElementById('pf-search');
+let names = null;
+search.addEventListener('focus', () => {
+  if (names) return;
+  names = fetch('names.json').then(r => r.json()).then(rows => {
+    const list = document.getElementById('pf-names');
+    rows.forEach(([name]) => { const o = document.createElement('option'); o.value = name; list.appendChild(o); });
+    return rows;
+  });
+});
+search.addEventListener('change', () => {
+  if (!names) return;
+  names.then(rows => {
+    const hit = rows.find(([name]) => name === search.value);
+    if (hit) map.setView([hit[1], hit[2]], META.pointZoom);
+  });
+});
+</script>
+</body>
+</html>
+"""
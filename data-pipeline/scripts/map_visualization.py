@@ -1,6 +1,5 @@
 import pandas as pd
-import folium
-from folium.plugins import MarkerCluster, HeatMap, Search
+import argparse
 import os
 
 # === Setup paths ===
@@ -8,6 +7,15 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 output_map = os.path.join(BASE_DIR, "punchfast_verified_map_pro.html")
 
+# === Command-line options ===
+parser = argparse.ArgumentParser(description="Build the PunchFast verification map.")
+parser.add_argument("--tiled", action="store_true",
+                    help="write precomputed cluster tiles + a lazy-loading page instead of one HTML file")
+parser.add_argument("--tiles-out", default=os.path.join(BASE_DIR, "punchfast_verified_map_tiles"),
+                    help="output directory for --tiled")
+parser.add_argument("--max-zoom", type=int, default=16, help="deepest zoom level that still clusters (--tiled)")
+args = parser.parse_args()
+
 # === Load data ===
 print("📂 Loading data...")
 input_csv = os.path.join(DATA_DIR, "final_clean_food_places.csv")
@@ -23,10 +31,6 @@ invalid_df = df[df["status"] != "valid"].copy()
 
 print(f"✅ Loaded {len(df)} total records ({len(valid_df)} valid, {len(invalid_df)} non-valid).")
 
-# === Create base map ===
-print("🗺️ Creating base map...")
-m = folium.Map(location=[41.15, -81.25], zoom_start=10, tiles="CartoDB positron")
-
 # === Color mapping ===
 color_map = {
     "pizza": "orange",
@@ -55,6 +59,58 @@ def get_marker_color(cuisine):
                 return color
     return "green"
 
+# === Legend ===
+legend_html = """
+<div style="
+position: fixed;
+bottom: 50px; left: 50px;
+width: 250px;
+background-color: white;
+border: 2px solid grey;
+z-index: 9999;
+font-size: 13px;
+padding: 10px;">
+<b>🍴 Cuisine Legend</b><br>
+<hr>
+<b>Common Paths</b><br>
+<i style='color:orange;'>●</i> Pizza<br>
+<i style='color:red;'>●</i> Chinese<br>
+<i style='color:blue;'>●</i> Cafe / Coffee<br>
+<i style='color:pink;'>●</i> Bakery<br>
+<i style='color:purple;'>●</i> Mexican<br>
+<hr>
+<b>Regional / Ethnic</b><br>
+<i style='color:darkred;'>●</i> Indian<br>
+<i style='color:cadetblue;'>●</i> Italian<br>
+<i style='color:lightgreen;'>●</i> Japanese<br>
+<i style='color:darkpurple;'>●</i> Thai<br>
+<i style='color:darkblue;'>●</i> American<br>
+<hr>
+<b>Specialty</b><br>
+<i style='color:lightgray;'>●</i> Vegan / Healthy<br>
+<i style='color:black;'>●</i> BBQ / Grill<br>
+<i style='color:lightpink;'>●</i> Ice Cream / Dessert<br>
+<i style='color:green;'>●</i> Other<br>
+</div>
+"""
+
+# === Tiled build: precomputed clusters per zoom, loaded by viewport ===
+if args.tiled:
+    from map_tiles import build_tiled_map
+
+    print("🧩 Precomputing cluster tiles...")
+    written = build_tiled_map(df, args.tiles_out, color_map, legend_html=legend_html, max_zoom=args.max_zoom)
+    print(f"✅ Wrote {written['valid']} verified + {written['other']} non-valid tiles to: {args.tiles_out}")
+    print("👉 Serve that folder over HTTP (e.g. `python -m http.server`) and open index.html.")
+    exit()
+
+# === Create base map (folium is only needed for the single-file map) ===
+import folium
+from folium.plugins import MarkerCluster, HeatMap, Search
+
+print("🗺️ Creating base map...")
+m = folium.Map(location=[41.15, -81.25], zoom_start=10, tiles="CartoDB positron")
+
 # === Add clustered markers ===
 print("📍 Adding clustered markers for valid stores...")
 marker_cluster = MarkerCluster(name="Verified Stores").add_to(m)
@@ -102,39 +158,6 @@ Search(
 ).add_to(m)
 
 # === Add legend ===
-legend_html = """
-<div style="
-position: fixed;
-bottom: 50px; left: 50px;
-width: 250px;
-background-color: white;
-border: 2px solid grey;
-z-index: 9999;
-font-size: 13px;
-padding: 10px;">
-<b>🍴 Cuisine Legend</b><br>
-<hr>
-<b>Common Paths</b><br>
-<i style='color:orange;'>●</i> Pizza<br>
-<i style='color:red;'>●</i> Chinese<br>
-<i style='color:blue;'>●</i> Cafe / Coffee<br>
-<i style='color:pink;'>●</i> Bakery<br>
-<i style='color:purple;'>●</i> Mexican<br>
-<hr>
-<b>Regional / Ethnic</b><br>
-<i style='color:darkred;'>●</i> Indian<br>
-<i style='color:cadetblue;'>●</i> Italian<br>
-<i style='color:lightgreen;'>●</i> Japanese<br>
-<i style='color:darkpurple;'>●</i> Thai<br>
-<i style='color:darkblue;'>●</i> American<br>
-<hr>
-<b>Specialty</b><br>
-<i style='color:lightgray;'>●</i> Vegan / Healthy<br>
-<i style='color:black;'>●</i> BBQ / Grill<br>
-<i style='color:lightpink;'>●</i> Ice Cream / Dessert<br>
-<i style='color:green;'>●</i> Other<br>
-</div>
-"""
 m.get_root().html.add_child(folium.Element(legend_html))
 
 # === Save output ===
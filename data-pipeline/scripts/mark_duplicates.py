@@ -1,19 +1,15 @@
-import psycopg2
+import db
 
-conn = psycopg2.connect(
-    host="127.0.0.1",
-    port="5432",
-    database="punchfast",
-    user="postgres",
-    password="Rameez@123"
-)
+conn = db.connect()
 cur = conn.cursor()
 
-# Mark rows with duplicate coordinates
+# Mark rows with duplicate coordinates (skip rows already marked so
+# repeated runs do not rewrite unchanged tuples)
 cur.execute("""
     UPDATE food_places
     SET status = 'duplicate'
-    WHERE id IN (
+    WHERE status IS DISTINCT FROM 'duplicate'
+      AND id IN (
         SELECT id FROM (
             SELECT id,
                    COUNT(*) OVER (PARTITION BY ROUND(latitude::numeric,5),
@@ -26,5 +22,6 @@ cur.execute("""
 
 conn.commit()
 cur.close()
-conn.close()
+db.release(conn)
+db.close_all()
 print("✅ Marked duplicate coordinate entries in the database.")
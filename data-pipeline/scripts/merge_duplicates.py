@@ -1,15 +1,61 @@
-import psycopg2
+import db
+import argparse
 import os
 
+# === Command-line options ===
+parser = argparse.ArgumentParser(description="Merge duplicate food places by rounded coordinates.")
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="only re-examine rows inserted or changed since the last incremental run"
+)
+parser.add_argument(
+    "--lookback",
+    default="5 minutes",
+    help="overlap window re-checked behind the high-water mark (catches late commits)"
+)
+args = parser.parse_args()
+
+# === Regrouping shared by both modes ===
+# Given a "scope" CTE (id, status, name, street, latitude, longitude, lat_r, lon_r)
+# holding whole coordinate cells, every row in a cell with more than one
+# non-rejected place points at the cell's lowest id and all but that one become
+# duplicates; rows left alone in their cell lose their master_id, and a former
+# duplicate that is no longer one is classified again like a fresh row.
+REGROUP_SQL = f"""
+    dup_groups AS (
+        SELECT lat_r, lon_r, MIN(id) AS master_id, COUNT(*) AS cnt
+        FROM scope
+        WHERE status != 'rejected'
+        GROUP BY 1, 2
+    ),
+    target AS (
+        SELECT
+            n.id,
+            CASE WHEN dg.cnt > 1 THEN dg.master_id END AS master_id,
+            CASE
+                WHEN dg.cnt > 1 AND n.id <> dg.master_id THEN 'duplicate'
+                WHEN n.status = 'duplicate' THEN {db.status_sql("n.name", "n.street", "n.latitude", "n.longitude")}
+                ELSE n.status
+            END AS status
+        FROM scope n
+        LEFT JOIN dup_groups dg
+          ON dg.lat_r = n.lat_r
+         AND dg.lon_r = n.lon_r
+    )
+    UPDATE food_places f
+    SET
+        master_id = t.master_id,
+        status = t.status
+    FROM target t
+    WHERE f.id = t.id
+      AND (f.master_id IS DISTINCT FROM t.master_id
+           OR f.status IS DISTINCT FROM t.status);
+"""
+
 # === Connect to PostgreSQL ===
 try:
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        port="5432",
-        database="punchfast",
-        user="postgres",
-        password="Rameez@123"
-    )
+    conn = db.connect()
     cur = conn.cursor()
     print("✅ Connected to PostgreSQL successfully.")
 except Exception as e:
@@ -36,46 +82,110 @@ $$;
 conn.commit()
 print("🧱 master_id column verified or created.")
 
-print("\n🧮 Computing duplicate groups by rounded coordinates...")
+if args.incremental:
+    # === 2️⃣ Incremental bookkeeping: updated_at, watermark table and indexes ===
+    print("\n🧱 Ensuring incremental dedup bookkeeping exists...")
+    cur.execute("""
+    ALTER TABLE food_places
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
 
-# === 2️⃣ Compute and update duplicates ===
-cur.execute("""
-WITH dup_groups AS (
-    SELECT
-        ROUND(latitude::numeric, 5) AS lat_r,
-        ROUND(longitude::numeric, 5) AS lon_r,
-        MIN(id) AS master_id,
-        COUNT(*) AS cnt
-    FROM food_places
-    WHERE latitude IS NOT NULL
-      AND longitude IS NOT NULL
-      AND status != 'rejected'
-    GROUP BY 1, 2
-    HAVING COUNT(*) > 1
-),
-to_update AS (
-    SELECT fp.id, dg.master_id
-    FROM food_places fp
-    JOIN dup_groups dg
-      ON ROUND(fp.latitude::numeric, 5) = dg.lat_r
-     AND ROUND(fp.longitude::numeric, 5) = dg.lon_r
-)
-UPDATE food_places f
-SET
-    master_id = u.master_id,
-    status = CASE
-        WHEN f.id = u.master_id THEN f.status
-        ELSE 'duplicate'
+    CREATE OR REPLACE FUNCTION food_places_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := now();
+        RETURN NEW;
     END
-FROM to_update u
-WHERE f.id = u.id;
-""")
+    $$ LANGUAGE plpgsql;
 
-updated = cur.rowcount
-conn.commit()
-print(f"✅ Merging complete. Rows updated: {updated}")
+    DROP TRIGGER IF EXISTS food_places_touch_updated_at ON food_places;
+    CREATE TRIGGER food_places_touch_updated_at
+        BEFORE UPDATE ON food_places
+        FOR EACH ROW
+        WHEN (OLD.latitude IS DISTINCT FROM NEW.latitude
+           OR OLD.longitude IS DISTINCT FROM NEW.longitude
+           OR OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION food_places_touch_updated_at();
+
+    CREATE TABLE IF NOT EXISTS pipeline_watermarks (
+        job TEXT PRIMARY KEY,
+        high_water TIMESTAMPTZ NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS food_places_updated_at_idx ON food_places (updated_at);
+    CREATE INDEX IF NOT EXISTS food_places_master_id_idx ON food_places (master_id);
+    CREATE INDEX IF NOT EXISTS food_places_rounded_coords_idx
+        ON food_places ((ROUND(latitude::numeric, 5)), (ROUND(longitude::numeric, 5)));
+    """)
+    conn.commit()
+
+    cur.execute("SELECT high_water FROM pipeline_watermarks WHERE job = 'merge_duplicates';")
+    mark = cur.fetchone()
+    if mark:
+        print(f"🕒 Last incremental run: {mark[0]} (re-checking {args.lookback} before it)")
+    else:
+        print("🕒 No previous incremental run, examining every row once.")
+
+    print("\n🧮 Re-grouping only new or changed rows and their neighbors...")
+
+    # === 3️⃣ Recompute groups for touched coordinate cells only ===
+    # A changed row affects the cell it now sits in, plus the group it may have
+    # left behind (rows pointing at it as master, or the master it pointed at).
+    # Rows whose group is unchanged are filtered out before the UPDATE so the
+    # table only sees real changes.
+    cur.execute("""
+    WITH changed AS (
+        SELECT id, master_id
+        FROM food_places
+        WHERE updated_at > COALESCE(%(high_water)s::timestamptz - %(lookback)s::interval, '-infinity')
+    ),
+    affected_cells AS (
+        SELECT DISTINCT
+            ROUND(fp.latitude::numeric, 5) AS lat_r,
+            ROUND(fp.longitude::numeric, 5) AS lon_r
+        FROM food_places fp
+        WHERE fp.latitude IS NOT NULL
+          AND fp.longitude IS NOT NULL
+          AND (fp.id IN (SELECT id FROM changed)
+               OR fp.master_id IN (SELECT id FROM changed)
+               OR fp.id IN (SELECT master_id FROM changed))
+    ),
+    scope AS (
+        SELECT fp.id, fp.status, fp.name, fp.street, fp.latitude, fp.longitude, c.lat_r, c.lon_r
+        FROM food_places fp
+        JOIN affected_cells c
+          ON ROUND(fp.latitude::numeric, 5) = c.lat_r
+         AND ROUND(fp.longitude::numeric, 5) = c.lon_r
+    ),""" + REGROUP_SQL, {"high_water": mark[0] if mark else None, "lookback": args.lookback})
+    updated = cur.rowcount
+
+    # Our own writes carry updated_at = now() of this transaction, the new mark;
+    # the --lookback overlap re-scans them next run, which rewrites nothing
+    # because regrouping an unchanged cell gives the same result.
+    cur.execute("""
+    INSERT INTO pipeline_watermarks (job, high_water)
+    VALUES ('merge_duplicates', now())
+    ON CONFLICT (job) DO UPDATE SET high_water = EXCLUDED.high_water;
+    """)
+    conn.commit()
+    print(f"✅ Incremental merge complete. Rows changed: {updated}")
+else:
+    print("\n🧮 Computing duplicate groups by rounded coordinates...")
+
+    # === 2️⃣ Compute and update duplicates (every cell, same rules as --incremental) ===
+    cur.execute("""
+    WITH scope AS (
+        SELECT id, status, name, street, latitude, longitude,
+               ROUND(latitude::numeric, 5) AS lat_r,
+               ROUND(longitude::numeric, 5) AS lon_r
+        FROM food_places
+        WHERE latitude IS NOT NULL
+          AND longitude IS NOT NULL
+    ),""" + REGROUP_SQL)
+
+    updated = cur.rowcount
+    conn.commit()
+    print(f"✅ Merging complete. Rows updated: {updated}")
 
-# === 3️⃣ Show post-merge status summary ===
+# === 4️⃣ Show post-merge status summary ===
 cur.execute("""
 SELECT status, COUNT(*) 
 FROM food_places
@@ -89,5 +199,6 @@ for status, count in rows:
     print(f"  {status}: {count}")
 
 cur.close()
-conn.close()
+db.release(conn)
+db.close_all()
 print("\n🎯 Duplicate merging process finished successfully.")
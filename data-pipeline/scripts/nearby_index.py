@@ -0,0 +1,425 @@
+"""
+Geohash-bucketed "stores near me" index for the app server.
+
+``build`` reads valid stores (from ``final_clean_food_places.csv`` or straight
+from ``food_places``), assigns each to a geohash cell and writes a JSON
+artifact with:
+
+    stores     columnar id / lat / lon / name / cuisine / fp (fingerprint)
+    buckets    geohash -> [store ids]
+    neighbors  geohash -> occupied geohashes among its 8 surrounding cells
+
+so a server can memory-load it and answer a lookup from one bucket plus its
+neighbor set. When an artifact already exists only stores whose fingerprint
+changed are re-bucketed, and only the neighbor sets around touched cells are
+recomputed. ``bench`` compares k-nearest and radius queries on the index with a
+brute-force haversine scan over every store.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_INPUT = os.path.join(DATA_DIR, "final_clean_food_places.csv")
+DEFAULT_INDEX = os.path.join(DATA_DIR, "nearby_index.json")
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+DECODE32 = {c: i for i, c in enumerate(BASE32)}
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = 111320.0
+
+
+# === Geohash math (vectorized over NumPy arrays) ===
+def _bit_counts(precision):
+    total = 5 * precision
+    return (total + 1) // 2, total // 2  # lon bits, lat bits
+
+
+def cell_index(lat, lon, precision):
+    """(lat_idx, lon_idx) integer cell coordinates, equivalent to geohash bisection."""
+    lon_bits, lat_bits = _bit_counts(precision)
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    yi = np.floor((lat + 90.0) / 180.0 * (1 << lat_bits)).astype("int64")
+    xi = np.floor((lon + 180.0) / 360.0 * (1 << lon_bits)).astype("int64")
+    return np.clip(yi, 0, (1 << lat_bits) - 1), np.clip(xi, 0, (1 << lon_bits) - 1)
+
+
+def encode_index(yi, xi, precision):
+    lon_bits, lat_bits = _bit_counts(precision)
+    yi = np.asarray(yi, dtype="int64")
+    xi = np.asarray(xi, dtype="int64")
+    code = np.zeros(len(yi), dtype="int64")
+    for i in range(5 * precision):
+        if i % 2 == 0:
+            bit = (xi >> (lon_bits - 1 - i // 2)) & 1
+        else:
+            bit = (yi >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+    alphabet = np.array(list(BASE32))
+    chars = [alphabet[(code >> (5 * (precision - 1 - c))) & 31] for c in range(precision)]
+    return ["".join(row) for row in zip(*chars)] if chars else []
+
+
+def encode(lat, lon, precision):
+    yi, xi = cell_index(lat, lon, precision)
+    return encode_index(yi, xi, precision)
+
+
+def decode_index(geohash):
+    precision = len(geohash)
+    lon_bits, lat_bits = _bit_counts(precision)
+    code = 0
+    for ch in geohash:
+        code = (code << 5) | DECODE32[ch]
+    yi = xi = 0
+    for i in range(5 * precision):
+        bit = (code >> (5 * precision - 1 - i)) & 1
+        if i % 2 == 0:
+            xi = (xi << 1) | bit
+        else:
+            yi = (yi << 1) | bit
+    return yi, xi
+
+
+def neighbor_indexes(yi, xi, precision, ring=1):
+    """Cell coordinates within ``ring`` cells (longitude wraps, latitude is clamped)."""
+    lon_bits, lat_bits = _bit_counts(precision)
+    out = []
+    for dy in range(-ring, ring + 1):
+        ny = yi + dy
+        if ny < 0 or ny >= (1 << lat_bits):
+            continue
+        for dx in range(-ring, ring + 1):
+            if dx == 0 and dy == 0:
+                continue
+            out.append((ny, (xi + dx) % (1 << lon_bits)))
+    return out
+
+
+def ring_indexes(yi, xi, precision, ring):
+    """Cell coordinates exactly ``ring`` cells away, i.e. only the perimeter of the square."""
+    if ring == 0:
+        return [(yi, xi)]
+    lon_bits, lat_bits = _bit_counts(precision)
+    out = []
+    for dy in range(-ring, ring + 1):
+        ny = yi + dy
+        if ny < 0 or ny >= (1 << lat_bits):
+            continue
+        # Top and bottom rows are complete, the rows between only have their two ends
+        step = 1 if abs(dy) == ring else 2 * ring
+        for dx in range(-ring, ring + 1, step):
+            out.append((ny, (xi + dx) % (1 << lon_bits)))
+    return out
+
+
+def cell_size_m(precision, lat):
+    lon_bits, lat_bits = _bit_counts(precision)
+    height = 180.0 / (1 << lat_bits) * METERS_PER_DEGREE
+    width = 360.0 / (1 << lon_bits) * METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6)
+    return height, width
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+# === Loading stores ===
+def load_stores(source, input_csv):
+    if source == "db":
+        import db
+
+        frames = list(db.iter_frames("""
+            SELECT id, name, cuisine, latitude, longitude
+            FROM food_places
+            WHERE status = 'valid' AND latitude IS NOT NULL AND longitude IS NOT NULL;
+        """))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=["id", "name", "cuisine", "latitude", "longitude"])
+    else:
+        df = pd.read_csv(input_csv, usecols=["id", "name", "cuisine", "latitude", "longitude", "status"])
+        df = df[df["status"] == "valid"]
+    df = df.dropna(subset=["id", "latitude", "longitude"]).drop_duplicates(subset="id", keep="last")
+    df["id"] = df["id"].astype("int64")
+    df["name"] = df["name"].fillna("").astype(str)
+    df["cuisine"] = df["cuisine"].fillna("").astype(str)
+    return df.reset_index(drop=True)
+
+
+def fingerprints(df):
+    return [
+        hashlib.blake2b(f"{la:.6f}|{lo:.6f}|{n}|{c}".encode("utf-8"), digest_size=8).hexdigest()
+        for la, lo, n, c in zip(df["latitude"], df["longitude"], df["name"], df["cuisine"])
+    ]
+
+
+# === Build / incremental update ===
+def _neighbor_sets(cells, buckets, precision):
+    out = {}
+    for gh in cells:
+        if gh not in buckets:
+            continue
+        yi, xi = decode_index(gh)
+        around = [(y, x) for y, x in neighbor_indexes(yi, xi, precision)]
+        names = encode_index([y for y, _ in around], [x for _, x in around], precision)
+        out[gh] = sorted(n for n in names if n in buckets)
+    return out
+
+
+def build_index(df, precision=6, previous=None):
+    """Return (artifact dict, stats). Reuses ``previous`` when it was built at the same precision."""
+    fps = fingerprints(df)
+    stores = {
+        "id": df["id"].tolist(),
+        "lat": [round(v, 7) for v in df["latitude"].tolist()],
+        "lon": [round(v, 7) for v in df["longitude"].tolist()],
+        "name": df["name"].tolist(),
+        "cuisine": df["cuisine"].tolist(),
+        "fp": fps,
+    }
+    incremental = bool(previous) and previous.get("precision") == precision
+
+    if not incremental:
+        cells = encode(df["latitude"].to_numpy(), df["longitude"].to_numpy(), precision)
+        buckets = {}
+        for store_id, gh in zip(stores["id"], cells):
+            buckets.setdefault(gh, []).append(store_id)
+        buckets = {gh: sorted(ids) for gh, ids in buckets.items()}
+        neighbors = _neighbor_sets(buckets.keys(), buckets, precision)
+        stats = {"mode": "full", "stores": len(df), "rebucketed": len(df), "removed": 0}
+    else:
+        prev_fp = dict(zip(previous["stores"]["id"], previous["stores"]["fp"]))
+        prev_cell = {sid: gh for gh, ids in previous["buckets"].items() for sid in ids}
+        buckets = {gh: set(ids) for gh, ids in previous["buckets"].items()}
+        current = set(stores["id"])
+
+        changed_pos = [i for i, (sid, fp) in enumerate(zip(stores["id"], fps)) if prev_fp.get(sid) != fp]
+        removed = [sid for sid in prev_fp if sid not in current]
+        touched = set()
+        for sid in removed + [stores["id"][i] for i in changed_pos]:
+            gh = prev_cell.get(sid)
+            if gh is not None:
+                buckets[gh].discard(sid)
+                touched.add(gh)
+        if changed_pos:
+            lat = np.array([stores["lat"][i] for i in changed_pos])
+            lon = np.array([stores["lon"][i] for i in changed_pos])
+            for i, gh in zip(changed_pos, encode(lat, lon, precision)):
+                buckets.setdefault(gh, set()).add(stores["id"][i])
+                touched.add(gh)
+        buckets = {gh: ids for gh, ids in buckets.items() if ids}
+
+        # Neighbor sets only move around cells whose occupancy changed
+        affected = set(touched)
+        for gh in touched:
+            yi, xi = decode_index(gh)
+            around = neighbor_indexes(yi, xi, precision)
+            affected.update(encode_index([y for y, _ in around], [x for _, x in around], precision))
+        neighbors = {gh: n for gh, n in previous.get("neighbors", {}).items()
+                     if gh in buckets and gh not in affected}
+        neighbors.update(_neighbor_sets(affected, buckets, precision))
+        buckets = {gh: sorted(ids) for gh, ids in buckets.items()}
+        stats = {"mode": "incremental", "stores": len(df), "rebucketed": len(changed_pos),
+                 "removed": len(removed), "touched_cells": len(touched)}
+
+    lon_bits, lat_bits = _bit_counts(precision)
+    artifact = {
+        "version": 1,
+        "precision": precision,
+        "cell_deg": [180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)],
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "stores": stores,
+        "buckets": buckets,
+        "neighbors": neighbors,
+    }
+    stats["buckets"] = len(buckets)
+    return artifact, stats
+
+
+# === Queries ===
+class NearbyIndex:
+    def __init__(self, artifact):
+        self.precision = artifact["precision"]
+        s = artifact["stores"]
+        self.ids = np.asarray(s["id"], dtype="int64")
+        self.lat = np.asarray(s["lat"], dtype="float64")
+        self.lon = np.asarray(s["lon"], dtype="float64")
+        pos = {sid: i for i, sid in enumerate(s["id"])}
+        self.cells = {decode_index(gh): np.array([pos[i] for i in ids], dtype="int64")
+                      for gh, ids in artifact["buckets"].items()}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _candidates(self, cells):
+        found = [self.cells[c] for c in cells if c in self.cells]
+        return np.concatenate(found) if found else np.empty(0, dtype="int64")
+
+    def radius(self, lat, lon, meters):
+        """Store positions within ``meters``, nearest first, as (positions, distances)."""
+        yi, xi = cell_index([lat], [lon], self.precision)
+        height, width = cell_size_m(self.precision, lat)
+        ring = int(math.ceil(meters / min(height, width)))
+        # Looking up more cells than there are stores costs more than scanning them all
+        if (2 * ring + 1) ** 2 > len(self.ids):
+            cand = np.arange(len(self.ids))
+        else:
+            yi, xi = int(yi[0]), int(xi[0])
+            cand = self._candidates([(yi, xi)] + neighbor_indexes(yi, xi, self.precision, ring))
+        d = haversine_m(lat, lon, self.lat[cand], self.lon[cand])
+        keep = d <= meters
+        order = np.argsort(d[keep], kind="stable")
+        return cand[keep][order], d[keep][order]
+
+    def knn(self, lat, lon, k):
+        yi, xi = cell_index([lat], [lon], self.precision)
+        yi, xi = int(yi[0]), int(xi[0])
+        height, width = cell_size_m(self.precision, lat)
+        step = min(height, width)
+        lon_cells = 1 << _bit_counts(self.precision)[0]
+        cand = self._candidates([(yi, xi)])
+        visited = 1
+        ring = 0
+        while True:
+            if len(cand) >= k:
+                d = haversine_m(lat, lon, self.lat[cand], self.lon[cand])
+                kth = np.partition(d, k - 1)[k - 1]
+                # Everything outside ring r is at least r cells away
+                if kth <= ring * step:
+                    break
+            if len(cand) == len(self.ids):
+                break
+            ring += 1
+            cells = ring_indexes(yi, xi, self.precision, ring)
+            visited += len(cells)
+            if visited > len(self.ids) or 2 * ring + 1 > lon_cells:
+                # Walking on would look up more cells than there are stores (or wrap
+                # around in longitude); scan everything instead
+                cand = np.arange(len(self.ids))
+                break
+            cand = np.concatenate([cand, self._candidates(cells)])
+        d = haversine_m(lat, lon, self.lat[cand], self.lon[cand])
+        order = np.argsort(d, kind="stable")[:k]
+        return cand[order], d[order]
+
+
+def brute_radius(lat_arr, lon_arr, lat, lon, meters):
+    d = haversine_m(lat, lon, lat_arr, lon_arr)
+    pos = np.flatnonzero(d <= meters)
+    order = np.argsort(d[pos], kind="stable")
+    return pos[order], d[pos][order]
+
+
+def brute_knn(lat_arr, lon_arr, lat, lon, k):
+    d = haversine_m(lat, lon, lat_arr, lon_arr)
+    order = np.argsort(d, kind="stable")[:k]
+    return order, d[order]
+
+
+# === Benchmark ===
+def run_benchmark(artifact, queries=500, k=10, radius_m=1000.0, seed=7):
+    index = NearbyIndex(artifact)
+    rng = random.Random(seed)
+    if not len(index.ids):
+        print("❌ Index is empty, nothing to benchmark.")
+        return
+    lat0, lat1 = float(index.lat.min()), float(index.lat.max())
+    lon0, lon1 = float(index.lon.min()), float(index.lon.max())
+    points = [(rng.uniform(lat0, lat1), rng.uniform(lon0, lon1)) for _ in range(queries)]
+
+    def timed(fn):
+        start = time.perf_counter()
+        results = [fn(la, lo) for la, lo in points]
+        return (time.perf_counter() - start) / queries * 1e6, results
+
+    rows = []
+    for label, idx_fn, brute_fn in (
+        (f"knn k={k}", lambda la, lo: index.knn(la, lo, k),
+         lambda la, lo: brute_knn(index.lat, index.lon, la, lo, k)),
+        (f"radius {int(radius_m)} m", lambda la, lo: index.radius(la, lo, radius_m),
+         lambda la, lo: brute_radius(index.lat, index.lon, la, lo, radius_m)),
+    ):
+        idx_us, idx_res = timed(idx_fn)
+        brute_us, brute_res = timed(brute_fn)
+        agree = sum(np.allclose(a[1], b[1]) and len(a[1]) == len(b[1]) for a, b in zip(idx_res, brute_res))
+        rows.append((label, idx_us, brute_us, agree))
+
+    print(f"\n📊 {queries} random queries over {len(index.ids)} stores "
+          f"({len(index.cells)} buckets, precision {index.precision})")
+    print(f"{'query':<16}{'index µs':>12}{'brute µs':>12}{'speedup':>10}{'agree':>10}")
+    for label, idx_us, brute_us, agree in rows:
+        print(f"{label:<16}{idx_us:>12.1f}{brute_us:>12.1f}{brute_us / idx_us:>9.1f}x{agree:>6}/{queries}")
+
+
+def synthetic_stores(n, seed=7):
+    """Random stores over roughly the state of Ohio, for scaling the benchmark."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "name": [f"store {i}" for i in range(1, n + 1)],
+        "cuisine": "",
+        "latitude": rng.uniform(38.4, 42.0, n),
+        "longitude": rng.uniform(-84.8, -80.5, n),
+    })
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build and benchmark the geohash nearby-store index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ap_build = sub.add_parser("build", help="build or incrementally refresh the index artifact")
+    ap_build.add_argument("--source", choices=["csv", "db"], default="csv")
+    ap_build.add_argument("--input", default=DEFAULT_INPUT, help="cleaned CSV when --source csv")
+    ap_build.add_argument("--out", default=DEFAULT_INDEX)
+    ap_build.add_argument("--precision", type=int, default=6, help="geohash length (6 ≈ 1.2 km x 0.6 km)")
+    ap_build.add_argument("--full", action="store_true", help="ignore the existing artifact and rebuild")
+
+    ap_bench = sub.add_parser("bench", help="compare index queries with a brute-force scan")
+    ap_bench.add_argument("--index", default=DEFAULT_INDEX)
+    ap_bench.add_argument("--synthetic", type=int, default=0, help="benchmark N random stores instead")
+    ap_bench.add_argument("--precision", type=int, default=6)
+    ap_bench.add_argument("--queries", type=int, default=500)
+    ap_bench.add_argument("--k", type=int, default=10)
+    ap_bench.add_argument("--radius", type=float, default=1000.0, help="radius query size in meters")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        previous = None
+        if not args.full and os.path.exists(args.out):
+            with open(args.out, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        df = load_stores(args.source, args.input)
+        artifact, stats = build_index(df, precision=args.precision, previous=previous)
+        tmp = args.out + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, args.out)
+        print(f"✅ Nearby index written to: {args.out}")
+        print("📊 " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    else:
+        if args.synthetic:
+            artifact, _ = build_index(synthetic_stores(args.synthetic), precision=args.precision)
+        else:
+            with open(args.index, "r", encoding="utf-8") as f:
+                artifact = json.load(f)
+        run_benchmark(artifact, queries=args.queries, k=args.k, radius_m=args.radius)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Diff a fresh Overpass export against the snapshot of the previous pull.
+
+Every element is reduced to a key (type, id) and a 64-bit fingerprint of its
+tags and coordinates. The snapshot keeps only those three columns, sorted by
+key, in a compressed ``.npz`` (about 17 bytes per element), so the next pull is
+compared without re-reading the old export.
+
+The new export is streamed once; elements are fingerprinted in batches and
+looked up in the snapshot with a vectorized binary search. Created and modified
+elements are written to one Overpass-format JSON (``changes.json``) that
+``ingest_osm.py`` and ``enrich.py --stores`` read like a full export, and
+deleted keys go to ``deleted.csv`` for ``insert_to_postgres.py --deleted``.
+The snapshot is only replaced once the diff has been written completely.
+
+With ``--pending`` the new snapshot is written next to the current one
+(``osm_snapshot.pending.npz``) and only replaces it on ``--apply-pending``,
+which run_pipeline.py calls once the load stage has applied the diff. Until
+then every new diff is taken against the last applied snapshot, so a failed
+load loses no changes or deletions.
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import shared_path  # noqa: F401
+from punchfast_common.overpass_stream import iter_elements, element_coords
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+TYPE_CODES = {"node": 0, "way": 1, "relation": 2}
+TYPE_NAMES = {v: k for k, v in TYPE_CODES.items()}
+COORD_DECIMALS = 7  # OSM stores coordinates with 7 decimals
+
+
+# === Keys and fingerprints ===
+def element_key(el):
+    """(type code, id) packed into one int64: the type in the top bits."""
+    code = TYPE_CODES.get(el.get("type"), 3)
+    return (code << 60) | int(el.get("id") or 0)
+
+
+def split_key(key):
+    key = int(key)
+    return TYPE_NAMES.get(key >> 60, "unknown"), key & ((1 << 60) - 1)
+
+
+def element_fingerprint(el):
+    """64-bit hash of the tags and coordinates; tag order does not matter."""
+    lat, lon = element_coords(el)
+    coords = ("" if lat is None else f"{lat:.{COORD_DECIMALS}f}",
+              "" if lon is None else f"{lon:.{COORD_DECIMALS}f}")
+    payload = json.dumps([sorted((el.get("tags") or {}).items()), coords],
+                         ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+# === Snapshots ===
+def load_snapshot(path):
+    if not path or not os.path.exists(path):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    with np.load(path) as snap:
+        return snap["keys"], snap["fingerprints"]
+
+
+def pending_path(path):
+    return os.path.splitext(path)[0] + ".pending.npz"
+
+
+def save_snapshot(path, keys, fingerprints):
+    order = np.argsort(keys, kind="stable")
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, keys=keys[order], fingerprints=fingerprints[order])
+    os.replace(tmp, path)
+
+
+def _lookup(old_keys, old_fps, keys, fps):
+    """Per element: 0 = unchanged, 1 = created, 2 = modified."""
+    if not len(old_keys):
+        return np.ones(len(keys), dtype=np.int8)
+    pos = np.searchsorted(old_keys, keys)
+    pos_clipped = np.minimum(pos, len(old_keys) - 1)
+    found = old_keys[pos_clipped] == keys
+    status = np.where(found, np.where(old_fps[pos_clipped] == fps, 0, 2), 1)
+    return status.astype(np.int8)
+
+
+class ChangeWriter:
+    """Writes changed elements as ``{"elements": [...]}`` without holding them in memory."""
+
+    def __init__(self, path):
+        self.tmp = path + ".tmp"
+        self.path = path
+        self.f = open(self.tmp, "w", encoding="utf-8")
+        self.f.write('{"elements": [\n')
+        self.count = 0
+
+    def write(self, el):
+        if self.count:
+            self.f.write(",\n")
+        self.f.write(json.dumps(el, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self.f.write("\n]}\n")
+        self.f.close()
+        os.replace(self.tmp, self.path)
+
+
+def diff_export(export_path, snapshot_path, out_dir, batch_size=10000):
+    """Stream ``export_path`` against ``snapshot_path``; return counts and the new snapshot columns."""
+    old_keys, old_fps = load_snapshot(snapshot_path)
+    os.makedirs(out_dir, exist_ok=True)
+    writer = ChangeWriter(os.path.join(out_dir, "changes.json"))
+
+    counts = {"created": 0, "modified": 0, "unchanged": 0, "deleted": 0}
+    key_parts, fp_parts = [], []
+    batch, batch_keys, batch_fps = [], [], []
+
+    def flush():
+        keys = np.array(batch_keys, dtype=np.int64)
+        fps = np.array(batch_fps, dtype=np.int64)
+        status = _lookup(old_keys, old_fps, keys, fps)
+        for el, s in zip(batch, status):
+            if s:
+                writer.write(el)
+        counts["unchanged"] += int((status == 0).sum())
+        counts["created"] += int((status == 1).sum())
+        counts["modified"] += int((status == 2).sum())
+        key_parts.append(keys)
+        fp_parts.append(fps)
+        batch.clear()
+        batch_keys.clear()
+        batch_fps.clear()
+
+    try:
+        for el in iter_elements(export_path):
+            batch.append(el)
+            batch_keys.append(element_key(el))
+            batch_fps.append(element_fingerprint(el))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        writer.close()
+
+    new_keys = np.concatenate(key_parts) if key_parts else np.empty(0, dtype=np.int64)
+    new_fps = np.concatenate(fp_parts) if fp_parts else np.empty(0, dtype=np.int64)
+
+    # Overpass may return the same element twice (e.g. from two union branches)
+    new_keys, first = np.unique(new_keys, return_index=True)
+    new_fps = new_fps[first]
+
+    deleted = np.setdiff1d(old_keys, new_keys, assume_unique=True)
+    counts["deleted"] = len(deleted)
+    deleted_path = os.path.join(out_dir, "deleted.csv")
+    with open(deleted_path, "w", encoding="utf-8") as f:
+        f.write("OSM_Type,OSM_ID\n")
+        for key in deleted:
+            osm_type, osm_id = split_key(key)
+            f.write(f"{osm_type},{osm_id}\n")
+
+    return counts, new_keys, new_fps
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Emit created/modified/deleted OSM elements since the last export.")
+    ap.add_argument("--input", default=os.path.join(DATA_DIR, "export.json"))
+    ap.add_argument("--snapshot", default=os.path.join(DATA_DIR, "osm_snapshot.npz"),
+                    help="fingerprints of the previous pull (created on first run)")
+    ap.add_argument("--out", default=os.path.join(DATA_DIR, "osm_diff"),
+                    help="directory for changes.json and deleted.csv")
+    ap.add_argument("--no-update", action="store_true", help="leave the snapshot as it is")
+    ap.add_argument("--pending", action="store_true",
+                    help="write the new snapshot beside the current one until --apply-pending")
+    ap.add_argument("--apply-pending", action="store_true",
+                    help="make the pending snapshot current (after the diff was loaded) and exit")
+    args = ap.parse_args()
+
+    if args.apply_pending:
+        pending = pending_path(args.snapshot)
+        if not os.path.exists(pending):
+            print(f"ℹ️ No pending snapshot at {pending}")
+            return
+        os.replace(pending, args.snapshot)
+        print(f"💾 Snapshot updated: {args.snapshot}")
+        return
+
+    if not os.path.exists(args.input):
+        print(f"❌ Error: Could not find {args.input}")
+        return
+
+    first_run = not os.path.exists(args.snapshot)
+    print(f"📂 Diffing {args.input} against "
+          f"{'an empty snapshot (first run)' if first_run else args.snapshot}")
+    counts, keys, fps = diff_export(args.input, args.snapshot, args.out)
+
+    if args.pending:
+        save_snapshot(pending_path(args.snapshot), keys, fps)
+        print(f"💾 Pending snapshot: {pending_path(args.snapshot)} ({len(keys)} elements)")
+    elif not args.no_update:
+        save_snapshot(args.snapshot, keys, fps)
+        print(f"💾 Snapshot updated: {args.snapshot} ({len(keys)} elements, "
+              f"{os.path.getsize(args.snapshot) / 1024:.1f} KB)")
+
+    total = counts["created"] + counts["modified"] + counts["unchanged"]
+    churn = (counts["created"] + counts["modified"] + counts["deleted"]) / max(total, 1)
+    print("\n📊 Diff summary:")
+    for name in ("created", "modified", "deleted", "unchanged"):
+        print(f"  {name}: {counts[name]}")
+    print(f"  churn: {churn:.1%}")
+    print(f"✅ Changes: {os.path.join(args.out, 'changes.json')}")
+    print(f"✅ Deletions: {os.path.join(args.out, 'deleted.csv')}")
+
+
+if __name__ == "__main__":
+    main()
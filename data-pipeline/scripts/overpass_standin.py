@@ -0,0 +1,229 @@
+"""
+Local stand-in for the Overpass API, serving canned tile responses cut from an export.
+
+``serve`` answers interpreter requests (POST or GET ``data=``) by reading the
+bbox out of the query and returning the elements of ``--export`` that fall in
+it, padded by ``--pad`` degrees so that elements near a tile edge come back
+from both neighbours, as ways crossing a boundary do. Faults can be injected
+to exercise extract_osm.py's error handling:
+
+  --throttle N        the first N requests for each bbox get 429 + Retry-After
+  --gateway-errors N  the next N requests for each bbox get 504
+  --max-elements K    a bbox with more than K elements gets a 200 whose remark
+                      reports a query timeout, like a real Overpass overload
+
+``check`` runs extract_osm.py's fetch and merge against an in-process
+stand-in with all of the above switched on and verifies that the merged export
+holds exactly the elements of the source export, that no more requests ran at
+once than there are workers, that a rerun reuses every tile and that a
+refresh fetches them all again.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import shared_path  # noqa: F401
+from punchfast_common.overpass_stream import element_coords, iter_elements, read_header
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BBOX = re.compile(r"\(\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*\)")
+TIMEOUT_REMARK = 'runtime error: Query timed out in "query" at line 3 after 180 seconds.'
+
+
+# === Canned Overpass ===
+class StandIn:
+    """Elements of one export plus the fault-injection state shared by all request threads."""
+
+    def __init__(self, export_path, pad=0.005, throttle=0, gateway_errors=0, max_elements=None):
+        self.header = {k: v for k, v in (read_header(export_path) or {}).items() if k != "elements"}
+        self.elements = []
+        for el in iter_elements(export_path):
+            lat, lon = element_coords(el)
+            if lat is not None and lon is not None:
+                self.elements.append((lat, lon, el))
+        self.pad = pad
+        self.throttle = throttle
+        self.gateway_errors = gateway_errors
+        self.max_elements = max_elements
+        self.requests = {}
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def select(self, bbox):
+        south, west, north, east = bbox
+        p = self.pad
+        return [el for lat, lon, el in self.elements
+                if south - p <= lat <= north + p and west - p <= lon <= east + p]
+
+    def answer(self, query):
+        """(status, headers, body) for one interpreter query."""
+        match = BBOX.search(query or "")
+        if not match:
+            return 400, {}, b"no bbox in query"
+        bbox = tuple(float(v) for v in match.groups())
+        with self.lock:
+            n = self.requests[bbox] = self.requests.get(bbox, 0) + 1
+        if n <= self.throttle:
+            return 429, {"Retry-After": "0"}, b"rate limited"
+        if n <= self.throttle + self.gateway_errors:
+            return 504, {}, b"gateway timeout"
+        elements = self.select(bbox)
+        out = dict(self.header)
+        if self.max_elements is not None and len(elements) > self.max_elements:
+            out["elements"] = []
+            out["remark"] = TIMEOUT_REMARK
+        else:
+            out["elements"] = elements
+        body = json.dumps(out, ensure_ascii=False, indent=1).encode("utf-8")
+        return 200, {"Content-Type": "application/json"}, body
+
+    def make_server(self, host="127.0.0.1", port=0):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, query):
+                with standin.lock:
+                    standin.active += 1
+                    standin.peak = max(standin.peak, standin.active)
+                try:
+                    status, headers, body = standin.answer(query)
+                    self.send_response(status)
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with standin.lock:
+                        standin.active -= 1
+
+            def do_GET(self):
+                self._reply(parse_qs(urlsplit(self.path).query).get("data", [""])[0])
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(length).decode("utf-8"))
+                self._reply(form.get("data", [""])[0])
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+
+# === Self-check ===
+def _extent(standin, step):
+    lats = [lat for lat, _, _ in standin.elements]
+    lons = [lon for _, lon, _ in standin.elements]
+    return (math.floor(min(lats) / step) * step, math.floor(min(lons) / step) * step,
+            math.ceil(max(lats) / step) * step, math.ceil(max(lons) / step) * step)
+
+
+def check(export_path, tile_deg=0.1, workers=3):
+    from extract_osm import DEFAULT_QUERY, TileStore, fetch_tiles, make_tiles, merge_tiles
+    from osm_diff import element_key
+
+    standin = StandIn(export_path, throttle=1, gateway_errors=1)
+    tiles = make_tiles(_extent(standin, tile_deg), tile_deg)
+    # The densest tile is over the limit and has to be split
+    standin.max_elements = max(len(standin.select(t)) for t in tiles) - 1
+    server = standin.make_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/api/interpreter"
+    source = {element_key(el): el for _, _, el in standin.elements}
+    problems = []
+
+    def run(tiles_dir, max_age):
+        store = TileStore(tiles_dir, DEFAULT_QUERY, max_age=max_age)
+        leaves, failed, stats = fetch_tiles(tiles, store, endpoint, DEFAULT_QUERY, workers=workers,
+                                            retries=3, backoff=0.05, timeout=5)
+        return store, leaves, failed, stats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tiles_dir = os.path.join(tmp, "tiles")
+        output = os.path.join(tmp, "export.json")
+
+        print(f"🧪 First run: {len(tiles)} tiles, every request throttled once and 504'd once")
+        store, leaves, failed, stats = run(tiles_dir, None)
+        if failed:
+            problems.append(f"{len(failed)} tiles failed")
+        if not stats["split"]:
+            problems.append("no tile was split")
+        if standin.peak > workers:
+            problems.append(f"{standin.peak} concurrent requests with {workers} workers")
+        count, duplicates = merge_tiles([store.path(t) for t in leaves], output)
+        merged = {element_key(el): el for el in iter_elements(output)}
+        if count != len(merged) or merged != source:
+            problems.append(f"merged export has {count} elements ({len(merged)} distinct), "
+                            f"source has {len(source)}, contents equal: {merged == source}")
+        if not duplicates:
+            problems.append("no cross-tile duplicates to drop")
+        print(f"  {count} elements merged, {duplicates} cross-tile duplicates dropped, "
+              f"{stats['split']} split, peak concurrency {standin.peak}")
+
+        print("🧪 Rerun: every tile should be reused")
+        _, leaves2, _, stats = run(tiles_dir, 86400)
+        if stats["fetched"] or stats["cached"] != len(leaves2):
+            problems.append(f"rerun fetched {stats['fetched']} and reused {stats['cached']} of {len(leaves2)}")
+
+        print("🧪 Refresh: every tile should be fetched again")
+        _, leaves3, failed, stats = run(tiles_dir, 0)
+        if failed or stats["cached"] or stats["fetched"] != len(leaves3):
+            problems.append(f"refresh fetched {stats['fetched']} and reused {stats['cached']} of {len(leaves3)}")
+    server.shutdown()
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ Tiled extraction matches the source export.")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Canned local Overpass API for testing extract_osm.py.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve an export as an Overpass interpreter")
+    serve.add_argument("--export", default=os.path.join(BASE_DIR, "export.json"))
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8710)
+    serve.add_argument("--pad", type=float, default=0.005, help="degrees added around every bbox")
+    serve.add_argument("--throttle", type=int, default=0, help="429s before answering each bbox")
+    serve.add_argument("--gateway-errors", type=int, default=0, help="504s before answering each bbox")
+    serve.add_argument("--max-elements", type=int, default=None,
+                       help="answer bboxes with more elements with a timeout remark")
+    chk = sub.add_parser("check", help="run extract_osm.py against an in-process stand-in and verify the merge")
+    chk.add_argument("--export", default=os.path.join(BASE_DIR, "export.json"))
+    chk.add_argument("--tile-deg", type=float, default=0.1)
+    chk.add_argument("--workers", type=int, default=3)
+    args = ap.parse_args()
+
+    if not os.path.exists(args.export):
+        print(f"❌ Error: Could not find {args.export}")
+        sys.exit(1)
+    if args.command == "check":
+        check(args.export, args.tile_deg, args.workers)
+        return
+
+    standin = StandIn(args.export, pad=args.pad, throttle=args.throttle,
+                      gateway_errors=args.gateway_errors, max_elements=args.max_elements)
+    server = standin.make_server(args.host, args.port)
+    print(f"🛰️ Serving {len(standin.elements)} elements from {args.export} "
+          f"at http://{args.host}:{server.server_address[1]}/api/interpreter")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
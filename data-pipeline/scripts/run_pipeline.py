@@ -0,0 +1,441 @@
+"""
+Dependency-aware runner for the data pipeline and the auto-cuisine chain.
+
+Every stage declares the files, tables and model artifacts it reads and
+writes. A stage is skipped when the content hashes of its inputs (plus its own
+script) match the ones recorded at its last successful run and its outputs are
+still present. Dependencies follow the declaration order: a stage depends on
+the closest earlier stage that writes one of its inputs, and stages with no
+path between them (map/index building, model training) run concurrently.
+
+For a table written by several stages in a row (load, fix, dedup, verify) each
+consumer is keyed on what its producer left behind, not on the live table, so
+later stages rewriting the table do not invalidate earlier ones. A change made
+outside the pipeline (e.g. the app adding stores) is detected by comparing the
+live table with its hash at the end of the previous run and re-runs every
+stage that reads that table.
+
+State lives in ``docs/pipeline_state.json``; every stage outcome, with wall time
+and output row counts, is appended to ``docs/pipeline_runs.jsonl``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+# === Setup paths ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BASE_DIR)
+DOCS_DIR = os.path.join(BASE_DIR, "docs")
+STATE_PATH = os.path.join(DOCS_DIR, "pipeline_state.json")
+LEDGER_PATH = os.path.join(DOCS_DIR, "pipeline_runs.jsonl")
+
+PIPELINE = "data-pipeline/scripts"
+AI = "ai/auto-cuisine"
+DATA = "data-pipeline/data"
+# Top-level package names that stages run with "-m" import from, and the trees they stand for
+PACKAGES = {"ai": AI}
+
+
+def _export_path():
+    for rel in (f"{DATA}/export.json", "data-pipeline/export.json"):
+        if os.path.exists(os.path.join(REPO_DIR, rel)):
+            return rel
+    return f"{DATA}/export.json"
+
+
+class Stage:
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), db=False, module=None):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        # The stage's own code is always an input
+        self.inputs = [f"file:{script}"] + list(inputs)
+        self.outputs = list(outputs)
+        self.db = db
+        # Scripts with package-absolute imports (enrich.py imports ai.src.*) run as "-m <module>"
+        self.module = module
+
+    @property
+    def command(self):
+        if self.module:
+            return [sys.executable, "-m", self.module] + self.args
+        return [sys.executable, os.path.join(REPO_DIR, self.script)] + self.args
+
+
+def build_stages():
+    export = _export_path()
+    classified = f"{DATA}/Portage_Food_Places_Classified.csv"
+    snapshot = f"{DATA}/osm_snapshot.npz"
+    diff_dir = f"{DATA}/osm_diff"
+    changes = f"{diff_dir}/changes.json"
+    deleted = f"{diff_dir}/deleted.csv"
+    final_csv = f"{DATA}/final_clean_food_places.csv"
+    stores = f"{AI}/data/stores.json"
+    processed = f"{AI}/data/processed"
+    models = f"{AI}/models"
+    type_map = f"{AI}/src/taxonomy/type_map.yaml"
+    cuisine_map = f"{AI}/src/taxonomy/cuisine_map.yaml"
+    table = "table:food_places"
+    return [
+        # --- data pipeline ---
+        # Only what changed since the last loaded export (everything on the first run) goes on to ingest/load
+        Stage("diff", f"{PIPELINE}/osm_diff.py",
+              ["--input", export, "--snapshot", snapshot, "--out", diff_dir, "--pending"],
+              inputs=[f"file:{export}", "file:shared/punchfast_common/overpass_stream.py"],
+              outputs=[f"file:{changes}", f"file:{deleted}"]),
+        Stage("ingest", f"{PIPELINE}/ingest_osm.py", ["--input", changes, "--output", classified],
+              inputs=[f"file:{changes}", "file:shared/punchfast_common/overpass_stream.py"],
+              outputs=[f"file:{classified}"]),
+        # Upsert on (osm_type, osm_id): a re-run updates the table instead of appending a second copy
+        Stage("load", f"{PIPELINE}/insert_to_postgres.py", ["--input", classified, "--upsert", "--deleted", deleted],
+              inputs=[f"file:{classified}", f"file:{deleted}"], outputs=[table], db=True),
+        # The diff becomes the new baseline only after the load applied it; until then the next
+        # diff is still taken against the old snapshot and carries these changes along
+        Stage("snapshot", f"{PIPELINE}/osm_diff.py", ["--snapshot", snapshot, "--apply-pending"],
+              inputs=[table, f"file:{changes}", f"file:{deleted}"], outputs=[f"file:{snapshot}"], db=True),
+        Stage("fix", f"{PIPELINE}/fix_needs_data.py", inputs=[table], outputs=[table], db=True),
+        Stage("dedup", f"{PIPELINE}/merge_duplicates.py", ["--incremental"],
+              inputs=[table], outputs=[table], db=True),
+        Stage("verify", f"{PIPELINE}/verify_score.py",
+              inputs=[table, f"file:{PIPELINE}/verify_jobs.py", f"file:{PIPELINE}/verify_schedule.py"],
+              outputs=[table], db=True),
+        Stage("export", f"{PIPELINE}/export_clean.py", inputs=[table], outputs=[f"file:{final_csv}"], db=True),
+        Stage("map", f"{PIPELINE}/map_visualization.py",
+              inputs=[f"file:{final_csv}"], outputs=["file:data-pipeline/punchfast_verified_map_pro.html"]),
+        Stage("nearby_index", f"{PIPELINE}/nearby_index.py", ["build", "--input", final_csv],
+              inputs=[f"file:{final_csv}"], outputs=[f"file:{DATA}/nearby_index.json"]),
+        # --- auto-cuisine ---
+        Stage("build_training", f"{AI}/src/build_training.py",
+              ["--input", stores, "--out", processed, "--type_map", type_map, "--cuisine_map", cuisine_map],
+              inputs=[f"file:{stores}", f"file:{type_map}", f"file:{cuisine_map}"],
+              outputs=[f"file:{processed}/stores_full.csv", f"file:{processed}/train_cuisine.csv",
+                       f"file:{processed}/train_type.csv"]),
+        Stage("train_type", f"{AI}/src/train_type.py", ["--data", processed, "--out", models],
+              inputs=[f"file:{processed}/train_type.csv"], outputs=[f"file:{models}/type_model.joblib"]),
+        Stage("train_cuisine", f"{AI}/src/train_cuisine.py", ["--data", processed, "--out", models],
+              inputs=[f"file:{processed}/train_cuisine.csv"],
+              outputs=[f"file:{models}/cuisine_model.joblib", f"file:{models}/cuisine_mlb.joblib"]),
+        Stage("train_shared", f"{AI}/src/train_shared.py", ["--data", processed, "--out", models],
+              inputs=[f"file:{processed}/stores_full.csv"],
+              outputs=[f"file:{models}/shared_model.joblib", f"file:{models}/shared_model.heads.json"]),
+        Stage("enrich", f"{AI}/src/enrich.py", module="ai.src.enrich",
+              args=["--stores", stores, "--models", models, "--out", f"{AI}/data/stores_enriched.json",
+                    "--type_map", type_map],
+              inputs=[f"file:{stores}", f"file:{type_map}", f"file:{models}/type_model.joblib",
+                      f"file:{models}/cuisine_model.joblib", f"file:{models}/cuisine_mlb.joblib",
+                      f"file:{models}/shared_model.joblib", f"file:{models}/shared_model.heads.json",
+                      f"file:{AI}/src/gazetteer/brand_gazetteer.json"],
+              outputs=[f"file:{AI}/data/stores_enriched.json"]),
+    ]
+
+
+# === Fingerprints ===
+class Fingerprinter:
+    def __init__(self, file_cache):
+        self.file_cache = file_cache
+        self._lock = threading.Lock()
+
+    def file(self, rel):
+        path = os.path.join(REPO_DIR, rel)
+        if not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        key = f"{st.st_size}:{st.st_mtime_ns}"
+        with self._lock:
+            cached = self.file_cache.get(rel)
+        if cached and cached["key"] == key:
+            return cached["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self.file_cache[rel] = {"key": key, "sha256": digest}
+        return digest
+
+    def table(self, name):
+        import db
+
+        try:
+            row = None
+            with db.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT COUNT(*), md5(COALESCE(string_agg(md5(t::text), '' ORDER BY t.id), ''))
+                        FROM {name} t;
+                    """)
+                    row = cur.fetchone()
+            return f"{row[0]}:{row[1]}"
+        except Exception:
+            return None
+
+    def live(self, resource):
+        kind, _, name = resource.partition(":")
+        return self.table(name) if kind == "table" else self.file(name)
+
+
+def count_rows(resource, fp):
+    kind, _, name = resource.partition(":")
+    if kind == "table":
+        return int(fp.split(":", 1)[0]) if fp else None
+    path = os.path.join(REPO_DIR, name)
+    if name.endswith(".csv") and os.path.exists(path):
+        with open(path, "rb") as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    return None
+
+
+# === Runner ===
+class Runner:
+    def __init__(self, stages, state, jobs=2, force=(), dry_run=False):
+        self.stages = stages
+        self.by_name = {s.name: s for s in stages}
+        self.state = state
+        self.jobs = max(1, jobs)
+        self.force = set(force)
+        self.dry_run = dry_run
+        self.fp = Fingerprinter(state.setdefault("files", {}))
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.outputs = {}      # stage -> {resource: fp} for this run
+        self.status = {}       # stage -> ran / skipped / failed / blocked / would_run
+        self.external = {}     # table -> token that changes on out-of-pipeline edits
+        self._ledger_lock = threading.Lock()
+        self._print_lock = threading.Lock()
+        self._package_lock = threading.Lock()
+        self.package_root = None
+        self.producer = {}
+        self.deps = {}
+        for i, stage in enumerate(stages):
+            deps = set()
+            for res in stage.inputs:
+                for earlier in reversed(stages[:i]):
+                    if res in earlier.outputs:
+                        self.producer[(stage.name, res)] = earlier.name
+                        deps.add(earlier.name)
+                        break
+            self.deps[stage.name] = deps
+
+    def _check_external_tables(self):
+        tables = {r for s in self.stages for r in s.inputs + s.outputs if r.startswith("table:")}
+        known = self.state.setdefault("tables", {})
+        for res in sorted(tables):
+            live = self.fp.live(res)
+            prev = known.get(res, {})
+            if prev.get("end") == live and "external" in prev:
+                self.external[res] = prev["external"]
+            else:
+                self.external[res] = live or "missing"
+                if prev:
+                    print(f"🔄 {res} changed outside the pipeline; its readers will re-run.")
+
+    def input_fingerprints(self, stage):
+        fps = {}
+        for res in stage.inputs:
+            producer = self.producer.get((stage.name, res))
+            if producer:
+                if producer in self.outputs:
+                    base = self.outputs[producer].get(res)
+                else:
+                    base = self.state.get("stages", {}).get(producer, {}).get("outputs", {}).get(res)
+            else:
+                base = self.fp.live(res)
+            if res.startswith("table:"):
+                base = f"{base}@{self.external.get(res)}"
+            fps[res] = base
+        return fps
+
+    def _outputs_present(self, stage):
+        for res in stage.outputs:
+            if res.startswith("file:") and not os.path.exists(os.path.join(REPO_DIR, res[5:])):
+                return False
+        return True
+
+    def decide(self, stage):
+        """Return (run?, reason, input fingerprints)."""
+        if any(self.status.get(d) in ("failed", "blocked") for d in self.deps[stage.name]):
+            return None, "upstream failed", {}
+        if self.dry_run and any(self.status.get(d) == "would_run" for d in self.deps[stage.name]):
+            return True, "upstream would run", {}
+        inputs = self.input_fingerprints(stage)
+        if "all" in self.force or stage.name in self.force:
+            return True, "forced", inputs
+        missing = [r for r, fp in inputs.items() if fp is None or fp.startswith("None@")]
+        if missing:
+            return True, f"missing input {missing[0]}", inputs
+        prev = self.state.get("stages", {}).get(stage.name)
+        if not prev:
+            return True, "never ran", inputs
+        if prev.get("inputs") != inputs:
+            changed = sorted(r for r in inputs if prev.get("inputs", {}).get(r) != inputs[r])
+            return True, "changed: " + ", ".join(changed), inputs
+        if not self._outputs_present(stage):
+            return True, "output missing", inputs
+        return False, "up to date", inputs
+
+    def _env(self, stage):
+        """Environment for a stage; "-m" stages get a PYTHONPATH entry that provides their package."""
+        if not stage.module:
+            return None
+        with self._package_lock:
+            if self.package_root is None:
+                # The AI tree is not laid out as an importable "ai" package, so link it under that name
+                self.package_root = tempfile.mkdtemp(prefix="pipeline_packages_")
+                for name, rel in PACKAGES.items():
+                    os.symlink(os.path.join(REPO_DIR, rel), os.path.join(self.package_root, name))
+        paths = [self.package_root] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+        return dict(os.environ, PYTHONPATH=os.pathsep.join(paths))
+
+    def _say(self, message):
+        with self._print_lock:
+            print(message, flush=True)
+
+    def _ledger(self, stage, status, reason, seconds=0.0, rows=None):
+        entry = {"run_id": self.run_id, "stage": stage.name, "status": status, "reason": reason,
+                 "seconds": round(seconds, 3), "rows": rows or {},
+                 "at": datetime.now().isoformat(timespec="seconds")}
+        if self.dry_run:
+            return
+        with self._ledger_lock:
+            with open(LEDGER_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def run_stage(self, stage):
+        run, reason, inputs = self.decide(stage)
+        if run is None:
+            self.status[stage.name] = "blocked"
+            self._say(f"⛔ {stage.name}: blocked ({reason})")
+            self._ledger(stage, "blocked", reason)
+            return
+        if not run:
+            self.status[stage.name] = "skipped"
+            self._say(f"⏭️ {stage.name}: {reason}")
+            self._ledger(stage, "skipped", reason)
+            return
+        if self.dry_run:
+            self.status[stage.name] = "would_run"
+            self._say(f"▶️ {stage.name}: would run ({reason})")
+            return
+
+        self._say(f"▶️ {stage.name}: running ({reason})")
+        start = time.perf_counter()
+        proc = subprocess.run(stage.command, cwd=REPO_DIR, env=self._env(stage), capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        log_path = os.path.join(DOCS_DIR, f"pipeline_{self.run_id}_{stage.name}.log")
+        with open(log_path, "w", encoding="utf-8") as f:
+            f.write(proc.stdout)
+            f.write(proc.stderr)
+        if proc.returncode != 0:
+            self.status[stage.name] = "failed"
+            self._say(f"❌ {stage.name}: exit {proc.returncode} after {seconds:.1f}s (log: {log_path})")
+            self._ledger(stage, "failed", f"exit {proc.returncode}", seconds)
+            return
+
+        outputs = {res: self.fp.live(res) for res in stage.outputs}
+        rows = {res: n for res, n in ((r, count_rows(r, fp)) for r, fp in outputs.items()) if n is not None}
+        self.outputs[stage.name] = outputs
+        self.state.setdefault("stages", {})[stage.name] = {
+            "inputs": inputs, "outputs": outputs, "finished_at": datetime.now().isoformat(timespec="seconds")}
+        self.status[stage.name] = "ran"
+        self._say(f"✅ {stage.name}: {seconds:.1f}s " + " ".join(f"{r}={n}" for r, n in rows.items()))
+        self._ledger(stage, "ran", reason, seconds, rows)
+
+    def run(self):
+        if any(s.db for s in self.stages):
+            self._check_external_tables()
+        pending = {s.name for s in self.stages}
+        futures = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                while pending or futures:
+                    ready = [n for n in pending if all(d in self.status for d in self.deps[n])]
+                    for name in sorted(ready, key=lambda n: [s.name for s in self.stages].index(n)):
+                        pending.discard(name)
+                        futures[pool.submit(self.run_stage, self.by_name[name])] = name
+                    if not futures:
+                        break
+                    done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        futures.pop(fut)
+                        fut.result()
+        finally:
+            if self.package_root:
+                shutil.rmtree(self.package_root, ignore_errors=True)
+        if not self.dry_run and any(s.db for s in self.stages):
+            for res, token in self.external.items():
+                self.state.setdefault("tables", {})[res] = {"end": self.fp.live(res), "external": token}
+        return self.status
+
+
+def load_state():
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state):
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the pipeline, skipping stages whose inputs have not changed.")
+    ap.add_argument("--only", default="", help="comma-separated stage names (default: all)")
+    ap.add_argument("--skip-db", action="store_true", help="leave out stages that need PostgreSQL")
+    ap.add_argument("--force", default="", help="comma-separated stages to re-run regardless, or 'all'")
+    ap.add_argument("--jobs", type=int, default=2, help="stages allowed to run at the same time")
+    ap.add_argument("--dry-run", action="store_true", help="only print what would run")
+    ap.add_argument("--list", action="store_true", help="list stages with their inputs and outputs")
+    args = ap.parse_args()
+
+    stages = build_stages()
+    if args.list:
+        for s in stages:
+            print(f"{s.name}\n  in:  {', '.join(s.inputs)}\n  out: {', '.join(s.outputs)}")
+        return
+    if args.only:
+        wanted = {n.strip() for n in args.only.split(",") if n.strip()}
+        unknown = wanted - {s.name for s in stages}
+        if unknown:
+            ap.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+        stages = [s for s in stages if s.name in wanted]
+    if args.skip_db:
+        stages = [s for s in stages if not s.db]
+
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    state = load_state()
+    runner = Runner(stages, state, jobs=args.jobs,
+                    force=[n.strip() for n in args.force.split(",") if n.strip()], dry_run=args.dry_run)
+    started = time.perf_counter()
+    try:
+        status = runner.run()
+    finally:
+        if not args.dry_run:
+            save_state(state)
+
+    counts = {}
+    for value in status.values():
+        counts[value] = counts.get(value, 0) + 1
+    print(f"\n🎯 Pipeline finished in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{v} {k}" for k, v in sorted(counts.items())))
+    if not args.dry_run:
+        print(f"📒 Run ledger: {LEDGER_PATH}")
+    if counts.get("failed"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
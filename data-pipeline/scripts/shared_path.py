@@ -0,0 +1,17 @@
+"""
+Puts the repository's ``shared/`` directory on ``sys.path``.
+
+Scripts import it before any ``punchfast_common`` module (the HTTP client, the
+Overpass reader/writer, the database settings), which the pipeline shares with
+ai/auto-cuisine:
+
+    import shared_path  # noqa: F401
+    from punchfast_common.http_client import HttpClient
+"""
+import os
+import sys
+
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "shared")
+
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
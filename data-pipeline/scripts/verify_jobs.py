@@ -0,0 +1,150 @@
+"""
+Checkpointed, resumable job runner shared by the verification scripts.
+
+A job walks rows in ascending id order. Every result is streamed to the CSV
+log as soon as it is produced, while the matching DB writes are buffered and
+sent as a single ``UPDATE ... FROM (VALUES ...)`` per batch. After each batch
+is committed the job stores a checkpoint (last id, CSV byte offset) next to
+the log, so a restarted run truncates the log back to the last committed
+batch and continues from there instead of redoing network calls.
+
+With a ``VerificationSchedule`` attached, each row's check outcome is written
+to ``verification_state`` in the same transaction as its batch.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCS_DIR = os.path.join(BASE_DIR, "docs")
+
+
+class VerificationJob:
+    def __init__(self, conn, name, log_prefix, log_fields, update_sql,
+                 template=None, batch_size=50, resume=True, docs_dir=DOCS_DIR, schedule=None):
+        self.conn = conn
+        self.name = name
+        self.log_fields = log_fields
+        self.update_sql = update_sql
+        self.template = template
+        self.schedule = schedule
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_path = os.path.join(docs_dir, f"{name}.checkpoint.json")
+        self.last_id = None
+        self.processed = 0
+        self._batch = []
+        self._checks = []
+        self._batch_rows = 0
+        self._batch_last_id = None
+
+        os.makedirs(docs_dir, exist_ok=True)
+        state = self._load_checkpoint() if resume else None
+
+        if state and os.path.exists(state["log_file"]):
+            # Resume: drop any log rows written after the last committed batch
+            self.log_path = state["log_file"]
+            self.last_id = state["last_id"]
+            self.processed = state["processed"]
+            self._log = open(self.log_path, "r+", newline="", encoding="utf-8")
+            self._log.seek(state["log_offset"])
+            self._log.truncate()
+            self._writer = csv.DictWriter(self._log, fieldnames=log_fields)
+            print(f"♻️ Resuming '{name}' after id {self.last_id} ({self.processed} already done).")
+        else:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.log_path = os.path.join(docs_dir, f"{log_prefix}_{stamp}.csv")
+            self._log = open(self.log_path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._log, fieldnames=log_fields)
+            self._writer.writeheader()
+            self._log.flush()
+            self._save_checkpoint()
+
+    # === Checkpoint file ===
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_checkpoint(self):
+        state = {
+            "job": self.name,
+            "log_file": self.log_path,
+            "log_offset": self._log.tell(),
+            "last_id": self.last_id,
+            "processed": self.processed,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # === Row handling ===
+    def pending(self, rows):
+        """Yield only rows (tuples whose first item is the id) not yet checkpointed."""
+        for row in rows:
+            if self.last_id is not None and row[0] <= self.last_id:
+                continue
+            yield row
+
+    def record(self, store_id, values, log_row, check=None):
+        """Stream ``log_row`` to the CSV and queue ``values`` (or None) for the next batch write.
+
+        ``check`` is an (outcome, ok) pair for the schedule's per-store state.
+        """
+        self._writer.writerow(log_row)
+        self._log.flush()
+        if values is not None:
+            self._batch.append(values)
+        if check is not None and self.schedule is not None:
+            self._checks.append((store_id,) + tuple(check))
+        self._batch_last_id = store_id
+        self._batch_rows += 1
+        self.processed += 1
+        if self._batch_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch_last_id is None:
+            return
+        if self._batch or self._checks:
+            with self.conn.cursor() as cur:
+                if self._batch:
+                    execute_values(cur, self.update_sql, self._batch,
+                                   template=self.template, page_size=len(self._batch))
+                if self._checks:
+                    self.schedule.write(cur, self._checks)
+        self.conn.commit()
+        self.last_id = self._batch_last_id
+        self._batch = []
+        self._checks = []
+        self._batch_rows = 0
+        self._batch_last_id = None
+        self._save_checkpoint()
+
+    def finish(self):
+        """Write the final batch and drop the checkpoint; returns the log path."""
+        self.flush()
+        self._log.close()
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.log_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+            return False
+        # Keep whatever finished cleanly; the checkpoint stays for the next run
+        try:
+            self.flush()
+        finally:
+            self._log.close()
+        return False
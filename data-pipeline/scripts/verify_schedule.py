@@ -0,0 +1,162 @@
+"""
+Staleness-driven selection of stores for the verification jobs.
+
+Every check is recorded in ``verification_state``, one row per job and store:
+when it was last checked, the outcome, consecutive failures and total checks.
+A run only verifies the top-N stores by
+
+    priority = min(days since last check, MAX_STALE_DAYS) / stale_days
+             + failure_weight * min(consecutive failures, MAX_FAILURES)
+             + activity_weight * ln(1 + app visits and saves in the last activity_days)
+
+where a store that was never checked counts as MAX_STALE_DAYS old, stores
+checked less than ``min_age_days`` ago are not eligible, and N is the run's
+request budget divided by the requests one store costs. Each run therefore
+costs the same however large the table is, and since every check resets a
+store's staleness the oldest ones keep rising to the top until the whole table
+has been covered.
+
+App activity comes from the server's "Visits" and "SavedStores" tables,
+matched to ``food_places`` by OSM type and id; it is left out when those
+tables are not in this database.
+"""
+from psycopg2.extras import execute_values
+
+MAX_STALE_DAYS = 365
+MAX_FAILURES = 3
+
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS verification_state (
+    job TEXT NOT NULL,
+    store_id INT NOT NULL,
+    last_checked_at TIMESTAMPTZ NOT NULL,
+    last_outcome TEXT,
+    consecutive_failures INT NOT NULL DEFAULT 0,
+    checks INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (job, store_id)
+);
+"""
+
+UPSERT_SQL = """
+    INSERT INTO verification_state AS s
+        (job, store_id, last_checked_at, last_outcome, consecutive_failures, checks)
+    VALUES %s
+    ON CONFLICT (job, store_id) DO UPDATE
+    SET last_checked_at = EXCLUDED.last_checked_at,
+        last_outcome = EXCLUDED.last_outcome,
+        consecutive_failures = CASE WHEN EXCLUDED.consecutive_failures = 0
+                                    THEN 0 ELSE s.consecutive_failures + 1 END,
+        checks = s.checks + 1;
+"""
+UPSERT_TEMPLATE = "(%s, %s, now(), %s, %s, 1)"
+
+NO_ACTIVITY_SQL = "SELECT NULL::text AS osm_type, NULL::bigint AS osm_id, 0 AS events WHERE FALSE"
+
+
+class VerificationSchedule:
+    def __init__(self, conn, job, budget=500, requests_per_store=1, stale_days=30.0, min_age_days=1.0,
+                 failure_weight=0.5, activity_weight=1.0, activity_days=30):
+        self.conn = conn
+        self.job = job
+        self.budget = budget
+        self.requests_per_store = max(1, requests_per_store)
+        self.stale_days = stale_days
+        self.min_age_days = min_age_days
+        self.failure_weight = failure_weight
+        self.activity_weight = activity_weight
+        self.activity_days = activity_days
+        with self.conn.cursor() as cur:
+            cur.execute(STATE_DDL)
+        self.conn.commit()
+
+    @property
+    def limit(self):
+        """Stores one run may check within the request budget."""
+        return self.budget // self.requests_per_store
+
+    # === Selection ===
+    def _activity_sql(self, cur):
+        cur.execute("""SELECT to_regclass('"Stores"') IS NOT NULL,
+                              to_regclass('"Visits"') IS NOT NULL,
+                              to_regclass('"SavedStores"') IS NOT NULL;""")
+        has_stores, has_visits, has_saves = cur.fetchone()
+        events = []
+        if has_visits:
+            events.append("""SELECT "storeId" AS store_id FROM "Visits"
+                             WHERE "visitDate" >= now() - make_interval(days => %(activity_days)s)""")
+        if has_saves:
+            events.append("""SELECT "storeId" AS store_id FROM "SavedStores"
+                             WHERE created_at >= now() - make_interval(days => %(activity_days)s)""")
+        if not has_stores or not events:
+            return NO_ACTIVITY_SQL
+        return f"""
+            SELECT st.osm_type::text AS osm_type, st.osm_id, COUNT(*) AS events
+            FROM ({" UNION ALL ".join(events)}) e
+            JOIN "Stores" st ON st.id = e.store_id
+            WHERE st.osm_id IS NOT NULL
+            GROUP BY 1, 2
+        """
+
+    def due(self, columns, where="TRUE", after_id=None, limit=None):
+        """The highest-priority eligible rows (``columns`` of ``food_places f``), in id order.
+
+        ``columns`` must start with ``f.id``; ``after_id`` skips ids a resumed
+        job has already committed.
+        """
+        limit = self.limit if limit is None else limit
+        if limit <= 0:
+            return []
+        params = {
+            "job": self.job,
+            "limit": limit,
+            "after_id": after_id,
+            "min_age": self.min_age_days * 86400.0,
+            "max_stale": float(MAX_STALE_DAYS),
+            "stale_days": float(self.stale_days),
+            "failure_weight": float(self.failure_weight),
+            "max_failures": MAX_FAILURES,
+            "activity_weight": float(self.activity_weight),
+            "activity_days": int(self.activity_days),
+        }
+        with self.conn.cursor() as cur:
+            activity_sql = self._activity_sql(cur)
+            cur.execute(f"""
+                WITH activity AS ({activity_sql})
+                SELECT * FROM (
+                    SELECT {", ".join(columns)}
+                    FROM food_places f
+                    LEFT JOIN verification_state vs ON vs.job = %(job)s AND vs.store_id = f.id
+                    LEFT JOIN activity a ON a.osm_type = f.osm_type AND a.osm_id = f.osm_id
+                    WHERE ({where})
+                      AND (vs.last_checked_at IS NULL
+                           OR vs.last_checked_at < now() - make_interval(secs => %(min_age)s))
+                      AND (%(after_id)s::int IS NULL OR f.id > %(after_id)s::int)
+                    ORDER BY LEAST(COALESCE(EXTRACT(EPOCH FROM now() - vs.last_checked_at) / 86400.0,
+                                            %(max_stale)s), %(max_stale)s) / %(stale_days)s
+                             + %(failure_weight)s * LEAST(COALESCE(vs.consecutive_failures, 0), %(max_failures)s)
+                             + %(activity_weight)s * LN(1 + COALESCE(a.events, 0)) DESC,
+                             f.id
+                    LIMIT %(limit)s
+                ) due
+                ORDER BY 1;
+            """, params)
+            rows = cur.fetchall()
+        self.conn.commit()
+        return rows
+
+    def coverage(self):
+        """(stores ever checked by this job, oldest last check) for the run summary."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*), MIN(last_checked_at) FROM verification_state WHERE job = %s;",
+                        (self.job,))
+            row = cur.fetchone()
+        self.conn.commit()
+        return row
+
+    # === Recording ===
+    def write(self, cur, checks):
+        """Upsert (store_id, outcome, ok) checks on ``cur``; the caller commits."""
+        if not checks:
+            return
+        values = [(self.job, store_id, outcome, 0 if ok else 1) for store_id, outcome, ok in checks]
+        execute_values(cur, UPSERT_SQL, values, template=UPSERT_TEMPLATE, page_size=len(values))
@@ -1,24 +1,33 @@
-import psycopg2
+import db
 import requests
+import argparse
 import time
-import csv
 import os
-from datetime import datetime
+
+from verify_jobs import VerificationJob
+from verify_schedule import VerificationSchedule
+
+import shared_path  # noqa: F401
+from punchfast_common.http_client import HttpClient
 
 # === Setup paths ===
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOCS_DIR = os.path.join(BASE_DIR, "docs")
 os.makedirs(DOCS_DIR, exist_ok=True)
 
+# === Command-line options ===
+parser = argparse.ArgumentParser(description="Score and verify valid stores (resumable).")
+parser.add_argument("--batch-size", type=int, default=50, help="stores per DB write / checkpoint")
+parser.add_argument("--fresh", action="store_true", help="ignore any saved checkpoint and start over")
+parser.add_argument("--budget", type=int, default=1000,
+                    help="HTTP requests per run (2 per store); the stalest / most used stores go first")
+parser.add_argument("--min-age-days", type=float, default=1.0, help="skip stores checked more recently than this")
+parser.add_argument("--all", action="store_true", help="rescore every valid store, ignoring budget and schedule")
+args = parser.parse_args()
+
 # === Database connection ===
 try:
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        port="5432",
-        database="punchfast",
-        user="postgres",
-        password="Rameez@123"
-    )
+    conn = db.connect()
     cur = conn.cursor()
     print("✅ Connected to PostgreSQL successfully.")
 except Exception as e:
@@ -48,108 +57,123 @@ END $$;
 conn.commit()
 print("🧱 Verified 'verification_score' and 'verified' columns.")
 
-# === Fetch valid stores ===
-cur.execute("""
-SELECT id, name, website, latitude, longitude
-FROM food_places
-WHERE status='valid';
-""")
-rows = cur.fetchall()
-print(f"🧩 Found {len(rows)} stores to score.")
+# === Per-store check history that drives the schedule (website + Nominatim = 2 requests) ===
+schedule = VerificationSchedule(conn, "verify_score", budget=args.budget, requests_per_store=2,
+                                min_age_days=args.min_age_days)
 
-# === Prepare CSV log ===
-log_filename = os.path.join(DOCS_DIR, f"verification_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+# === Checkpointed job: CSV log is streamed, DB writes go out per batch ===
 log_fields = ["id", "name", "website", "website_active", "osm_exists", "score", "verified", "verification_reason"]
-log_rows = []
+job = VerificationJob(
+    conn,
+    name="verify_score",
+    log_prefix="verification_log",
+    log_fields=log_fields,
+    update_sql="""
+        UPDATE food_places AS f
+        SET verification_score = v.score,
+            verified = v.verified
+        FROM (VALUES %s) AS v(id, score, verified)
+        WHERE f.id = v.id;
+    """,
+    batch_size=args.batch_size,
+    resume=not args.fresh,
+    schedule=schedule,
+)
+
+# === Pick stores: the scheduled top-N within budget, or every valid one with --all ===
+if args.all:
+    rows = db.iter_rows("""
+    SELECT id, name, website, latitude, longitude
+    FROM food_places
+    WHERE status='valid'
+    ORDER BY id;
+    """)
+    total = db.scalar("SELECT COUNT(*) FROM food_places WHERE status='valid';")
+else:
+    # A resumed run spends only what is left of its budget, on ids after the checkpoint
+    rows = schedule.due(["f.id", "f.name", "f.website", "f.latitude", "f.longitude"], "f.status = 'valid'",
+                        after_id=job.last_id, limit=schedule.limit - job.processed)
+    total = len(rows)
+print(f"🧩 Found {total} stores to score.")
+
+# === Pooled HTTP session for website checks and Nominatim ===
+http = HttpClient(user_agent="PunchFastVerifier/1.0", timeout=10)
 
 # === Main verification loop ===
-for row in rows:
-    store_id, name, website, lat, lon = row
-    score = 0
-    website_active = False
-    osm_exists = False
-    reasons = []
-
-    # 🌐 Website activity check
-    if website and len(website.strip()) > 5:
+with job:
+    for row in job.pending(rows):
+        store_id, name, website, lat, lon = row
+        score = 0
+        website_active = False
+        osm_exists = False
+        reasons = []
+
+        # 🌐 Website activity check
+        if website and len(website.strip()) > 5:
+            try:
+                url = website if website.startswith(("http://", "https://")) else "https://" + website
+                status_code = http.status(url, timeout=5)
+                if status_code == 200:
+                    website_active = True
+                    score += 3
+                    reasons.append("Website active")
+                    print(f"✅ Website active for {name}")
+                else:
+                    reasons.append(f"Website inactive ({status_code})")
+                    print(f"⚠️ Website inactive for {name} ({status_code})")
+            except requests.exceptions.RequestException as e:
+                reasons.append("Website check failed")
+                print(f"❌ Website check failed for {name}: {e}")
+
+        # 🗺️ OSM existence check
         try:
-            url = website if website.startswith(("http://", "https://")) else "https://" + website
-            res = requests.get(url, timeout=5, headers={"User-Agent": "PunchFastVerifier/1.0"})
-            if res.status_code == 200:
-                website_active = True
-                score += 3
-                reasons.append("Website active")
-                print(f"✅ Website active for {name}")
-            else:
-                reasons.append(f"Website inactive ({res.status_code})")
-                print(f"⚠️ Website inactive for {name} ({res.status_code})")
+            if lat and lon:
+                nominatim_url = "https://nominatim.openstreetmap.org/reverse"
+                params = {
+                    "format": "json",
+                    "lat": lat,
+                    "lon": lon,
+                    "zoom": 18,
+                    "addressdetails": 1
+                }
+                data = http.get_json(nominatim_url, params=params)
+                if "osm_type" in data and "osm_id" in data:
+                    osm_exists = True
+                    score += 2
+                    reasons.append("Found in OSM")
+                    print(f"🗺️ OSM record found for {name}")
+                else:
+                    reasons.append("Not found in OSM")
         except requests.exceptions.RequestException as e:
-            reasons.append("Website check failed")
-            print(f"❌ Website check failed for {name}: {e}")
-
-    # 🗺️ OSM existence check
-    try:
-        if lat and lon:
-            nominatim_url = "https://nominatim.openstreetmap.org/reverse"
-            params = {
-                "format": "json",
-                "lat": lat,
-                "lon": lon,
-                "zoom": 18,
-                "addressdetails": 1
-            }
-            r = requests.get(nominatim_url, params=params, headers={"User-Agent": "PunchFastVerifier/1.0"})
-            r.raise_for_status()
-            data = r.json()
-            if "osm_type" in data and "osm_id" in data:
-                osm_exists = True
-                score += 2
-                reasons.append("Found in OSM")
-                print(f"🗺️ OSM record found for {name}")
-            else:
-                reasons.append("Not found in OSM")
-    except requests.exceptions.RequestException as e:
-        reasons.append("OSM check failed")
-        print(f"⚠️ OSM check failed for {name}: {e}")
-
-    # Future extension: user check-ins, reviews, etc.
-    # if user_verified: score += 5; reasons.append("User verified")
-
-    verified = score >= 5
-    reasons.append("High confidence (>=5)" if verified else "Low verification score")
-
-    # === Update database record ===
-    cur.execute("""
-        UPDATE food_places
-        SET verification_score = %s,
-            verified = %s
-        WHERE id = %s;
-    """, (score, verified, store_id))
-
-    # === Add row to CSV log ===
-    log_rows.append({
-        "id": store_id,
-        "name": name,
-        "website": website,
-        "website_active": website_active,
-        "osm_exists": osm_exists,
-        "score": score,
-        "verified": verified,
-        "verification_reason": ", ".join(reasons)
-    })
-
-    # Respect API limits (Nominatim policy)
-    time.sleep(1)
-
-# === Commit updates and close DB ===
-conn.commit()
+            reasons.append("OSM check failed")
+            print(f"⚠️ OSM check failed for {name}: {e}")
+
+        # Future extension: user check-ins, reviews, etc.
+        # if user_verified: score += 5; reasons.append("User verified")
+
+        verified = score >= 5
+        reasons.append("High confidence (>=5)" if verified else "Low verification score")
+
+        # === Queue database update and stream row to CSV log ===
+        job.record(store_id, (store_id, score, verified), {
+            "id": store_id,
+            "name": name,
+            "website": website,
+            "website_active": website_active,
+            "osm_exists": osm_exists,
+            "score": score,
+            "verified": verified,
+            "verification_reason": ", ".join(reasons)
+        }, check=(f"score {score}", verified))
+
+        # Respect API limits (Nominatim policy)
+        time.sleep(1)
+
+# === Close DB ===
+checked, oldest = schedule.coverage()
 cur.close()
-conn.close()
-
-# === Write verification log ===
-with open(log_filename, "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=log_fields)
-    writer.writeheader()
-    writer.writerows(log_rows)
+db.release(conn)
+db.close_all()
 
-print(f"\n🎯 Verification scoring complete. Log saved to: {log_filename}")
+print(f"\n🎯 Verification scoring complete. Log saved to: {job.log_path}")
+print(f"🗓️ {checked} stores have a recorded check; oldest last check: {oldest or 'n/a'}")
@@ -1,24 +1,33 @@
-import psycopg2
+import db
 import requests
+import argparse
 import time
 import os
-from datetime import datetime
-import csv
+
+from verify_jobs import VerificationJob
+from verify_schedule import VerificationSchedule
+
+import shared_path  # noqa: F401
+from punchfast_common.http_client import HttpClient
 
 # === Setup directories ===
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOCS_DIR = os.path.join(BASE_DIR, "docs")
 os.makedirs(DOCS_DIR, exist_ok=True)
 
+# === Command-line options ===
+parser = argparse.ArgumentParser(description="Check that store websites are reachable (resumable).")
+parser.add_argument("--batch-size", type=int, default=50, help="stores per DB write / checkpoint")
+parser.add_argument("--fresh", action="store_true", help="ignore any saved checkpoint and start over")
+parser.add_argument("--budget", type=int, default=500,
+                    help="website requests per run; the stalest / most used stores go first")
+parser.add_argument("--min-age-days", type=float, default=1.0, help="skip stores checked more recently than this")
+parser.add_argument("--all", action="store_true", help="check every unverified store, ignoring budget and schedule")
+args = parser.parse_args()
+
 # === Connect to PostgreSQL ===
 try:
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        port="5432",
-        database="punchfast",
-        user="postgres",
-        password="Rameez@123"
-    )
+    conn = db.connect()
     cur = conn.cursor()
     print("✅ Connected to PostgreSQL successfully.")
 except Exception as e:
@@ -26,76 +35,101 @@ except Exception as e:
     print(e)
     exit()
 
-# === Fetch unverified stores with websites ===
-cur.execute("""
-    SELECT id, name, website
-    FROM food_places
-    WHERE website IS NOT NULL
-      AND website <> ''
-      AND verified = FALSE;
-""")
-rows = cur.fetchall()
+# === Per-store check history that drives the schedule ===
+schedule = VerificationSchedule(conn, "verify_stores", budget=args.budget, requests_per_store=1,
+                                min_age_days=args.min_age_days)
 
-print(f"🌐 Found {len(rows)} stores with websites to verify.")
-
-# === Prepare CSV log ===
-log_filename = os.path.join(DOCS_DIR, f"website_verification_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+# === Checkpointed job: CSV log is streamed, DB writes go out per batch ===
 log_fields = ["id", "name", "website", "status_code", "verified", "remarks"]
-log_rows = []
+job = VerificationJob(
+    conn,
+    name="verify_stores",
+    log_prefix="website_verification_log",
+    log_fields=log_fields,
+    update_sql="""
+        UPDATE food_places AS f
+        SET verified = v.verified
+        FROM (VALUES %s) AS v(id, verified)
+        WHERE f.id = v.id;
+    """,
+    batch_size=args.batch_size,
+    resume=not args.fresh,
+    schedule=schedule,
+)
+
+# === Pick stores: the scheduled top-N within budget, or every unverified one with --all ===
+if args.all:
+    unverified_filter = """
+        FROM food_places
+        WHERE website IS NOT NULL
+          AND website <> ''
+          AND verified = FALSE
+    """
+    rows = db.iter_rows("SELECT id, name, website" + unverified_filter + "ORDER BY id;")
+    total = db.scalar("SELECT COUNT(*)" + unverified_filter + ";")
+else:
+    # A resumed run spends only what is left of its budget, on ids after the checkpoint
+    rows = schedule.due(["f.id", "f.name", "f.website"], "f.website IS NOT NULL AND f.website <> ''",
+                        after_id=job.last_id, limit=schedule.limit - job.processed)
+    total = len(rows)
+
+print(f"🌐 Found {total} stores with websites to verify.")
+
+# === Pooled HTTP session (status only, bodies are never downloaded) ===
+http = HttpClient(user_agent="PunchfastWebsiteVerifier/1.0", timeout=5, retries=1)
 
 # === Verify each store ===
-for store_id, name, website in rows:
-    verified = False
-    status_code = None
-    remarks = ""
-
-    try:
-        # Ensure proper URL format
-        if not website.startswith(("http://", "https://")):
-            website = "https://" + website
-
-        res = requests.get(website, timeout=5, headers={"User-Agent": "PunchfastWebsiteVerifier/1.0"})
-        status_code = res.status_code
-
-        if res.status_code == 200:
-            verified = True
-            remarks = "Website active and reachable"
-            print(f"✅ Verified: {name} ({website})")
-        else:
-            remarks = f"Website returned status {res.status_code}"
-            print(f"⚠️ Unreachable ({res.status_code}): {website}")
-
-        # Update database
-        cur.execute("UPDATE food_places SET verified = %s WHERE id = %s;", (verified, store_id))
-        conn.commit()
-
-    except requests.exceptions.RequestException as e:
-        remarks = f"Request failed: {e}"
-        print(f"❌ Failed: {website} ({e})")
-    except Exception as e:
-        remarks = f"Unexpected error: {e}"
-        print(f"⚠️ Error verifying {website}: {e}")
-
-    # Add to log
-    log_rows.append({
-        "id": store_id,
-        "name": name,
-        "website": website,
-        "status_code": status_code if status_code else "N/A",
-        "verified": verified,
-        "remarks": remarks
-    })
-
-    # Sleep to respect rate limits
-    time.sleep(1)
-
-# === Write log file ===
-with open(log_filename, "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=log_fields)
-    writer.writeheader()
-    writer.writerows(log_rows)
-
+with job:
+    for store_id, name, website in job.pending(rows):
+        verified = False
+        status_code = None
+        remarks = ""
+        update = None
+        outcome = "error"
+
+        try:
+            # Ensure proper URL format
+            if not website.startswith(("http://", "https://")):
+                website = "https://" + website
+
+            status_code = http.status(website)
+            outcome = "ok" if status_code == 200 else f"status {status_code}"
+
+            if status_code == 200:
+                verified = True
+                remarks = "Website active and reachable"
+                print(f"✅ Verified: {name} ({website})")
+            else:
+                remarks = f"Website returned status {status_code}"
+                print(f"⚠️ Unreachable ({status_code}): {website}")
+
+            # Queue database update (only for sites that answered)
+            update = (store_id, verified)
+
+        except requests.exceptions.RequestException as e:
+            remarks = f"Request failed: {e}"
+            print(f"❌ Failed: {website} ({e})")
+        except Exception as e:
+            remarks = f"Unexpected error: {e}"
+            print(f"⚠️ Error verifying {website}: {e}")
+
+        # Add to log
+        job.record(store_id, update, {
+            "id": store_id,
+            "name": name,
+            "website": website,
+            "status_code": status_code if status_code else "N/A",
+            "verified": verified,
+            "remarks": remarks
+        }, check=(outcome, verified))
+
+        # Sleep to respect rate limits
+        time.sleep(1)
+
+checked, oldest = schedule.coverage()
 cur.close()
-conn.close()
+db.release(conn)
+db.close_all()
 
-print(f"\n🎯 Verification process complete. Log saved to: {log_filename}")
+print(f"\n🎯 Verification process complete. Log saved to: {job.log_path}")
+print(f"🗓️ {checked} stores have a recorded check; oldest last check: {oldest or 'n/a'}")
@@ -0,0 +1,7 @@
+"""
+Python helpers shared by the data pipeline and the auto-cuisine models.
+
+Both trees put ``shared/`` on ``sys.path`` in exactly one place
+(``data-pipeline/scripts/shared_path.py`` and ``ai/auto-cuisine/src/utils/__init__.py``)
+and import these modules as ``punchfast_common.<module>``; there are no copies.
+"""
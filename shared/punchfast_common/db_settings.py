@@ -0,0 +1,46 @@
+"""
+PostgreSQL connection settings shared by the pipeline (``db.py``) and the
+auto-cuisine prediction sink.
+
+Settings come from the environment, seeded from ``data-pipeline/.env`` and the
+repository ``.env`` (the same variables the server uses); a variable already
+set in the environment always wins, then the first file that defines it:
+
+    DATABASE_URL                      full DSN, wins over the fields below
+    DB_HOST / DB_PORT                 default 127.0.0.1 / 5432
+    POSTGRES_DB / POSTGRES_USER       default punchfast / postgres
+    POSTGRES_PASSWORD
+"""
+import os
+from typing import Any, Dict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENV_FILES = (os.path.join(REPO_DIR, "data-pipeline", ".env"), os.path.join(REPO_DIR, ".env"))
+
+
+def load_dotenv():
+    for path in ENV_FILES:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                value = value.strip().strip('"').strip("'")
+                os.environ.setdefault(key.strip(), value)
+
+
+def connection_kwargs() -> Dict[str, Any]:
+    """``psycopg2.connect()`` arguments."""
+    load_dotenv()
+    if os.environ.get("DATABASE_URL"):
+        return {"dsn": os.environ["DATABASE_URL"]}
+    return {
+        "host": os.environ.get("DB_HOST", "127.0.0.1"),
+        "port": os.environ.get("DB_PORT", "5432"),
+        "database": os.environ.get("POSTGRES_DB", "punchfast"),
+        "user": os.environ.get("POSTGRES_USER", "postgres"),
+        "password": os.environ.get("POSTGRES_PASSWORD", ""),
+    }
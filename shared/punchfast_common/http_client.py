@@ -0,0 +1,182 @@
+"""
+Shared HTTP client for every fetcher in the repo (scraping, website checks,
+Nominatim lookups, Overpass extracts).
+
+One ``requests.Session`` per client keeps connections alive and pooled per
+host. Responses are always streamed: bodies are read in chunks and cut off at
+``max_bytes`` (after decompression), and non-HTML responses (PDFs, images,
+downloads) are dropped by content type before any of the body is read. Timeouts
+and retries (connection errors and 429/5xx, with backoff and Retry-After) are
+the same everywhere. ``post_to_file`` streams a POST response to disk for large
+downloads such as Overpass tiles.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36"
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class FetchResult:
+    __slots__ = ("url", "status", "content_type", "text", "truncated", "skipped")
+
+    def __init__(self, url, status=None, content_type="", text="", truncated=False, skipped=""):
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.text = text
+        self.truncated = truncated
+        self.skipped = skipped
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and not self.skipped and bool(self.text)
+
+class IncompleteResponse(requests.RequestException):
+    """A downloaded body that was cut short; retried like a dropped connection."""
+
+class HttpClient:
+    def __init__(self, user_agent: str = UA, timeout: float = 10, max_bytes: int = 2_000_000,
+                 retries: int = 2, backoff: float = 0.5, pool_size: int = 10,
+                 allowed_types=HTML_TYPES, retry_methods=("GET", "HEAD")):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self.allowed_types = tuple(allowed_types)
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset(retry_methods),
+                      respect_retry_after_header=True,
+                      # Hand the last 5xx/429 back to the caller instead of raising
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": user_agent,
+            "Accept-Encoding": "gzip, deflate",
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
+        })
+
+    @staticmethod
+    def _type_allowed(content_type: str, allowed) -> bool:
+        if not content_type or not allowed:
+            return True
+        return content_type.split(";")[0].strip().lower() in allowed
+
+    def _read_text(self, resp, max_bytes: int):
+        chunks, size, truncated = [], 0, False
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            if not chunk:
+                continue
+            if size + len(chunk) > max_bytes:
+                chunks.append(chunk[:max_bytes - size])
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        # requests would guess ISO-8859-1 for text/* without a charset; UTF-8 is far more likely
+        encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        if not encoding or (encoding.lower() == "iso-8859-1" and "charset" not in resp.headers.get("Content-Type", "").lower()):
+            encoding = "utf-8"
+        try:
+            return b"".join(chunks).decode(encoding, errors="replace"), truncated
+        except LookupError:
+            return b"".join(chunks).decode("utf-8", errors="replace"), truncated
+
+    def fetch(self, url: str, params: Optional[Dict] = None, timeout: Optional[float] = None,
+              max_bytes: Optional[int] = None, allowed_types=None) -> FetchResult:
+        """GET ``url`` with a bounded, streamed body. Network errors raise ``requests.RequestException``."""
+        allowed = self.allowed_types if allowed_types is None else tuple(allowed_types)
+        with self.session.get(url, params=params, timeout=timeout or self.timeout, stream=True) as resp:
+            content_type = resp.headers.get("Content-Type", "")
+            result = FetchResult(resp.url, resp.status_code, content_type)
+            if not self._type_allowed(content_type, allowed):
+                result.skipped = f"content-type {content_type.split(';')[0]}"
+                return result
+            result.text, result.truncated = self._read_text(resp, max_bytes or self.max_bytes)
+            return result
+
+    def fetch_html(self, url: str, timeout: Optional[float] = None) -> str:
+        """Body of an HTML page, or "" on any error, non-200 status or non-HTML content."""
+        if not url or not isinstance(url, str):
+            return ""
+        try:
+            res = self.fetch(url, timeout=timeout)
+        except Exception:
+            return ""
+        return res.text if res.ok else ""
+
+    def get_json(self, url: str, params: Optional[Dict] = None, timeout: Optional[float] = None):
+        """Decoded JSON body; raises ``requests.HTTPError`` on 4xx/5xx like ``raise_for_status()``."""
+        res = self.fetch(url, params=params, timeout=timeout, allowed_types=())
+        if res.status is None or res.status >= 400:
+            raise requests.HTTPError(f"{res.status} for url: {res.url}")
+        try:
+            return json.loads(res.text)
+        except ValueError as e:
+            raise requests.exceptions.InvalidJSONError(f"Invalid JSON from {res.url}: {e}")
+
+    def post_to_file(self, url: str, path: str, data=None, timeout: Optional[float] = None,
+                     check=None) -> int:
+        """POST ``data`` and stream the body into ``path``; returns the bytes written.
+
+        The body goes to ``path + ".tmp"`` and replaces ``path`` only once it is
+        complete and ``check(tmp_path)`` (if given) accepts it. Connection errors
+        and 429/5xx are retried by the session, which needs "POST" in
+        ``retry_methods``; a body that breaks off after the headers arrived, or
+        that ``check`` rejects with ``IncompleteResponse``, is retried here with
+        the same backoff. Any other status raises ``requests.HTTPError``.
+        """
+        tmp = path + ".tmp"
+        for attempt in range(self.retries + 1):
+            receiving = False
+            try:
+                with self.session.post(url, data=data, timeout=timeout or self.timeout, stream=True) as resp:
+                    if resp.status_code != 200:
+                        raise requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+                    receiving = True
+                    size = 0
+                    with open(tmp, "wb") as f:
+                        for chunk in resp.iter_content(chunk_size=64 * 1024):
+                            f.write(chunk)
+                            size += len(chunk)
+                if check is not None:
+                    check(tmp)
+                os.replace(tmp, path)
+                return size
+            except requests.RequestException as e:
+                if not (receiving or isinstance(e, IncompleteResponse)) or attempt >= self.retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def status(self, url: str, timeout: Optional[float] = None) -> int:
+        """Status code of a GET without downloading the body (reachability checks)."""
+        with self.session.get(url, timeout=timeout or self.timeout, stream=True) as resp:
+            return resp.status_code
+
+    def close(self):
+        self.session.close()
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_client() -> HttpClient:
+    """Process-wide client used by scrape_site and other casual callers."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpClient()
+        return _default
@@ -0,0 +1,149 @@
+"""
+Streaming reader and writer for Overpass JSON exports.
+
+``iter_elements()`` walks the top-level ``elements`` array (or a bare JSON
+array) one element at a time with ``json.JSONDecoder.raw_decode`` over a
+rolling text buffer, so only the current read chunk and one element are held
+in memory regardless of the export size. ``read_header()`` returns the
+top-level fields that precede the array (version, generator, osm3s), and
+``write_overpass()`` streams elements back out in the same layout.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, Optional
+
+ELEMENTS_KEY = re.compile(r'"elements"\s*:\s*\[')
+WHITESPACE = " \t\r\n"
+
+
+def iter_elements(path, chunk_size=1 << 20):
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        eof = False
+
+        def more():
+            nonlocal buf, eof
+            data = f.read(chunk_size)
+            if data:
+                buf += data
+            else:
+                eof = True
+
+        # === Find the start of the elements array ===
+        pos = None
+        while pos is None:
+            stripped = buf.lstrip(WHITESPACE)
+            if stripped.startswith("["):
+                pos = len(buf) - len(stripped) + 1
+                break
+            match = ELEMENTS_KEY.search(buf)
+            if match:
+                pos = match.end()
+                break
+            if eof:
+                return
+            # Keep a short tail in case the key straddles two chunks
+            buf = buf[-64:]
+            more()
+
+        # === Decode one element at a time ===
+        while True:
+            while pos < len(buf) and buf[pos] in WHITESPACE + ",":
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError(f"Unterminated elements array in {path}")
+                buf = buf[pos:]
+                pos = 0
+                more()
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buf = buf[pos:]
+                pos = 0
+                more()
+                continue
+            pos = end
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
+            if isinstance(element, dict):
+                yield element
+
+
+def read_header(path, chunk_size=1 << 16):
+    """Top-level fields before ``elements`` as a dict, or None for a bare array/other shapes."""
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while True:
+            data = f.read(chunk_size)
+            buf += data
+            stripped = buf.lstrip(WHITESPACE)
+            if stripped and not stripped.startswith("{"):
+                return None
+            match = ELEMENTS_KEY.search(buf)
+            if match:
+                try:
+                    return json.loads(buf[:match.start()] + '"elements": []}')
+                except ValueError:
+                    return None
+            if not data:
+                return None
+
+
+def element_coords(el):
+    """Return (lat, lon) for nodes, or the ``center``/``bounds`` midpoint for ways and relations."""
+    if el.get("lat") is not None and el.get("lon") is not None:
+        return el["lat"], el["lon"]
+    center = el.get("center") or {}
+    if center.get("lat") is not None and center.get("lon") is not None:
+        return center["lat"], center["lon"]
+    bounds = el.get("bounds") or {}
+    if all(bounds.get(k) is not None for k in ("minlat", "maxlat", "minlon", "maxlon")):
+        return ((bounds["minlat"] + bounds["maxlat"]) / 2,
+                (bounds["minlon"] + bounds["maxlon"]) / 2)
+    return None, None
+
+
+def write_overpass(path: str, elements: Iterable[Dict[str, Any]], header: Optional[Dict[str, Any]] = None,
+                   indent: int = 2) -> int:
+    """Stream elements to ``path`` formatted exactly like ``json.dump(..., indent=indent)``.
+
+    With a header (see ``read_header``) the output is that object with its
+    ``elements`` array filled in; without one it is a bare array.
+    """
+    pad = " " * indent
+
+    def dump(value, depth):
+        return json.dumps(value, ensure_ascii=False, indent=indent).replace("\n", "\n" + pad * depth)
+
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        def write_elements(depth):
+            nonlocal n
+            f.write("[")
+            for el in elements:
+                f.write(("," if n else "") + "\n" + pad * depth + dump(el, depth))
+                n += 1
+            f.write(("\n" + pad * (depth - 1) if n else "") + "]")
+
+        if header is None:
+            write_elements(1)
+            return n
+        items = dict(header)
+        items.setdefault("elements", [])
+        f.write("{")
+        for k, (key, value) in enumerate(items.items()):
+            f.write(("," if k else "") + "\n" + pad + json.dumps(key, ensure_ascii=False) + ": ")
+            if key == "elements":
+                write_elements(2)
+            else:
+                f.write(dump(value, 1))
+        f.write("\n}")
+    return n